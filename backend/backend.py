@@ -1,19 +1,11 @@
 from flask import Flask, jsonify
 from flask_cors import CORS
-import pyodbc
 from datetime import datetime
+from database import conexao  # Pool de conexões compartilhado (database.py)
 
 app = Flask(__name__)
 CORS(app)
 
-def conectar_banco():
-    return pyodbc.connect(
-        'DRIVER={SQL Server};'
-        'SERVER=localhost;'
-        'DATABASE=powerbi;'
-        'Trusted_Connection=yes;'
-    )
-
 def converter_data(data):
     if isinstance(data, datetime):
         return data.isoformat()
@@ -25,12 +17,11 @@ def index():
 
 @app.route('/api/chamados', methods=['GET'])
 def listar_chamados():
-    conn = conectar_banco()
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT * FROM dbo.[GRC-Chamados]")
-    colunas = [desc[0] for desc in cursor.description]
-    rows = cursor.fetchall()
+    with conexao() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM dbo.[GRC-Chamados]")
+        colunas = [desc[0] for desc in cursor.description]
+        rows = cursor.fetchall()
 
     chamados = []
     for row in rows:
@@ -58,7 +49,6 @@ def listar_chamados():
         }
         chamados.append(chamado)
 
-    conn.close()
     return jsonify(chamados)
 
 if __name__ == '__main__':
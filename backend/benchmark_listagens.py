@@ -0,0 +1,107 @@
+"""Benchmark da serialização/compressão das listagens (antes x depois) numa tabela sintética.
+
+Não usa o banco: gera linhas no formato de /api/chamados (com os textos livres
+detalhesProblema, testesRealizados e observacoes) e mede
+
+  - antes: o provedor JSON padrão do Flask (o que o jsonify fazia);
+  - depois: serializacao.codificar_json (orjson, ou json com PEGASUS_JSON=json);
+  - o tamanho e o tempo de gzip/brotli sobre o corpo codificado.
+
+Uso: python benchmark_listagens.py [linhas] [repeticoes]
+"""
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+import serializacao
+
+PALAVRAS = (
+    "node", "sem", "sinal", "cliente", "reclama", "lentidao", "equipamento", "reiniciado",
+    "fibra", "rompida", "atenuacao", "alta", "porta", "cmts", "upstream", "ruido", "teste",
+    "realizado", "ok", "falha", "persistente", "aguardando", "campo", "tecnico", "headend"
+)
+
+
+def texto(gerador, palavras):
+    return " ".join(gerador.choice(PALAVRAS) for _ in range(palavras))
+
+
+def gerar_chamados(linhas, semente=42):
+    """Linhas sintéticas com os campos e tipos devolvidos por listar_chamados"""
+    gerador = random.Random(semente)
+    inicio = datetime(2024, 1, 1)
+    chamados = []
+    for i in range(linhas, 0, -1):
+        evento = inicio + timedelta(minutes=gerador.randint(0, 500000))
+        chamados.append({
+            'id': i,
+            'nomeSolicitante': f"Solicitante {gerador.randint(1, 500)}",
+            'telefone': f"27 9{gerador.randint(10000000, 99999999)}",
+            'emailSolicitante': f"usuario{gerador.randint(1, 500)}@empresa.com.br",
+            'empresa': gerador.choice(("Claro", "NET", "Embratel")),
+            'cidade': gerador.choice(("Vitória", "Vila Velha", "Serra", "Cariacica")),
+            'tecnologia': gerador.choice(("HFC", "GPON", "DOCSIS")),
+            'nodeAfetadas': f"N{gerador.randint(100, 999)}",
+            'tipoReclamacao': gerador.choice(("Sem sinal", "Lentidão", "Intermitência")),
+            'detalhesProblema': texto(gerador, 60),
+            'testesRealizados': texto(gerador, 40),
+            'modelEquipamento': f"CM-{gerador.randint(1, 50)}",
+            'baseAfetada': Decimal(gerador.randint(1, 5000)),
+            'contratosAfetados': gerador.randint(1, 5000),
+            'servicoAfetado': gerador.choice(("Internet", "TV", "Voz")),
+            'dataEvento': evento,
+            'horaInicio': evento.time(),
+            'horaConclusao': '',
+            'status': gerador.choice(("Pendente", "Em Andamento")),
+            'prioridade': gerador.choice(("Baixa", "Média", "Alta")),
+            'responsavel': gerador.choice(("", "Paulo", "Lucas")),
+            'observacoes': "\n\n".join(
+                f"[{evento:%d/%m/%Y %H:%M} - Paulo]: {texto(gerador, 20)}" for _ in range(gerador.randint(0, 6))
+            ),
+        })
+    return chamados
+
+
+def medir(funcao, repeticoes):
+    """Melhor tempo (s) entre as repetições e o último resultado"""
+    melhor, resultado = None, None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        decorrido = time.perf_counter() - inicio
+        melhor = decorrido if melhor is None else min(melhor, decorrido)
+    return melhor, resultado
+
+
+def main():
+    linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    repeticoes = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    chamados = gerar_chamados(linhas)
+    app = Flask(__name__)
+    padrao = DefaultJSONProvider(app)
+    padrao.default = staticmethod(serializacao.converter_valor)  # o padrão do Flask não conhece datetime.time
+
+    print(f"{linhas} chamados, melhor de {repeticoes}")
+    print(f"{'etapa':<32}{'tempo (ms)':>12}{'tamanho (KB)':>15}")
+
+    t_antes, corpo_antes = medir(lambda: padrao.dumps(chamados).encode('utf-8'), repeticoes)
+    print(f"{'antes: Flask DefaultJSONProvider':<32}{t_antes * 1000:>12.1f}{len(corpo_antes) / 1024:>15.0f}")
+
+    t_depois, corpo = medir(lambda: serializacao.codificar_json(chamados), repeticoes)
+    print(f"{'depois: ' + serializacao.CODIFICADOR_JSON:<32}{t_depois * 1000:>12.1f}{len(corpo) / 1024:>15.0f}")
+
+    for codificacao in serializacao.codificacoes_disponiveis():
+        t_comp, comprimido = medir(lambda: serializacao.comprimir(corpo, codificacao), repeticoes)
+        print(f"{'  + ' + codificacao:<32}{t_comp * 1000:>12.1f}{len(comprimido) / 1024:>15.0f}")
+
+    print(f"\nCodificação {t_antes / t_depois:.1f}x mais rápida")
+
+
+if __name__ == '__main__':
+    main()
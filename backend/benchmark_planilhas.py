@@ -0,0 +1,133 @@
+"""Benchmark da releitura das planilhas (antes x depois) num .xlsx sintético.
+
+Não usa o OneDrive nem o banco: gera uma planilha no formato da de chamados numa
+pasta temporária (o espelho também fica nela) e mede
+
+  - antes: pd.read_excel + normalização das colunas (o que cada recarga fazia);
+  - primeira leitura: o mesmo, mais a gravação do espelho em pickle;
+  - espelho: arquivo sem mudança de mtime/tamanho desde o espelho;
+  - espelho por hash: arquivo "tocado" (mtime novo, mesmo conteúdo), como numa
+    sincronização do OneDrive;
+  - depois do escritor: releitura logo após uma gravação do EscritorPlanilha,
+    que atualiza o espelho junto com o .xlsx.
+
+Uso: python benchmark_planilhas.py [linhas] [repeticoes]
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import openpyxl
+
+import planilhas
+
+ABA = 'Sheet1'
+CABECALHOS = (
+    'ID', 'Hora de início', 'Hora de conclusão', 'Data do evento', 'Nome do solicitante', 'Telefone',
+    'E-mail do solicitante', 'Empresa', 'Cidade', 'Tecnologia', 'Serviço afetado', 'Base afetada',
+    'Node(s)/NAP(s) afetadas', 'Contratos afetados', 'Tipo de reclamação do cliente',
+    'Descreva detalhes do problema (sintomas das reclamações)',
+    'Descreva os testes que foram realizados no cliente', 'Modelo do equipamento afetado',
+    'Status', 'Responsavel',
+)
+PALAVRAS = (
+    "node", "sem", "sinal", "cliente", "reclama", "lentidao", "equipamento", "reiniciado",
+    "fibra", "rompida", "atenuacao", "alta", "porta", "cmts", "upstream", "ruido", "teste"
+)
+
+
+def texto(gerador, palavras):
+    return " ".join(gerador.choice(PALAVRAS) for _ in range(palavras))
+
+
+def gerar_planilha(caminho, linhas, semente=42):
+    """Planilha sintética com os cabeçalhos da planilha de chamados"""
+    gerador = random.Random(semente)
+    inicio = datetime(2024, 1, 1)
+    pasta = openpyxl.Workbook(write_only=True)
+    planilha = pasta.create_sheet(ABA)
+    planilha.append(CABECALHOS)
+    for i in range(1, linhas + 1):
+        evento = inicio + timedelta(minutes=gerador.randint(0, 500000))
+        planilha.append((
+            i, evento.time(), None, evento, f"Solicitante {gerador.randint(1, 500)}",
+            f"27 9{gerador.randint(10000000, 99999999)}", f"usuario{gerador.randint(1, 500)}@empresa.com.br",
+            gerador.choice(("Claro", "NET", "Embratel")), gerador.choice(("Vitória", "Vila Velha", "Serra")),
+            gerador.choice(("HFC", "GPON", "DOCSIS")), gerador.choice(("Internet", "TV", "Voz")),
+            gerador.randint(1, 5000), f"N{gerador.randint(100, 999)}", gerador.randint(1, 5000),
+            gerador.choice(("Sem sinal", "Lentidão", "Intermitência")), texto(gerador, 60), texto(gerador, 40),
+            f"CM-{gerador.randint(1, 50)}", gerador.choice(("Pendente", "Em Andamento")), None,
+        ))
+    pasta.save(caminho)
+
+
+def medir(funcao, repeticoes, preparar=None):
+    """Melhor tempo (s) entre as repetições e o último resultado; preparar() roda fora da medição"""
+    melhor, resultado = None, None
+    for _ in range(repeticoes):
+        if preparar:
+            preparar()
+        inicio = time.perf_counter()
+        resultado = funcao()
+        decorrido = time.perf_counter() - inicio
+        melhor = decorrido if melhor is None else min(melhor, decorrido)
+    return melhor, resultado
+
+
+def main():
+    linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeticoes = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    pasta_temporaria = tempfile.mkdtemp(prefix='benchmark_planilhas_')
+    planilhas.PASTA_ESPELHOS = pasta_temporaria
+    caminho = os.path.join(pasta_temporaria, 'chamados.xlsx')
+    try:
+        gerar_planilha(caminho, linhas)
+        espelho = planilhas.caminho_espelho(caminho, ABA)
+
+        def apagar_espelho():
+            if os.path.exists(espelho):
+                os.remove(espelho)
+
+        def tocar_arquivo():
+            planilhas.ler_colunas_espelho(caminho, ABA)
+            os.utime(caminho, ns=(time.time_ns(), time.time_ns()))
+
+        escritor = planilhas.EscritorPlanilha(caminho, ABA, 'id')
+        gerador = random.Random(7)
+
+        def gravar_pelo_escritor():
+            planilhas.ler_colunas_espelho(caminho, ABA)
+            escritor.enfileirar(gerador.randint(1, linhas), {'responsavel': f"Técnico {gerador.randint(1, 9)}"})
+            escritor.descarregar()
+
+        print(f"{linhas} linhas ({os.path.getsize(caminho) / 1024:.0f} KB), melhor de {repeticoes}")
+        print(f"{'etapa':<34}{'tempo (ms)':>12}  origem")
+
+        t_antes, _ = medir(lambda: planilhas.ler_colunas(caminho, ABA), repeticoes)
+        print(f"{'antes: pd.read_excel':<34}{t_antes * 1000:>12.1f}  xlsx")
+
+        etapas = (
+            ('primeira leitura (+ espelho)', apagar_espelho),
+            ('espelho', None),
+            ('espelho por hash (mtime novo)', tocar_arquivo),
+            ('depois do escritor', gravar_pelo_escritor),
+        )
+        tempos = {}
+        for nome, preparar in etapas:
+            tempos[nome], (_, _, origem) = medir(lambda: planilhas.ler_colunas_espelho(caminho, ABA),
+                                                 repeticoes, preparar)
+            print(f"{nome:<34}{tempos[nome] * 1000:>12.1f}  {origem}")
+
+        print(f"\nReleitura sem mudança {t_antes / tempos['espelho']:.0f}x mais rápida; "
+              f"depois de uma gravação do escritor {t_antes / tempos['depois do escritor']:.0f}x")
+    finally:
+        shutil.rmtree(pasta_temporaria, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
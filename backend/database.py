@@ -1,9 +1,455 @@
+"""Camada de acesso ao banco compartilhada pelos serviços (pool de conexões pyodbc).
+
+Cada processo tem um pool (connection_pool), criado vazio na importação:
+as conexões abrem sob demanda, ou de antemão com init_connection_pool().
+
+    with conexao() as conn:
+        cursor = conn.cursor()
+        ...
+        conn.commit()
+
+get_connection()/return_connection() fazem o mesmo sem o with; conn.close()
+numa conexão do pool também a devolve, em vez de fechar o login. Na devolução
+o pool faz rollback: o que ficou sem commit (inclusive leituras, com os locks
+e a transação aberta) nunca passa para o próximo a retirar a conexão.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
 import pyodbc
 
+# Pool de conexões: tamanho configurável por variável de ambiente
+POOL_MINIMO = int(os.environ.get('PEGASUS_POOL_MINIMO', 5))        # conexões sempre abertas
+POOL_MAXIMO = int(os.environ.get('PEGASUS_POOL_MAXIMO', 10))       # conexões mantidas no pool
+POOL_EXCEDENTE = int(os.environ.get('PEGASUS_POOL_EXCEDENTE', 5))  # extras sob pico, fechadas na devolução
+POOL_TIMEOUT = float(os.environ.get('PEGASUS_POOL_TIMEOUT', 5))    # segundos na fila antes de PoolEsgotado
+
+# Validação por ociosidade/idade em vez de SELECT 1 a cada uso
+POOL_OCIOSIDADE_VALIDACAO = 30  # segundos parada no pool antes de precisar de um SELECT 1 na retirada
+POOL_OCIOSIDADE_ENCERRAR = 300  # segundos parada antes de ser fechada (acima do mínimo)
+POOL_VIDA_MAXIMA = 1800         # segundos de vida de uma conexão antes de ser trocada por uma nova
+
+# Aquecimento na inicialização: o serviço sobe com essas conexões prontas, o resto abre em segundo plano
+POOL_AQUECIMENTO_PRONTAS = 2
+POOL_AQUECIMENTO_ESPERA = 10  # segundos, no máximo, esperando as conexões prontas
+
+# Faixas (ms) do histograma de espera na retirada
+FAIXAS_ESPERA_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+# SQLSTATEs de conexão perdida: a conexão que os recebe não volta para o pool
+SQLSTATES_CONEXAO_PERDIDA = ('08S01', '08001', '08003', '08004', '08007', '40003')
+
+STRING_CONEXAO = (
+    'DRIVER={SQL Server};'
+    'SERVER=localhost;'
+    'DATABASE=powerbi;'
+    'Trusted_Connection=yes;'
+    'Connection Timeout=30;'
+    'Command Timeout=30;'
+)
+
+def conexao_perdida(erro):
+    """True se o erro do driver indica que a conexão caiu (SQLSTATE da classe 08 e afins)"""
+    sqlstate = erro.args[0] if isinstance(erro, pyodbc.Error) and erro.args else None
+    return isinstance(sqlstate, str) and (sqlstate.startswith('08') or sqlstate in SQLSTATES_CONEXAO_PERDIDA)
+
+
+class CursorMonitorado:
+    """Cursor pyodbc que marca a conexão como perdida quando uma consulta real falha por isso"""
+
+    def __init__(self, cursor, conexao):
+        object.__setattr__(self, '_cursor', cursor)
+        object.__setattr__(self, '_conexao', conexao)
+
+    def _chamar(self, metodo, *args):
+        try:
+            return getattr(self._cursor, metodo)(*args)
+        except pyodbc.Error as e:
+            self._conexao.verificar_erro(e)
+            raise
+
+    def execute(self, *args):
+        self._chamar('execute', *args)
+        return self
+
+    def executemany(self, *args):
+        self._chamar('executemany', *args)
+        return self
+
+    def fetchone(self):
+        return self._chamar('fetchone')
+
+    def fetchall(self):
+        return self._chamar('fetchall')
+
+    def fetchmany(self, *args):
+        return self._chamar('fetchmany', *args)
+
+    def nextset(self):
+        return self._chamar('nextset')
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def __getattr__(self, nome):
+        return getattr(self._cursor, nome)
+
+    def __setattr__(self, nome, valor):
+        setattr(self._cursor, nome, valor)
+
+
+class ConexaoMonitorada:
+    """Conexão do pool: guarda quando foi criada/usada e se o driver acusou queda.
+
+    close() devolve a conexão ao pool; fechar() encerra o login de fato.
+    """
+
+    def __init__(self, conexao, pool):
+        self._conexao = conexao
+        self._pool = pool
+        self.criada_em = self.usada_em = time.time()
+        self.perdida = False
+        self.emprestada = True
+
+    def verificar_erro(self, erro):
+        if conexao_perdida(erro):
+            self.perdida = True
+
+    def cursor(self):
+        try:
+            return CursorMonitorado(self._conexao.cursor(), self)
+        except pyodbc.Error as e:
+            self.verificar_erro(e)
+            raise
+
+    def commit(self):
+        try:
+            self._conexao.commit()
+        except pyodbc.Error as e:
+            self.verificar_erro(e)
+            raise
+
+    def rollback(self):
+        try:
+            self._conexao.rollback()
+        except pyodbc.Error as e:
+            self.verificar_erro(e)
+            raise
+
+    def close(self):
+        self._pool.devolver(self)
+
+    def fechar(self):
+        try:
+            self._conexao.close()
+        except Exception as e:
+            logging.debug(f"Erro ao fechar conexão descartada: {e}")
+
+    def __getattr__(self, nome):
+        return getattr(self._conexao, nome)
+
+
+class PoolEsgotado(Exception):
+    """Nenhuma conexão liberada dentro do timeout com o pool no limite"""
+
+
+class _Espera:
+    """Vez de uma thread na fila do pool: recebe uma conexão livre ou uma vaga para abrir"""
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.conexao = None
+        self.criar = False
+
+
+class PoolConexoes:
+    """Pool de conexões pyodbc limitado e elástico, sem ping por uso.
+
+    Mantém pelo menos `minimo` conexões abertas e cresce sob demanda até `maximo`;
+    acima disso abre no máximo `excedente` conexões extras, fechadas assim que
+    devolvidas sem ninguém esperando. Com tudo em uso, quem pede entra numa fila
+    FIFO (a conexão devolvida vai direto para o primeiro da fila) e recebe
+    PoolEsgotado depois de `timeout` segundos, em vez de abrir logins sem limite.
+    Conexões livres além do mínimo paradas há mais de `ociosidade_encerrar`
+    segundos são fechadas.
+
+    Na retirada, só a conexão parada há mais de `ociosidade_validacao` segundos
+    passa por um SELECT 1; conexões com mais de `vida_maxima` segundos são
+    trocadas por novas. Conexões cujo driver acusou queda numa consulta real
+    (SQLSTATE 08xxx) são descartadas na devolução, sem ping.
+    """
+
+    def __init__(self, string_conexao, minimo=POOL_MINIMO, maximo=POOL_MAXIMO, excedente=POOL_EXCEDENTE,
+                 timeout=POOL_TIMEOUT, ociosidade_validacao=POOL_OCIOSIDADE_VALIDACAO,
+                 ociosidade_encerrar=POOL_OCIOSIDADE_ENCERRAR, vida_maxima=POOL_VIDA_MAXIMA):
+        if not 0 <= minimo <= maximo:
+            raise ValueError(f"Pool inválido: mínimo {minimo}, máximo {maximo}")
+        self.string_conexao = string_conexao
+        self.minimo = minimo
+        self.maximo = maximo
+        self.excedente = excedente
+        self.timeout = timeout
+        self.ociosidade_validacao = ociosidade_validacao
+        self.ociosidade_encerrar = ociosidade_encerrar
+        self.vida_maxima = vida_maxima
+        self._livres = deque()   # à direita as usadas mais recentemente
+        self._fila = deque()     # _Espera na ordem de chegada
+        self._abertas = 0        # livres + em uso + vagas reservadas para abrir
+        self._pico_abertas = 0
+        self._lock = threading.Lock()
+        self._metricas = {
+            'retiradas': 0, 'esperas': 0, 'timeouts': 0, 'criacoes': 0, 'descartes': 0,
+            'reciclagens': 0, 'validacoes': 0, 'devolucoes': 0, 'excedentes_fechadas': 0,
+            'ociosas_fechadas': 0,
+        }
+        self._histograma = [0] * (len(FAIXAS_ESPERA_MS) + 1)
+        self._espera_total = 0.0
+        self._espera_maxima = 0.0
+
+    def _contar(self, metrica):
+        with self._lock:
+            self._metricas[metrica] += 1
+
+    def _criar(self):
+        conexao = ConexaoMonitorada(pyodbc.connect(self.string_conexao), self)
+        self._contar('criacoes')
+        return conexao
+
+    def _validar(self, conexao):
+        """SELECT 1 numa conexão que ficou parada tempo demais"""
+        self._contar('validacoes')
+        try:
+            cursor = conexao.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception as e:
+            logging.warning(f"Conexão ociosa inválida no pool, descartando: {e}")
+            return False
+
+    def _liberar_vaga(self):
+        """Uma conexão aberta deixou de existir (chamar com o lock)"""
+        if self._fila:
+            espera = self._fila.popleft()
+            espera.criar = True  # a vaga passa direto para o primeiro da fila
+            espera.evento.set()
+        else:
+            self._abertas -= 1
+
+    def _descartar(self, conexao, metrica='descartes'):
+        conexao.fechar()
+        with self._lock:
+            self._metricas[metrica] += 1
+            self._liberar_vaga()
+
+    def _reservar(self, prazo):
+        """Conexão livre, vaga para abrir uma nova, ou a vez na fila (espera até o prazo)"""
+        ociosas = []
+        try:
+            with self._lock:
+                self._metricas['retiradas'] += 1
+                if not self._fila:
+                    # Encolhe: as menos usadas, paradas há muito tempo, além do mínimo
+                    agora = time.time()
+                    while (self._livres and self._abertas > self.minimo
+                           and agora - self._livres[0].usada_em > self.ociosidade_encerrar):
+                        ociosas.append(self._livres.popleft())
+                        self._abertas -= 1
+                        self._metricas['ociosas_fechadas'] += 1
+                    if self._livres:
+                        return self._livres.pop(), False
+                    if self._abertas < self.maximo + self.excedente:
+                        self._abertas += 1
+                        self._pico_abertas = max(self._pico_abertas, self._abertas)
+                        return None, True
+
+                espera = _Espera()
+                self._fila.append(espera)
+                self._metricas['esperas'] += 1
+        finally:
+            for conexao in ociosas:
+                conexao.fechar()
+
+        espera.evento.wait(max(prazo - time.monotonic(), 0))
+        with self._lock:
+            if espera.conexao is None and not espera.criar:
+                self._fila.remove(espera)
+                self._metricas['timeouts'] += 1
+                raise PoolEsgotado(
+                    f"Nenhuma conexão livre em {self.timeout}s ({self._abertas} abertas, {len(self._fila)} na fila)"
+                )
+        return espera.conexao, espera.criar
+
+    def _registrar_espera(self, segundos):
+        milissegundos = segundos * 1000
+        faixa = next((i for i, limite in enumerate(FAIXAS_ESPERA_MS) if milissegundos <= limite), len(FAIXAS_ESPERA_MS))
+        with self._lock:
+            self._histograma[faixa] += 1
+            self._espera_total += segundos
+            self._espera_maxima = max(self._espera_maxima, segundos)
+
+    def aquecer(self, prontas=POOL_AQUECIMENTO_PRONTAS, espera_maxima=POOL_AQUECIMENTO_ESPERA):
+        """Abre as `minimo` conexões do pool em paralelo, em segundo plano.
+
+        Bloqueia só até `prontas` conexões abertas, até todas as tentativas
+        falharem ou por `espera_maxima` segundos; as demais continuam abrindo em
+        segundo plano (e pedidos que chegarem antes abrem a sua sob demanda).
+        Devolve quantas conexões estavam abertas ao retornar.
+        """
+        with self._lock:
+            faltam = max(self.minimo - self._abertas, 0)
+            self._abertas += faltam
+            self._pico_abertas = max(self._pico_abertas, self._abertas)
+        if not faltam:
+            return 0
+
+        resultado = {'abertas': 0, 'falhas': 0}
+        concluido = threading.Condition()
+
+        def abrir(numero):
+            try:
+                conexao = self._criar()
+            except Exception as e:
+                logging.error(f"Erro ao criar conexão {numero}: {e}")
+                with self._lock:
+                    self._liberar_vaga()
+                situacao = 'falhas'
+            else:
+                self.devolver(conexao)
+                logging.info(f"Conexão {numero} criada com sucesso")
+                situacao = 'abertas'
+            with concluido:
+                resultado[situacao] += 1
+                concluido.notify_all()
+
+        for numero in range(1, faltam + 1):
+            threading.Thread(target=abrir, args=(numero,), name=f"pool-aquecimento-{numero}", daemon=True).start()
+
+        alvo = min(prontas, faltam)
+        with concluido:
+            concluido.wait_for(
+                lambda: resultado['abertas'] >= alvo or resultado['abertas'] + resultado['falhas'] >= faltam,
+                timeout=espera_maxima
+            )
+            return resultado['abertas']
+
+    def obter(self):
+        """Retira uma conexão; espera na fila até `timeout` s com o pool no limite (PoolEsgotado)"""
+        inicio = time.monotonic()
+        prazo = inicio + self.timeout
+        while True:
+            conexao, criar = self._reservar(prazo)
+            if criar:
+                try:
+                    conexao = self._criar()
+                except Exception:
+                    with self._lock:
+                        self._liberar_vaga()
+                    raise
+                break
+
+            agora = time.time()
+            if agora - conexao.criada_em > self.vida_maxima:
+                self._descartar(conexao, 'reciclagens')
+            elif agora - conexao.usada_em > self.ociosidade_validacao and not self._validar(conexao):
+                self._descartar(conexao)
+            else:
+                break
+
+        self._registrar_espera(time.monotonic() - inicio)
+        conexao.emprestada = True
+        return conexao
+
+    def devolver(self, conexao):
+        """Devolve a conexão (depois de um rollback): vai para o primeiro da fila, para as livres, ou é fechada"""
+        if not isinstance(conexao, ConexaoMonitorada):
+            conexao.close()
+            return
+        with self._lock:
+            if not conexao.emprestada:
+                return  # já devolvida (ex.: close() depois de return_connection)
+            conexao.emprestada = False
+        if conexao.perdida:
+            logging.warning("Conexão perdida (erro do driver) descartada do pool")
+            self._descartar(conexao)
+            return
+        if time.time() - conexao.criada_em > self.vida_maxima:
+            self._descartar(conexao, 'reciclagens')
+            return
+        try:
+            conexao.rollback()
+        except Exception as e:
+            logging.warning(f"Rollback na devolução falhou, conexão descartada do pool: {e}")
+            self._descartar(conexao)
+            return
+
+        conexao.usada_em = time.time()
+        with self._lock:
+            self._metricas['devolucoes'] += 1
+            if self._fila:
+                espera = self._fila.popleft()
+                espera.conexao = conexao
+                espera.evento.set()
+                return
+            if self._abertas <= self.maximo:
+                self._livres.append(conexao)
+                return
+            self._abertas -= 1
+            self._metricas['excedentes_fechadas'] += 1
+        conexao.fechar()
+
+    def disponiveis(self):
+        return len(self._livres)
+
+    def metricas(self):
+        """Contadores, ocupação e histograma de espera do pool para o /health"""
+        with self._lock:
+            metricas = dict(self._metricas)
+            rotulos = [f"<={limite}ms" for limite in FAIXAS_ESPERA_MS] + [f">{FAIXAS_ESPERA_MS[-1]}ms"]
+            metricas.update(
+                minimo=self.minimo,
+                maximo=self.maximo,
+                excedente=self.excedente,
+                abertas=self._abertas,
+                livres=len(self._livres),
+                em_uso=self._abertas - len(self._livres),
+                aguardando=len(self._fila),
+                pico_abertas=self._pico_abertas,
+                espera_histograma=dict(zip(rotulos, self._histograma)),
+                espera_media_ms=round(self._espera_total * 1000 / max(sum(self._histograma), 1), 2),
+                espera_maxima_ms=round(self._espera_maxima * 1000, 2),
+            )
+        return metricas
+
+
+# Pool do processo, compartilhado por todos os módulos que importam daqui
+connection_pool = PoolConexoes(STRING_CONEXAO)
+
+def init_connection_pool():
+    """Aquece o pool em paralelo; retorna quando as primeiras conexões estão prontas"""
+    return connection_pool.aquecer()
+
 def get_connection():
-    return pyodbc.connect(
-        'DRIVER={SQL Server};'
-        'SERVER=localhost;'
-        'DATABASE=powerbi;'
-        'Trusted_Connection=yes;'
-    )
\ No newline at end of file
+    """Obtém conexão do pool; com o pool no limite espera na fila (PoolEsgotado após o timeout)"""
+    return connection_pool.obter()
+
+def return_connection(conn):
+    """Devolve a conexão ao pool (descarta as que o driver acusou como perdidas)"""
+    try:
+        connection_pool.devolver(conn)
+    except Exception as e:
+        logging.warning(f"Erro ao devolver conexão ao pool: {e}")
+
+@contextmanager
+def conexao():
+    """Conexão do pool para um bloco with: sempre devolvida, e o que não teve commit é desfeito"""
+    conn = get_connection()
+    try:
+        yield conn
+    finally:
+        return_connection(conn)  # a devolução faz o rollback
@@ -1,9 +1,10 @@
 import pandas as pd
-import pyodbc
 from datetime import datetime
-import re
 import requests
 import json
+from database import conexao  # Pool de conexões compartilhado (database.py)
+from planilhas import ler_planilha
+from listagens import registrar_alteracao  # Delta-sync do sarbackend (/api/chamados/changes)
 
 # Configurações
 EXCEL_PATH = r'C:\Users\Paulo Lucas\OneDrive - Claro SA\USER-DTC_HE_INFRA - ES - Documentos\Acionamento Datacenter_Headend ES1.xlsx'
@@ -40,17 +41,6 @@ MAPEAMENTO_COLUNAS = {
     'status': 'Status'  # importante!
 }
 
-def normalizar_coluna(nome):
-    return re.sub(r'[:\s]+$', '', nome.strip().lower())
-
-def conectar_banco():
-    return pyodbc.connect(
-        'DRIVER={SQL Server};'
-        'SERVER=localhost;'
-        'DATABASE=powerbi;'
-        'Trusted_Connection=yes;'
-    )
-
 def criar_chamado_redmine(linha):
     payload = {
         "issue": {
@@ -86,11 +76,8 @@ def criar_chamado_redmine(linha):
         print(f"❌ Erro ao criar chamado: {response.text}")
 
 def importar_dados():
-    conn = conectar_banco()
-    cursor = conn.cursor()
-
-    df = pd.read_excel(EXCEL_PATH, sheet_name=ABA)
-    df.columns = [normalizar_coluna(col) for col in df.columns]
+    # Colunas já normalizadas; usa o espelho em pickle quando a planilha não mudou
+    df = ler_planilha(EXCEL_PATH, ABA)
 
     colunas_faltando = [col for col in MAPEAMENTO_COLUNAS if col not in df.columns]
     if colunas_faltando:
@@ -102,23 +89,26 @@ def importar_dados():
 
     pendentes = df[df['Status'].str.lower() == 'pendente']
 
-    for i, row in pendentes.iterrows():
-        valores = [row[col] if not pd.isna(row[col]) else None for col in df.columns]
-        placeholders = ", ".join("?" for _ in df.columns)
-        colunas_sql = ", ".join(f"[{col}]" for col in df.columns)
-
-        try:
-            cursor.execute(f"""
-                INSERT INTO dbo.[GRC-Chamados] ({colunas_sql})
-                VALUES ({placeholders})
-            """, *valores)
-            print(f"📥 Inserido no banco ID={row['ID']}")
-            criar_chamado_redmine(row)
-        except Exception as e:
-            print(f"❌ Erro ao inserir/mandar chamado ID={row['ID']}: {e}")
-
-    conn.commit()
-    conn.close()
+    # Conexão do pool só depois de ler a planilha
+    with conexao() as conn:
+        cursor = conn.cursor()
+        for i, row in pendentes.iterrows():
+            valores = [row[col] if not pd.isna(row[col]) else None for col in df.columns]
+            placeholders = ", ".join("?" for _ in df.columns)
+            colunas_sql = ", ".join(f"[{col}]" for col in df.columns)
+
+            try:
+                cursor.execute(f"""
+                    INSERT INTO dbo.[GRC-Chamados] ({colunas_sql})
+                    VALUES ({placeholders})
+                """, *valores)
+                registrar_alteracao(cursor, 'GRC-Chamados', int(row['ID']), 'U')
+                print(f"📥 Inserido no banco ID={row['ID']}")
+                criar_chamado_redmine(row)
+            except Exception as e:
+                print(f"❌ Erro ao inserir/mandar chamado ID={row['ID']}: {e}")
+
+        conn.commit()
     print("✅ Processo concluído.")
 
 importar_dados()
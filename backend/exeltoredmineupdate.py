@@ -9,12 +9,20 @@ from threading import Thread
 import logging
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
-from functools import lru_cache
 import asyncio
 import aiohttp
 import json
-from queue import Queue
 import threading
+from database import connection_pool, init_connection_pool, get_connection, return_connection
+from planilhas import MODO_PLANILHAS, obter_cache, obter_escritor, estatisticas_escritores
+from listagens import (
+    CAMPOS_CHAMADO, LIMITE_PAGINA_PADRAO, carregar_cache_esquema, verificar_esquema, compilar_projetor, ler_filtros,
+    ler_limite_paginacao, montar_consulta_chamados, registrar_alteracao, trocar_responsavel
+)
+from observacoes import (
+    ORIGEM_CHAMADO, gravar_observacao, separar_observacoes, obter_observacoes_db, ler_paginacao_observacoes,
+    responder_observacoes_lote
+)
 
 app = Flask(__name__)
 # Configuração CORS global
@@ -35,141 +43,29 @@ session.headers.update(HEADERS)
 executor = ThreadPoolExecutor(max_workers=10)
 
 # Cache para evitar leituras desnecessárias do Excel
-excel_cache = {}
-excel_cache_time = 0
-CACHE_DURATION = 60
-
-# Pool otimizado de conexões do banco
-connection_pool = Queue(maxsize=10)
-connection_lock = threading.Lock()
-
-def init_connection_pool():
-    """Pool otimizado com retry e validação"""
-    global connection_pool
-    for i in range(10):
-        try:
-            conn = pyodbc.connect(
-                'DRIVER={SQL Server};'
-                'SERVER=localhost;'
-                'DATABASE=powerbi;'
-                'Trusted_Connection=yes;'
-                'Connection Timeout=30;'
-                'Command Timeout=30;'
-            )
-            # Testa a conexão
-            cursor = conn.cursor()
-            cursor.execute("SELECT 1")
-            cursor.fetchone()
-            cursor.close()
-            
-            connection_pool.put(conn)
-            logging.info(f"Conexão {i+1} criada e testada com sucesso")
-        except Exception as e:
-            logging.error(f"Erro ao criar conexão {i+1}: {e}")
-
-def create_new_connection():
-    """Cria nova conexão quando o pool está vazio"""
-    return pyodbc.connect(
-        'DRIVER={SQL Server};'
-        'SERVER=localhost;'
-        'DATABASE=powerbi;'
-        'Trusted_Connection=yes;'
-        'Connection Timeout=30;'
-        'Command Timeout=30;'
-    )
 
-def get_connection():
-    """Obtém conexão com timeout e retry"""
-    try:
-        conn = connection_pool.get(timeout=5)
-        
-        try:
-            cursor = conn.cursor()
-            cursor.execute("SELECT 1")
-            cursor.fetchone()
-            cursor.close()
-            return conn
-        except Exception as e:
-            logging.warning(f"Conexão inválida do pool, criando nova: {e}")
-            try:
-                conn.close()
-            except Exception as close_e:
-                logging.error(f"Erro ao fechar conexão inválida: {close_e}")
-            return create_new_connection()
-            
-    except Exception as e:
-        logging.warning(f"Pool vazio ou timeout, criando nova conexão: {e}")
-        return create_new_connection()
+# Cache de leitura da planilha de chamados (planilhas.CachePlanilha: relê só quando o arquivo muda)
+cache_excel_chamados = obter_cache(EXCEL_PATH, ABA, 'id')
 
-def return_connection(conn):
-    """Retorna conexão para o pool com validação"""
+def get_cached_excel_data():
+    """Retrato atual da planilha de chamados, ou None se não foi possível ler"""
     try:
-        if connection_pool.qsize() < connection_pool.maxsize:
-            cursor = conn.cursor()
-            cursor.execute("SELECT 1")
-            cursor.fetchone()
-            cursor.close()
-            connection_pool.put(conn)
-        else:
-            conn.close()
+        return cache_excel_chamados.obter()
     except Exception as e:
-        logging.warning(f"Conexão inválida ao retornar para o pool, fechando: {e}")
-        try:
-            conn.close()
-        except Exception as close_e:
-            logging.error(f"Erro ao fechar conexão inválida ao retornar: {close_e}")
+        logging.error(f"Erro ao ler Excel: {e}")
+        return None
 
-@lru_cache(maxsize=100)
-def get_cached_excel_data():
-    """Cache dos dados do Excel com TTL"""
-    global excel_cache, excel_cache_time
-    current_time = time.time()
-    
-    if current_time - excel_cache_time > CACHE_DURATION:
-        try:
-            df = pd.read_excel(EXCEL_PATH, sheet_name=ABA)
-            df.columns = [re.sub(r'[:\s]+$', '', col.strip().lower()) for col in df.columns]
-            excel_cache = df.to_dict('records')
-            excel_cache_time = current_time
-        except Exception as e:
-            logging.error(f"Erro ao ler Excel: {e}")
-            return None
-    
-    return excel_cache
+# Escritor único da planilha: as alterações são gravadas em lote (planilhas.EscritorPlanilha)
+escritor_chamados = obter_escritor(EXCEL_PATH, ABA, 'id', ao_gravar=cache_excel_chamados.invalidar)
 
 def update_excel_optimized(chamado_id, novo_status, responsavel=None):
-    """Excel otimizado com cache inteligente e gravação direta"""
-    try:
-        df = pd.read_excel(EXCEL_PATH, sheet_name=ABA)
-        df.columns = [re.sub(r'[:\s]+$', '', col.strip().lower()) for col in df.columns]
-        
-        if 'id' not in df.columns:
-            logging.error("Coluna 'id' não encontrada no Excel.")
-            return False
-
-        mask = df['id'] == chamado_id
-        if not mask.any():
-            logging.warning(f"Chamado {chamado_id} não encontrado no Excel para atualização.")
-            return False
-            
-        if novo_status and 'status' in df.columns:
-            df.loc[mask, 'status'] = novo_status
-        
-        if responsavel is not None and 'responsavel' in df.columns:
-            df.loc[mask, 'responsavel'] = responsavel
-        
-        with pd.ExcelWriter(EXCEL_PATH, engine='openpyxl', mode='w') as writer:
-            df.to_excel(writer, sheet_name=ABA, index=False)
-        
-        global excel_cache_time
-        excel_cache_time = 0
-        get_cached_excel_data.cache_clear()
-        
-        return True
-        
-    except Exception as e:
-        logging.error(f"Erro ao atualizar Excel para chamado {chamado_id}: {e}")
-        return False
+    """Enfileira a alteração do chamado na planilha; devolve 'enfileirado', a gravação acontece em lote, em segundo plano"""
+    campos = {}
+    if novo_status:
+        campos['status'] = novo_status
+    if responsavel is not None:
+        campos['responsavel'] = responsavel
+    return escritor_chamados.enfileirar(chamado_id, campos)
 
 def update_redmine_optimized(chamado_id, status_id=None, notes=None, assignee_id=None):
     """Redmine otimizado com retry e timeout"""
@@ -214,8 +110,8 @@ def update_redmine_optimized(chamado_id, status_id=None, notes=None, assignee_id
     
     return False
 
-def update_database_optimized(chamado_id, operation_type, observacoes=None, campos_atualizacao=None):
-    """Operação de banco otimizada com prepared statement e suporte a observações/atualização genérica"""
+def update_database_optimized(chamado_id, operation_type, campos_atualizacao=None):
+    """Operação de banco otimizada com prepared statement e atualização genérica (observações: gravar_observacao)"""
     conn = None
     try:
         conn = get_connection()
@@ -223,19 +119,12 @@ def update_database_optimized(chamado_id, operation_type, observacoes=None, camp
         
         if operation_type == 'delete':
             cursor.execute("DELETE FROM dbo.[GRC-Chamados] WHERE ID = ?", (chamado_id,))
-        elif operation_type == 'update_observacoes':
-            cursor.execute(
-                "UPDATE dbo.[GRC-Chamados] SET Observacoes = ? WHERE ID = ?", 
-                (observacoes, chamado_id)
-            )
+            if cursor.rowcount:
+                registrar_alteracao(cursor, 'GRC-Chamados', chamado_id, 'D')
         elif operation_type == 'check_status':
             cursor.execute("SELECT COUNT(*) FROM dbo.[GRC-Chamados] WHERE ID = ?", (chamado_id,))
             result = cursor.fetchone()
             return result[0] > 0 if result else False
-        elif operation_type == 'get_observacoes':
-            cursor.execute("SELECT Observacoes FROM dbo.[GRC-Chamados] WHERE ID = ?", (chamado_id,))
-            result = cursor.fetchone()
-            return result[0] if result and result[0] else ""
         elif operation_type == 'get_responsavel':
             cursor.execute("SELECT Responsavel FROM dbo.[GRC-Chamados] WHERE ID = ?", (chamado_id,))
             result = cursor.fetchone()
@@ -249,6 +138,8 @@ def update_database_optimized(chamado_id, operation_type, observacoes=None, camp
                 values = list(campos_filtrados.values())
                 query = f"UPDATE dbo.[GRC-Chamados] SET {', '.join(set_clauses)} WHERE ID = ?"
                 cursor.execute(query, (*values, chamado_id))
+                if cursor.rowcount:
+                    registrar_alteracao(cursor, 'GRC-Chamados', chamado_id, 'U')
 
         conn.commit()
         return True
@@ -266,96 +157,70 @@ def update_database_optimized(chamado_id, operation_type, observacoes=None, camp
             return_connection(conn)
 
 # Funções utilitárias
-def obter_observacoes_chamado(chamado_id):
-    """Obtém as observações do chamado do banco de dados"""
-    return update_database_optimized(chamado_id, 'get_observacoes')
-
-def salvar_observacoes_chamado(chamado_id, observacoes):
-    """Salva as observações do chamado no banco de dados"""
-    return update_database_optimized(chamado_id, 'update_observacoes', observacoes=observacoes)
 
 def verificar_status_chamado(chamado_id):
     """Verifica se o chamado está ativo (não fechado/cancelado)"""
     return update_database_optimized(chamado_id, 'check_status')
 
-def formatar_observacao(usuario, observacao):
-    """Formata uma nova observação com timestamp e usuário"""
-    data_hora = datetime.now().strftime("%d/%m/%Y %H:%M")
-    return f"[{data_hora} - {usuario}]: {observacao}"
-
 # ============= ROTAS PRINCIPAIS (NOVAS) =============
 
 @app.route("/api/chamados", methods=["GET", "OPTIONS"])
 @cross_origin(methods=["GET", "OPTIONS"], supports_credentials=True)
 def listar_chamados():
-    """✅ NOVA ROTA: Lista todos os chamados para o frontend pai"""
+    """✅ NOVA ROTA: Lista os chamados para o frontend pai.
+
+    Sem parâmetros devolve a lista completa (compatibilidade). Com ?limit= e/ou
+    ?after_id= devolve uma página em ordem de ID decrescente e o cursor da próxima
+    página em "next_cursor" (None quando não há mais chamados).
+    ?status=, ?cidade=, ?responsavel=, ?tecnologia= e ?data_inicio=/?data_fim=
+    (sobre dataEvento) filtram no banco, como no sarbackend (listagens.ler_filtros).
+    """
     if request.method == "OPTIONS":
         return '', 200
-    
+
+    try:
+        limite = ler_limite_paginacao()
+        after_id = request.args.get('after_id')
+        after_id = int(after_id) if after_id not in (None, '') else None
+        filtro = ler_filtros('GRC-Chamados', CAMPOS_CHAMADO, 'dataEvento')
+    except ValueError as e:
+        return jsonify({"erro": f"Parâmetros de listagem inválidos: {e}"}), 400
+
+    paginado = limite is not None or after_id is not None
+    if paginado and limite is None:
+        limite = LIMITE_PAGINA_PADRAO
+
     conn = None
     try:
         conn = get_connection()
         cursor = conn.cursor()
-        
-        # ✅ PRIMEIRO: Descobrir quais colunas existem na tabela
-        cursor.execute("""
-            SELECT COLUMN_NAME 
-            FROM INFORMATION_SCHEMA.COLUMNS 
-            WHERE TABLE_NAME = 'GRC-Chamados' 
-            ORDER BY ORDINAL_POSITION
-        """)
-        
-        colunas_existentes = [row[0] for row in cursor.fetchall()]
-        logging.info(f"📋 Colunas encontradas na tabela: {colunas_existentes}")
-        
-        # ✅ SEGUNDO: Fazer query com todas as colunas (usando SELECT *)
-        cursor.execute("SELECT * FROM dbo.[GRC-Chamados] ORDER BY ID DESC")
+
+        # SELECT * buscando por ID; uma linha a mais que o limite indica próxima página
+        consulta, parametros = montar_consulta_chamados(limite + 1 if paginado else None, after_id, filtro)
+        cursor.execute(consulta, parametros)
         resultados = cursor.fetchall()
-        
-        # ✅ TERCEIRO: Mapear os resultados usando os índices das colunas
-        chamados = []
-        for row in resultados:
-            chamado = {}
-            
-            # Mapear cada coluna pelo índice
-            for i, coluna in enumerate(colunas_existentes):
-                valor = row[i] if i < len(row) else None
-                chamado[coluna] = valor if valor is not None else ''
-            
-            # ✅ Garantir que as colunas esperadas pelo frontend existam
-            chamado_padronizado = {
-                'id': chamado.get('ID', ''),
-                'nomeSolicitante': chamado.get('nomeSolicitante', chamado.get('NomeSolicitante', chamado.get('nome_solicitante', ''))),
-                'telefone': chamado.get('telefone', chamado.get('Telefone', '')),
-                'emailSolicitante': chamado.get('emailSolicitante', chamado.get('EmailSolicitante', chamado.get('email_solicitante', ''))),
-                'empresa': chamado.get('empresa', chamado.get('Empresa', '')),
-                'cidade': chamado.get('cidade', chamado.get('Cidade', '')),
-                'tecnologia': chamado.get('tecnologia', chamado.get('Tecnologia', '')),
-                'nodeAfetadas': chamado.get('nodeAfetadas', chamado.get('NodeAfetadas', chamado.get('node_afetadas', ''))),
-                'tipoReclamacao': chamado.get('tipoReclamacao', chamado.get('TipoReclamacao', chamado.get('tipo_reclamacao', ''))),
-                'detalhesProblema': chamado.get('detalhesProblema', chamado.get('DetalhesProblema', chamado.get('detalhes_problema', ''))),
-                'testesRealizados': chamado.get('testesRealizados', chamado.get('TestesRealizados', chamado.get('testes_realizados', ''))),
-                'modelEquipamento': chamado.get('modelEquipamento', chamado.get('ModelEquipamento', chamado.get('model_equipamento', ''))),
-                'baseAfetada': chamado.get('baseAfetada', chamado.get('BaseAfetada', chamado.get('base_afetada', ''))),
-                'contratosAfetados': chamado.get('contratosAfetados', chamado.get('ContratosAfetados', chamado.get('contratos_afetados', ''))),
-                'servicoAfetado': chamado.get('servicoAfetado', chamado.get('ServicoAfetado', chamado.get('servico_afetado', ''))),
-                'dataEvento': chamado.get('dataEvento', chamado.get('DataEvento', chamado.get('data_evento', ''))),
-                'horaInicio': chamado.get('horaInicio', chamado.get('HoraInicio', chamado.get('hora_inicio', ''))),
-                'horaConclusao': chamado.get('horaConclusao', chamado.get('HoraConclusao', chamado.get('hora_conclusao', ''))),
-                'status': chamado.get('status', chamado.get('Status', 'Pendente')),
-                'prioridade': chamado.get('prioridade', chamado.get('Prioridade', 'Baixa')),
-                'responsavel': chamado.get('responsavel', chamado.get('Responsavel', '')),
-                'observacoes': chamado.get('observacoes', chamado.get('Observacoes', ''))
-            }
-            
-            chamados.append(chamado_padronizado)
-        
+
+        tem_mais = paginado and len(resultados) > limite
+        if tem_mais:
+            resultados = resultados[:limite]
+
+        # Colunas do próprio SELECT (confere com o cache de esquema); projetor compilado uma vez por esquema
+        colunas = verificar_esquema('GRC-Chamados', (description[0] for description in cursor.description))
+        projetar = compilar_projetor(CAMPOS_CHAMADO, colunas)
+        chamados = [projetar(row) for row in resultados]
+
         cursor.close()
-        
+
         logging.info(f"✅ Listando {len(chamados)} chamados para o frontend")
-        logging.info(f"📄 Exemplo do primeiro chamado: {chamados[0] if chamados else 'Nenhum chamado encontrado'}")
-        
-        return jsonify(chamados), 200
+
+        if not paginado:
+            return jsonify(chamados), 200
+
+        return jsonify({
+            "chamados": chamados,
+            "next_cursor": chamados[-1]['id'] if tem_mais else None,
+            "limit": limite
+        }), 200
         
     except Exception as e:
         logging.error(f"❌ Erro ao listar chamados: {e}")
@@ -373,6 +238,11 @@ def atualizar_chamado_api(id):
     
     dados = request.get_json()
     logging.info(f"✅ Atualizando chamado {id} via API com dados: {dados}")
+
+    try:
+        dados = separar_observacoes(dados)
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
     
     try:
         # Usando a função de atualização otimizada do banco
@@ -431,6 +301,11 @@ def atualizar_chamado_direto(id):
         
     dados = request.get_json()
     logging.info(f"✅ Atualizando chamado {id} diretamente com dados: {dados}")
+
+    try:
+        dados = separar_observacoes(dados)
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
     
     try:
         success = update_database_optimized(id, 'generic_update', campos_atualizacao=dados)
@@ -463,39 +338,32 @@ def assumir_chamado_endpoint(id):
         return jsonify({"erro": "Responsável não fornecido."}), 400
 
     try:
-        # 1. Validação: Verifica se o chamado existe
-        if not verificar_status_chamado(id):
+        # 1. Assume no banco só se o chamado estiver livre (ou já for deste responsável)
+        resultado, responsavel_atual = trocar_responsavel('GRC-Chamados', id, responsavel, esperado=responsavel)
+
+        if resultado == 'nao_encontrado':
             return jsonify({"erro": "Chamado não encontrado."}), 404
-        
-        # 2. Verifica se o chamado já tem responsável
-        responsavel_atual = update_database_optimized(id, 'get_responsavel')
-        
-        if responsavel_atual and responsavel_atual.strip():
+        if resultado == 'conflito':
             # Chamado já foi assumido por outro usuário
-            if responsavel_atual.strip() != responsavel.strip():
-                return jsonify({
-                    "erro": f"Chamado já foi assumido por {responsavel_atual}",
-                    "responsavel_atual": responsavel_atual,
-                    "conflito": True
-                }), 409
-            else:
-                # Mesmo usuário tentando assumir novamente
-                return jsonify({
-                    "success": True,
-                    "mensagem": f"Chamado já estava assumido por {responsavel}",
-                    "responsavel_atual": responsavel,
-                    "responsavel_nome": responsavel,
-                    "ja_assumido": True,
-                    "apenas_visual": apenas_visual
-                }), 200
-            
-        # 3. Atualização no banco de dados
-        db_success = update_database_optimized(id, 'generic_update', campos_atualizacao={'Responsavel': responsavel})
-        
-        if not db_success:
+            return jsonify({
+                "erro": f"Chamado já foi assumido por {responsavel_atual}",
+                "responsavel_atual": responsavel_atual,
+                "conflito": True
+            }), 409
+        if resultado == 'inalterado':
+            # Mesmo usuário tentando assumir novamente
+            return jsonify({
+                "success": True,
+                "mensagem": f"Chamado já estava assumido por {responsavel}",
+                "responsavel_atual": responsavel,
+                "responsavel_nome": responsavel,
+                "ja_assumido": True,
+                "apenas_visual": apenas_visual
+            }), 200
+        if resultado == 'erro':
             return jsonify({"erro": "Erro ao assumir o chamado no banco."}), 500
 
-        # 4. Atualizações assíncronas APENAS se não for apenas visual
+        # 2. Atualizações assíncronas APENAS se não for apenas visual
         if not apenas_visual:
             def update_external_systems():
                 try:
@@ -507,7 +375,7 @@ def assumir_chamado_endpoint(id):
 
             executor.submit(update_external_systems)
 
-        # 5. Resposta rápida ao frontend
+        # 3. Resposta rápida ao frontend
         response_data = {
             "success": True,
             "mensagem": f"Chamado assumido por {responsavel}",
@@ -536,18 +404,32 @@ def liberar_chamado_endpoint(id):
     try:
         data = request.get_json() or {}
         apenas_visual = data.get("apenas_visual", False)
-        
-        # 1. Validação: Verifica se o chamado existe
-        if not verificar_status_chamado(id):
-            return jsonify({"erro": "Chamado não encontrado."}), 404
+        # Opcional: só libera se o chamado ainda for de quem pediu (senão 409)
+        responsavel = data.get("responsavel") or None
 
-        # 2. Atualização no banco de dados (responsável para NULL)
-        db_success = update_database_optimized(id, 'generic_update', campos_atualizacao={'Responsavel': None})
-        
-        if not db_success:
+        # 1. Responsável para NULL no banco
+        resultado, responsavel_atual = trocar_responsavel('GRC-Chamados', id, None, esperado=responsavel)
+
+        if resultado == 'nao_encontrado':
+            return jsonify({"erro": "Chamado não encontrado."}), 404
+        if resultado == 'conflito':
+            return jsonify({
+                "erro": f"Chamado está assumido por {responsavel_atual}",
+                "responsavel_atual": responsavel_atual,
+                "conflito": True
+            }), 409
+        if resultado == 'inalterado':
+            return jsonify({
+                "success": True,
+                "mensagem": "Chamado já estava livre",
+                "responsavel_atual": None,
+                "ja_liberado": True,
+                "apenas_visual": apenas_visual
+            }), 200
+        if resultado == 'erro':
             return jsonify({"erro": "Erro ao liberar o chamado no banco."}), 500
 
-        # 3. Atualizações assíncronas APENAS se não for apenas visual
+        # 2. Atualizações assíncronas APENAS se não for apenas visual
         if not apenas_visual:
             def update_external_systems():
                 try:
@@ -559,7 +441,7 @@ def liberar_chamado_endpoint(id):
 
             executor.submit(update_external_systems)
 
-        # 4. Resposta rápida ao frontend
+        # 3. Resposta rápida ao frontend
         response_data = {
             "success": True,
             "mensagem": "Chamado liberado com sucesso!",
@@ -675,47 +557,48 @@ def cancelar_chamado(id):
 
 # ============= ROTAS DE OBSERVAÇÕES =============
 
+@app.route("/chamados/observacoes", methods=["GET", "OPTIONS"])
+@cross_origin(origin="http://localhost:5173", methods=["GET", "OPTIONS"], supports_credentials=True)
+def obter_observacoes_chamados_lote():
+    """Observações de vários chamados numa consulta: ?ids=1,2,3 (ver responder_observacoes_lote)"""
+    return responder_observacoes_lote(ORIGEM_CHAMADO, int)
+
 @app.route("/chamados/<int:id>/observacoes", methods=["GET", "OPTIONS"])
 @cross_origin(origin="http://localhost:5173", methods=["GET", "OPTIONS"], supports_credentials=True)
 def obter_observacoes(id):
-    """Obtém todas as observações de um chamado"""
+    """Obtém as observações de um chamado.
+
+    Sem parâmetros devolve todas, da mais antiga para a mais recente. Com ?limit=
+    (e ?before=<id> para as anteriores) devolve as mais recentes primeiro e o
+    valor de ?before= da página seguinte em "next_before".
+    """
     if request.method == "OPTIONS":
         return '', 200
 
+    try:
+        limite, antes = ler_paginacao_observacoes()
+    except ValueError as e:
+        return jsonify({"erro": f"Parâmetros de paginação inválidos: {e}"}), 400
+
     try:
         if not verificar_status_chamado(id):
             return jsonify({"erro": "Chamado não encontrado"}), 404
 
-        observacoes_raw = obter_observacoes_chamado(id)
-        
-        observacoes_lista = []
-        if observacoes_raw:
-            observacoes_split = observacoes_raw.split('\n\n')
-            
-            for obs in observacoes_split:
-                obs = obs.strip()
-                if obs:
-                    match = re.match(r'\[(\d{2}/\d{2}/\d{4} \d{2}:\d{2}) - ([^\]]+)\]: (.+)', obs, re.DOTALL)
-                    if match:
-                        data_str, usuario, conteudo = match.groups()
-                        observacoes_lista.append({
-                            'data': data_str,
-                            'usuario': usuario,
-                            'observacao': conteudo.strip(),
-                            'timestamp': datetime.strptime(data_str, "%d/%m/%Y %H:%M").isoformat()
-                        })
-                    else:
-                        observacoes_lista.append({
-                            'data': 'Data não disponível',
-                            'usuario': 'Sistema',
-                            'observacao': obs,
-                            'timestamp': datetime.now().isoformat()
-                        })
+        if limite is None:
+            observacoes_lista = obter_observacoes_db(ORIGEM_CHAMADO, id)
+            return jsonify({
+                "success": True,
+                "observacoes": observacoes_lista,
+                "total": len(observacoes_lista)
+            })
 
+        observacoes_lista, proximo_antes = obter_observacoes_db(ORIGEM_CHAMADO, id, limite, antes)
         return jsonify({
             "success": True,
             "observacoes": observacoes_lista,
-            "total": len(observacoes_lista)
+            "total": len(observacoes_lista),
+            "next_before": proximo_antes,
+            "limit": limite
         })
 
     except Exception as e:
@@ -752,20 +635,9 @@ def adicionar_observacao(id):
         if not verificar_status_chamado(id):
             return jsonify({"erro": "Chamado não encontrado ou já finalizado"}), 404
 
-        # Obter observações existentes
-        observacoes_existentes = obter_observacoes_chamado(id)
-        
-        # Formatar nova observação
-        nova_observacao_formatada = formatar_observacao(usuario, nova_obs)
-        
-        # Concatenar com observações existentes
-        if observacoes_existentes:
-            observacoes_atualizadas = f"{observacoes_existentes}\n\n{nova_observacao_formatada}"
-        else:
-            observacoes_atualizadas = nova_observacao_formatada
-
-        # Salvar no banco de dados
-        if not update_database_optimized(id, 'update_observacoes', observacoes=observacoes_atualizadas):
+        # Um INSERT no histórico, sem reler nem regravar as observações anteriores
+        observacao = gravar_observacao(ORIGEM_CHAMADO, id, usuario, nova_obs)
+        if observacao is None:
             return jsonify({"erro": "Erro ao salvar observação no banco"}), 500
 
         # Atualizar no Redmine de forma assíncrona
@@ -777,12 +649,7 @@ def adicionar_observacao(id):
         return jsonify({
             "success": True,
             "mensagem": "Observação adicionada com sucesso",
-            "observacao": {
-                "data": datetime.now().strftime("%d/%m/%Y %H:%M"),
-                "usuario": usuario,
-                "observacao": nova_obs,
-                "timestamp": datetime.now().isoformat()
-            }
+            "observacao": observacao
         }), 201
 
     except Exception as e:
@@ -804,10 +671,13 @@ def health_check():
         
         return jsonify({
             "status": "healthy",
-            "pool_available_connections": connection_pool.qsize(),
-            "pool_max_size": connection_pool.maxsize,
+            "pool_available_connections": connection_pool.disponiveis(),
+            "pool_max_size": connection_pool.maximo,
+            "pool": connection_pool.metricas(),
             "total_chamados_no_banco": count,
-            "excel_cache_age_seconds": round(time.time() - excel_cache_time, 2),
+            "excel_cache_age_seconds": cache_excel_chamados.estatisticas()['idade_s'],
+            "excel_cache": cache_excel_chamados.estatisticas(),
+            "planilhas": estatisticas_escritores(),
             "timestamp": datetime.now().isoformat()
         })
     except Exception as e:
@@ -823,8 +693,8 @@ def status():
     """Status simples para compatibilidade"""
     return jsonify({
         "status": "OK",
-        "pool_connections": connection_pool.qsize(),
-        "excel_cache_age": time.time() - excel_cache_time
+        "pool_connections": connection_pool.disponiveis(),
+        "excel_cache_age": cache_excel_chamados.estatisticas()['idade_s']
     })
 
 # ============= INICIALIZAÇÃO DA APLICAÇÃO =============
@@ -840,15 +710,22 @@ if __name__ == '__main__':
         ]
     )
     
-    # Inicializar pool de conexões
+    # Inicializar pool de conexões (em paralelo; o restante abre em segundo plano)
     logging.info("🚀 Inicializando pool de conexões do banco de dados...")
-    init_connection_pool()
-    logging.info("✅ Pool de conexões inicializado.")
-
-    # Pré-carregar cache do Excel
-    logging.info("📊 Pré-carregando cache do Excel...")
-    get_cached_excel_data()
-    logging.info("✅ Cache do Excel pré-carregado.")
+    prontas = init_connection_pool()
+    logging.info(f"✅ Pool de conexões com {prontas} conexões prontas (mínimo {connection_pool.minimo}).")
+
+    # Cache de esquema das tabelas (listagem sem INFORMATION_SCHEMA por pedido)
+    if prontas:
+        logging.info("📋 Carregando esquema das tabelas...")
+        carregar_cache_esquema()
+    else:
+        logging.warning("📋 Banco indisponível na subida; esquema será carregado em segundo plano")
+        executor.submit(carregar_cache_esquema)
+
+    # Pré-carregar cache do Excel em segundo plano (a leitura da planilha não segura a subida)
+    logging.info(f"📊 Pré-carregando cache do Excel em segundo plano (planilhas em modo {MODO_PLANILHAS})...")
+    executor.submit(get_cached_excel_data)
     
     logging.info("🌐 Iniciando servidor Flask na porta 5000...")
     logging.info("📋 Endpoints disponíveis:")
@@ -860,6 +737,7 @@ if __name__ == '__main__':
     logging.info("   PUT  /chamados/:id/finalizar - Finalizar chamado")
     logging.info("   PUT  /chamados/:id/cancelar - Cancelar chamado")
     logging.info("   GET  /chamados/:id/observacoes - Buscar observações")
+    logging.info("   GET  /chamados/observacoes?ids= - Observações de vários chamados")
     logging.info("   PUT  /chamados/:id/observacao - Adicionar observação")
     logging.info("   GET  /health - Status da aplicação")
     
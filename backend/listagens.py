@@ -0,0 +1,477 @@
+"""Esquema das tabelas e projeção das listagens, compartilhados pelos serviços.
+
+sarbackend.py (SARs e chamados) e exeltoredmineupdate.py (chamados) listam as
+mesmas tabelas: as colunas de cada tabela ficam num cache de processo
+(INFORMATION_SCHEMA lido uma vez, não a cada pedido) e cada linha vira o dict do
+frontend por um projetor compilado uma vez por esquema (compilar_projetor).
+Os filtros da query string (ler_filtros) viram WHERE parametrizado nos dois.
+registrar_alteracao é a única forma de anotar uma escrita para o delta-sync,
+usada pelos dois serviços e pela importação da planilha (exeltoredmine.py);
+trocar_responsavel é o assumir/liberar condicional das duas tabelas.
+
+Uma carga do esquema que falha não é repetida a cada chamada: obter_colunas
+espera ESPERA_NOVA_CARGA_ESQUEMA segundos antes de tentar de novo, porque quem
+chama muitas vezes já segura uma conexão do pool (ex.: dentro de uma escrita).
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+from operator import itemgetter
+
+from flask import request
+
+from database import get_connection, return_connection
+
+# Registro de alterações do delta-sync (migrations/004 e 006: VersaoLinha é o token)
+TABELA_ALTERACOES = 'RegistroAlteracoes'
+COLUNA_VERSAO_ALTERACOES = 'VersaoLinha'
+TABELA_CORTE_ALTERACOES = 'RegistroAlteracoesCorte'
+
+# Cache de esquema (colunas em ORDINAL_POSITION) das tabelas da API
+TABELAS_ESQUEMA = ('GRC-Chamados', 'ExecucaoSar', TABELA_ALTERACOES)
+ESPERA_NOVA_CARGA_ESQUEMA = 30  # segundos entre tentativas depois de uma carga que falhou
+esquema_cache = {}
+esquema_cache_time = 0
+esquema_falha_time = 0
+esquema_lock = threading.Lock()
+_esquema_carga_lock = threading.Lock()
+
+
+def carregar_cache_esquema():
+    """Lê INFORMATION_SCHEMA.COLUMNS das tabelas da API e substitui o cache de esquema"""
+    global esquema_cache, esquema_cache_time, esquema_falha_time
+    conn = None
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        placeholders = ", ".join("?" for _ in TABELAS_ESQUEMA)
+        cursor.execute(f"""
+            SELECT TABLE_NAME, COLUMN_NAME
+            FROM INFORMATION_SCHEMA.COLUMNS
+            WHERE TABLE_SCHEMA = 'dbo' AND TABLE_NAME IN ({placeholders})
+            ORDER BY TABLE_NAME, ORDINAL_POSITION
+        """, TABELAS_ESQUEMA)
+
+        novo_cache = {tabela: [] for tabela in TABELAS_ESQUEMA}
+        for tabela, coluna in cursor.fetchall():
+            novo_cache[tabela].append(coluna)
+        cursor.close()
+
+        with esquema_lock:
+            esquema_cache = {tabela: tuple(colunas) for tabela, colunas in novo_cache.items()}
+            esquema_cache_time = time.time()
+            esquema_falha_time = 0
+
+        for tabela, colunas in esquema_cache.items():
+            logging.info(f"📋 Esquema de {tabela}: {len(colunas)} colunas")
+        return True
+    except Exception as e:
+        esquema_falha_time = time.time()
+        logging.error(f"Erro ao carregar cache de esquema (nova tentativa em {ESPERA_NOVA_CARGA_ESQUEMA}s): {e}")
+        return False
+    finally:
+        if conn:
+            return_connection(conn)
+
+
+def obter_colunas(tabela):
+    """Colunas da tabela a partir do cache de esquema (carrega sob demanda na primeira vez).
+
+    Sem esquema e com uma falha há menos de ESPERA_NOVA_CARGA_ESQUEMA segundos,
+    devolve () sem consultar o banco; só uma thread por vez tenta a carga.
+    """
+    if tabela in esquema_cache:
+        return esquema_cache[tabela]
+    if time.time() - esquema_falha_time < ESPERA_NOVA_CARGA_ESQUEMA:
+        return ()
+    with _esquema_carga_lock:
+        if tabela not in esquema_cache and time.time() - esquema_falha_time >= ESPERA_NOVA_CARGA_ESQUEMA:
+            carregar_cache_esquema()
+    return esquema_cache.get(tabela, ())
+
+
+def verificar_esquema(tabela, colunas_consulta):
+    """Confere as colunas de um SELECT * com o cache e o atualiza se o esquema mudou"""
+    global esquema_cache, esquema_cache_time
+    colunas_consulta = tuple(colunas_consulta)
+    if esquema_cache.get(tabela) != colunas_consulta:
+        logging.warning(f"🔄 Esquema de {tabela} mudou ({len(colunas_consulta)} colunas); atualizando cache")
+        with esquema_lock:
+            esquema_cache = {**esquema_cache, tabela: colunas_consulta}
+            esquema_cache_time = time.time()
+    return colunas_consulta
+
+
+def esquema_atual():
+    """{tabela: colunas} em cache, para o /health e a rota de recarga"""
+    return dict(esquema_cache)
+
+
+def estatisticas_esquema():
+    """Resumo do cache de esquema para o /health"""
+    return {
+        "esquema_colunas": {tabela: len(colunas) for tabela, colunas in esquema_cache.items()},
+        "esquema_cache_age_seconds": round(time.time() - esquema_cache_time, 2) if esquema_cache_time else None,
+    }
+
+
+def filtrar_colunas_existentes(tabela, campos):
+    """Mantém só os campos que são colunas da tabela, com a grafia da coluna real.
+
+    Sem esquema em cache os campos passam sem filtro, como antes.
+    """
+    colunas = obter_colunas(tabela)
+    if not colunas:
+        return campos
+
+    por_nome = {coluna.lower(): coluna for coluna in colunas}
+    filtrados = {}
+    for campo, valor in campos.items():
+        coluna = por_nome.get(campo.lower())
+        if coluna is None:
+            logging.warning(f"Campo '{campo}' ignorado: não existe em {tabela}")
+        else:
+            filtrados[coluna] = valor
+    return filtrados
+
+
+def registrar_alteracao(cursor, tabela, chave, operacao):
+    """Anota a escrita ('U' ou 'D') no registro do delta-sync, na mesma transação.
+
+    Sem a tabela de registro (migração 004 não aplicada) não faz nada. Uma falha
+    ao anotar só gera aviso e vale só para esta escrita: a escrita principal
+    continua valendo e o cliente só a recebe na próxima carga completa.
+    """
+    if not obter_colunas(TABELA_ALTERACOES):
+        return
+    try:
+        cursor.execute(
+            f"INSERT INTO dbo.[{TABELA_ALTERACOES}] (Tabela, Chave, Operacao) VALUES (?, ?, ?)",
+            (tabela, str(chave), operacao)
+        )
+    except Exception as e:
+        logging.warning(f"Alteração de {tabela} {chave} não registrada para o delta-sync: {e}")
+
+
+# Assumir/liberar: tabela -> (coluna da chave, coluna do responsável)
+COLUNAS_RESPONSAVEL = {
+    'GRC-Chamados': ('ID', 'Responsavel'),
+    'ExecucaoSar': ('NumSar', 'ResponsavelDTC'),
+}
+
+
+def trocar_responsavel(tabela, chave, novo, esperado=None, ao_alterar=None):
+    """Assume (novo preenchido) ou libera (novo=None) o item com um UPDATE condicional.
+
+    O UPDATE só pega a linha se ela está livre ou já é de `esperado` (no assumir,
+    o próprio novo responsável; no liberar, quem pediu, ou None para liberar de
+    qualquer um), e o OUTPUT devolve o responsável anterior na mesma instrução:
+    de dois cliques simultâneos, só um assume. Só quando nenhuma linha é pega um
+    SELECT na mesma conexão separa "não encontrado" de conflito.
+
+    Devolve (resultado, responsavel_atual), com resultado 'alterado', 'inalterado'
+    (o item já estava assim), 'conflito', 'nao_encontrado' ou 'erro'. Só quando
+    alterou, e depois do commit, chama ao_alterar(tabela) (ex.: invalidar o cache
+    de listagens de quem tem um).
+    """
+    coluna_chave, coluna = COLUNAS_RESPONSAVEL[tabela]
+    condicao, parametros = "", [novo, chave]
+    if esperado is not None:
+        condicao = f" AND ([{coluna}] IS NULL OR LTRIM(RTRIM([{coluna}])) IN ('', ?))"
+        parametros.append(esperado.strip())
+
+    conn = None
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            f"UPDATE dbo.[{tabela}] SET [{coluna}] = ? OUTPUT DELETED.[{coluna}] "
+            f"WHERE [{coluna_chave}] = ?{condicao}",
+            parametros
+        )
+        row = cursor.fetchone()
+
+        if row is None:
+            cursor.execute(f"SELECT [{coluna}] FROM dbo.[{tabela}] WHERE [{coluna_chave}] = ?", (chave,))
+            atual = cursor.fetchone()
+            conn.rollback()
+            if atual is None:
+                return 'nao_encontrado', None
+            return 'conflito', atual[0]
+
+        anterior = (row[0] or '').strip()
+        if anterior == (novo or '').strip():
+            # Nada mudou: desfaz a regravação do mesmo valor (não muda VersaoLinha nem o ETag)
+            conn.rollback()
+            return 'inalterado', row[0]
+
+        registrar_alteracao(cursor, tabela, chave, 'U')
+        conn.commit()
+    except Exception as e:
+        logging.error(f"Erro ao trocar responsável de {tabela} {chave}: {e}")
+        if conn:
+            try:
+                conn.rollback()
+            except Exception as rollback_e:
+                logging.error(f"Erro ao tentar rollback: {rollback_e}")
+        return 'erro', None
+    finally:
+        if conn:
+            return_connection(conn)
+
+    if ao_alterar:
+        ao_alterar(tabela)
+    return 'alterado', novo
+
+
+# Paginação por cursor (keyset) das listagens e das observações
+LIMITE_PAGINA_PADRAO = 100
+LIMITE_PAGINA_MAXIMO = 1000
+
+# Filtros das listagens: parâmetro da query string = campo do frontend
+FILTROS_LISTAGEM = ('status', 'cidade', 'responsavel', 'tecnologia')
+MAXIMO_VALORES_FILTRO = 100
+
+# Mapeamento tabela -> frontend: (campo, colunas candidatas em ordem de preferência, padrão).
+# Vale a primeira candidata que existir na tabela; sem nenhuma, o campo recebe o padrão.
+CAMPOS_CHAMADO = (
+    ('id', ('ID',), ''),
+    ('nomeSolicitante', ('nomeSolicitante', 'NomeSolicitante', 'nome_solicitante'), ''),
+    ('telefone', ('telefone', 'Telefone'), ''),
+    ('emailSolicitante', ('emailSolicitante', 'EmailSolicitante', 'email_solicitante'), ''),
+    ('empresa', ('empresa', 'Empresa'), ''),
+    ('cidade', ('cidade', 'Cidade'), ''),
+    ('tecnologia', ('tecnologia', 'Tecnologia'), ''),
+    ('nodeAfetadas', ('nodeAfetadas', 'NodeAfetadas', 'node_afetadas'), ''),
+    ('tipoReclamacao', ('tipoReclamacao', 'TipoReclamacao', 'tipo_reclamacao'), ''),
+    ('detalhesProblema', ('detalhesProblema', 'DetalhesProblema', 'detalhes_problema'), ''),
+    ('testesRealizados', ('testesRealizados', 'TestesRealizados', 'testes_realizados'), ''),
+    ('modelEquipamento', ('modelEquipamento', 'ModelEquipamento', 'model_equipamento'), ''),
+    ('baseAfetada', ('baseAfetada', 'BaseAfetada', 'base_afetada'), ''),
+    ('contratosAfetados', ('contratosAfetados', 'ContratosAfetados', 'contratos_afetados'), ''),
+    ('servicoAfetado', ('servicoAfetado', 'ServicoAfetado', 'servico_afetado'), ''),
+    ('dataEvento', ('dataEvento', 'DataEvento', 'data_evento'), ''),
+    ('horaInicio', ('horaInicio', 'HoraInicio', 'hora_inicio'), ''),
+    ('horaConclusao', ('horaConclusao', 'HoraConclusao', 'hora_conclusao'), ''),
+    ('status', ('status', 'Status'), 'Pendente'),
+    ('prioridade', ('prioridade', 'Prioridade'), 'Baixa'),
+    ('responsavel', ('responsavel', 'Responsavel'), ''),
+    ('observacoes', (), ''),  # Histórico em /chamados/observacoes (observacoes.py), não na listagem
+)
+
+CAMPOS_SAR = (
+    ('id', ('NumSar',), ''),  # Usar NumSar como ID
+    ('numeroSar', ('NumSar',), ''),
+    ('dataSolicitacao', ('DataSolicitacao',), ''),
+    ('cidade', ('Cidade',), ''),
+    ('acao', ('Acao',), ''),
+    ('areaTecnica', ('AreaTecnica',), ''),
+    ('designacao', ('Designacao',), ''),
+    ('enderecoNap', ('EnderecoNap',), ''),
+    ('quantPort', ('QuantPort',), 0),
+    ('caminho', ('Caminho',), ''),
+    ('status', ('Status',), 'Pendente'),
+    ('responsavelHub', ('ResponsavelHub',), ''),
+    ('dataVenc', ('DataVenc',), ''),
+    ('dataExecucao', ('DataExecucao',), ''),
+    ('dataCancelamento', ('DataCancelamento',), ''),
+    ('idadeExecucao', ('IdadeExecucao',), 0),
+    ('anoMes', ('AnoMes',), ''),
+    ('responsavelDTC', ('ResponsavelDTC',), ''),
+    ('idRedmine', ('ID_redmine',), 0),
+
+    # Campos adicionais para compatibilidade com o frontend
+    ('responsavel', ('ResponsavelDTC',), ''),
+    ('prioridade', (), 'Normal'),  # Campo não existe na tabela, usar padrão
+    ('tipoServico', ('Acao',), ''),
+    ('cliente', ('Designacao',), ''),
+    ('endereco', ('EnderecoNap',), ''),
+    ('tecnologia', ('AreaTecnica',), ''),
+    ('descricaoServico', (), ''),  # O quadro cai no caminho quando vem vazio
+    ('observacoes', (), ''),  # Histórico em /sars/observacoes (observacoes.py), não na listagem
+)
+
+
+def _por_nome(colunas):
+    """Nome real de cada coluna pelo nome em minúsculas, para comparar sem caixa"""
+    return {coluna.lower(): coluna for coluna in colunas}
+
+
+def _candidata(por_nome, candidatos):
+    """Primeira candidata presente em por_nome (sem caixa); None se nenhuma"""
+    return next((por_nome[c.lower()] for c in candidatos if c.lower() in por_nome), None)
+
+
+@lru_cache(maxsize=32)
+def compilar_projetor(campos, colunas):
+    """Compila, uma vez por esquema (tupla de colunas), a conversão linha -> dict do frontend.
+
+    A resolução das colunas candidatas acontece aqui; cada linha vira só um
+    itemgetter sobre os índices já resolvidos. As candidatas são comparadas sem
+    caixa, como nos filtros (resolver_coluna). Valores NULL viram '' e campos sem
+    coluna correspondente recebem o padrão, como no mapeamento original.
+    """
+    por_nome = _por_nome(colunas)
+    posicoes = {coluna: i for i, coluna in enumerate(colunas)}
+
+    chaves = []
+    indices = []
+    constantes = {}
+    for campo, candidatos, padrao in campos:
+        indice = posicoes.get(_candidata(por_nome, candidatos))
+        if indice is None:
+            constantes[campo] = padrao
+        else:
+            chaves.append(campo)
+            indices.append(indice)
+
+    if not indices:
+        return lambda row: dict(constantes)
+
+    chaves = tuple(chaves)
+    coletar = itemgetter(*indices)
+    unico = len(indices) == 1
+
+    def projetar(row):
+        valores = (coletar(row),) if unico else coletar(row)
+        item = {chave: ('' if valor is None else valor) for chave, valor in zip(chaves, valores)}
+        if constantes:
+            item.update(constantes)
+        return item
+
+    return projetar
+
+
+def resolver_coluna(tabela, campos, campo):
+    """Coluna real da tabela para um campo do frontend (candidatas comparadas sem caixa)"""
+    candidatos = next((c for nome, c, _ in campos if nome == campo), ())
+    colunas = obter_colunas(tabela)
+    if not colunas:
+        return candidatos[0] if candidatos else None
+
+    return _candidata(_por_nome(colunas), candidatos)
+
+
+def ler_campos_projecao(campos):
+    """Lê ?fields= (campos do frontend separados por vírgula); None quando todos foram pedidos"""
+    valor = request.args.get('fields')
+    if not valor:
+        return None
+    pedidos = {campo.strip() for campo in valor.split(',') if campo.strip()}
+    desconhecidos = pedidos - {nome for nome, _, _ in campos}
+    if desconhecidos:
+        raise ValueError(f"fields desconhecidos: {', '.join(sorted(desconhecidos))}")
+    return tuple(definicao for definicao in campos if definicao[0] in pedidos)
+
+
+def colunas_projecao(tabela, campos, obrigatorias):
+    """Colunas do SELECT para os campos pedidos, na ordem da tabela.
+
+    Usa a mesma coluna que compilar_projetor escolheria para cada campo, mais as
+    obrigatórias (chave do cursor de paginação). None (SELECT *) se não há
+    esquema em cache.
+    """
+    colunas = obter_colunas(tabela)
+    if not colunas:
+        return None
+    por_nome = _por_nome(colunas)
+    selecionadas = {por_nome.get(coluna.lower(), coluna) for coluna in obrigatorias}
+    for _, candidatos, _ in campos:
+        coluna = _candidata(por_nome, candidatos)
+        if coluna is not None:
+            selecionadas.add(coluna)
+    return tuple(coluna for coluna in colunas if coluna in selecionadas)
+
+
+def lista_select(colunas):
+    """Lista do SELECT: as colunas pedidas ou * quando colunas é None"""
+    return ", ".join(f"[{coluna}]" for coluna in colunas) if colunas else "*"
+
+
+def montar_consulta_chamados(limite=None, after_id=None, filtro=None, colunas=None):
+    """Monta o SELECT de chamados em ordem de ID decrescente, com filtros e seek opcional por after_id"""
+    condicoes, parametros = (list(filtro[0]), list(filtro[1])) if filtro else ([], [])
+    if after_id is not None:
+        condicoes.append("ID < ?")
+        parametros.append(after_id)
+
+    topo = "TOP (?) " if limite is not None else ""
+    where = f"WHERE {' AND '.join(condicoes)} " if condicoes else ""
+    if limite is not None:
+        parametros.insert(0, limite)
+    return f"SELECT {topo}{lista_select(colunas)} FROM dbo.[GRC-Chamados] {where}ORDER BY ID DESC", tuple(parametros)
+
+
+def ler_limite_paginacao():
+    """Lê ?limit= da query string; retorna None quando a listagem não é paginada"""
+    limite = request.args.get('limit')
+    if limite is None or limite == '':
+        return None
+    limite = int(limite)
+    if limite <= 0:
+        raise ValueError("limit deve ser maior que zero")
+    return min(limite, LIMITE_PAGINA_MAXIMO)
+
+
+def ler_data_filtro(nome):
+    """Lê uma data ISO (AAAA-MM-DD ou com hora) da query string; None se ausente"""
+    valor = request.args.get(nome)
+    if not valor:
+        return None, False
+    try:
+        return datetime.fromisoformat(valor), len(valor) == 10
+    except ValueError:
+        raise ValueError(f"{nome} deve ser uma data ISO (AAAA-MM-DD)")
+
+
+def ler_filtros(tabela, campos, campo_data):
+    """Converte os filtros da query string em condições WHERE parametrizadas.
+
+    ?status=, ?cidade=, ?responsavel= e ?tecnologia= aceitam vários valores
+    (repetindo o parâmetro ou separando por vírgula); ?data_inicio= e ?data_fim=
+    delimitam o campo de data da listagem (data_fim sem hora inclui o dia todo).
+    Retorna (condicoes, parametros) para montar_consulta_*.
+    """
+    condicoes, parametros = [], []
+    padroes = {nome: padrao for nome, _, padrao in campos}
+
+    for campo in FILTROS_LISTAGEM:
+        valores = [
+            valor.strip()
+            for bruto in request.args.getlist(campo)
+            for valor in bruto.split(',')
+            if valor.strip()
+        ]
+        if not valores:
+            continue
+        if len(valores) > MAXIMO_VALORES_FILTRO:
+            raise ValueError(f"no máximo {MAXIMO_VALORES_FILTRO} valores por filtro")
+
+        coluna = resolver_coluna(tabela, campos, campo)
+        if coluna is None:
+            raise ValueError(f"filtro '{campo}' não disponível para {tabela}")
+
+        placeholders = ", ".join("?" for _ in valores)
+        condicao = f"[{coluna}] IN ({placeholders})"
+        # O frontend exibe NULL/vazio como o valor padrão do campo (ex.: status 'Pendente')
+        if padroes.get(campo) in valores:
+            condicao = f"({condicao} OR [{coluna}] IS NULL OR [{coluna}] = '')"
+        condicoes.append(condicao)
+        parametros.extend(valores)
+
+    data_inicio, _ = ler_data_filtro('data_inicio')
+    data_fim, dia_inteiro = ler_data_filtro('data_fim')
+    if data_inicio or data_fim:
+        coluna = resolver_coluna(tabela, campos, campo_data)
+        if coluna is None:
+            raise ValueError(f"filtro de data não disponível para {tabela}")
+        if data_inicio:
+            condicoes.append(f"[{coluna}] >= ?")
+            parametros.append(data_inicio)
+        if data_fim:
+            condicoes.append(f"[{coluna}] < ?" if dia_inteiro else f"[{coluna}] <= ?")
+            parametros.append(data_fim + timedelta(days=1) if dia_inteiro else data_fim)
+
+    return condicoes, parametros
@@ -1,7 +1,7 @@
 import bcrypt
 from flask import Flask, request, jsonify
 import bcrypt
-from database import get_connection  # Importa do arquivo database.py
+from database import conexao  # Pool de conexões compartilhado (database.py)
 from flask_cors import CORS
 
 app = Flask(__name__)
@@ -16,11 +16,10 @@ def login():
     if not email or not senha:
         return jsonify({"message": "Email e senha são obrigatórios."}), 400
 
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT Usuario, Email, Senha FROM Register WHERE Email = ?", (email,))
-    result = cursor.fetchone()
-    conn.close()
+    with conexao() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT Usuario, Email, Senha FROM Register WHERE Email = ?", (email,))
+        result = cursor.fetchone()
 
     if result and bcrypt.checkpw(senha.encode('utf-8'), result[2].encode('utf-8')):
         nome, email_retornado, _ = result
@@ -0,0 +1,98 @@
+"""Migração única: textos acumulados de observações -> tabela HistoricoObservacoes.
+
+Lê GRC-Chamados.Observacoes e ExecucaoSar.Caminho, separa as entradas
+"[dd/mm/aaaa hh:mm - usuário]: texto" (observacoes.interpretar_texto) e grava uma
+linha por entrada. Nos chamados, o texto antes da primeira entrada (a observação
+do formulário de abertura) vira uma observação do usuário "Sistema" sem data, e
+Observacoes é esvaziada (NULL) na mesma transação: a coluna fica aposentada e
+pode ser removida depois (ver migrations/005). Nos SARs esse texto é o caminho
+original, que volta a ser o único conteúdo de Caminho.
+
+Pode ser executada de novo: itens que já têm linhas no histórico não são
+copiados outra vez, mas o texto que sobrou neles em Observacoes é esvaziado.
+Requer migrations/005_historico_observacoes.sql aplicada.
+
+Uso: python migrar_observacoes.py [--simular]
+"""
+import logging
+import sys
+
+from database import get_connection, return_connection
+from observacoes import TABELA_OBSERVACOES, ORIGEM_CHAMADO, ORIGEM_SAR, interpretar_texto
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+FONTES = (
+    # origem, tabela, coluna da chave, coluna com o texto acumulado
+    (ORIGEM_CHAMADO, 'GRC-Chamados', 'ID', 'Observacoes'),
+    (ORIGEM_SAR, 'ExecucaoSar', 'NumSar', 'Caminho'),
+)
+
+
+def migrar_fonte(cursor, origem, tabela, coluna_chave, coluna_texto, simular):
+    cursor.execute(f"SELECT DISTINCT Chave FROM dbo.[{TABELA_OBSERVACOES}] WHERE Origem = ?", (origem,))
+    ja_migrados = {row[0] for row in cursor.fetchall()}
+
+    cursor.execute(
+        f"SELECT [{coluna_chave}], [{coluna_texto}] FROM dbo.[{tabela}] "
+        f"WHERE [{coluna_texto}] IS NOT NULL AND [{coluna_texto}] <> ''"
+    )
+    linhas = cursor.fetchall()
+
+    registros, caminhos, esvaziar = [], [], []
+    for chave, texto in linhas:
+        if origem == ORIGEM_CHAMADO:
+            esvaziar.append((chave,))
+        if str(chave) in ja_migrados:
+            continue
+        prefixo, entradas = interpretar_texto(texto)
+        if origem == ORIGEM_SAR:
+            if not entradas:
+                continue  # Caminho sem observações: nada a migrar
+            caminhos.append((prefixo or None, chave))
+        elif prefixo:
+            registros.append((origem, str(chave), 'Sistema', prefixo, None))
+        registros.extend(
+            (origem, str(chave), usuario, texto_entrada, data)
+            for data, usuario, texto_entrada in entradas
+        )
+
+    logging.info(
+        f"{tabela}: {len(linhas)} textos lidos, {len(registros)} observações a gravar"
+        + (f", {len(caminhos)} Caminhos a restaurar" if origem == ORIGEM_SAR else f", {len(esvaziar)} textos a esvaziar")
+    )
+    if simular:
+        return
+
+    cursor.fast_executemany = True
+    if registros:
+        cursor.executemany(
+            f"INSERT INTO dbo.[{TABELA_OBSERVACOES}] (Origem, Chave, Usuario, Texto, DataCriacao) VALUES (?, ?, ?, ?, ?)",
+            registros
+        )
+    if esvaziar:
+        cursor.executemany(f"UPDATE dbo.[{tabela}] SET [{coluna_texto}] = NULL WHERE [{coluna_chave}] = ?", esvaziar)
+    if caminhos:
+        cursor.executemany(f"UPDATE dbo.[{tabela}] SET [{coluna_texto}] = ? WHERE [{coluna_chave}] = ?", caminhos)
+
+
+def main():
+    simular = '--simular' in sys.argv[1:]
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        for fonte in FONTES:
+            migrar_fonte(cursor, *fonte, simular)
+            conn.commit()  # uma transação por tabela
+        cursor.close()
+        logging.info("✅ Simulação concluída (nada foi gravado)" if simular else "✅ Migração concluída")
+    except Exception as e:
+        conn.rollback()
+        logging.error(f"❌ Erro na migração das observações: {e}")
+        raise
+    finally:
+        return_connection(conn)
+
+
+if __name__ == '__main__':
+    main()
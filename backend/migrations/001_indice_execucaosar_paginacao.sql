@@ -0,0 +1,15 @@
+-- Índice de apoio à paginação por cursor de GET /api/sars.
+-- A listagem busca por (DataSolicitacao, NumSar) em ordem decrescente; com este
+-- índice cada página é um seek seguido de TOP (limit + 1) linhas, sem ordenar a
+-- tabela inteira, independentemente de quantos SARs concluídos existam.
+
+IF NOT EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE name = 'IX_ExecucaoSar_DataSolicitacao_NumSar'
+      AND object_id = OBJECT_ID('dbo.[ExecucaoSar]')
+)
+BEGIN
+    CREATE NONCLUSTERED INDEX IX_ExecucaoSar_DataSolicitacao_NumSar
+        ON dbo.[ExecucaoSar] (DataSolicitacao DESC, NumSar DESC);
+END
+GO
@@ -0,0 +1,48 @@
+-- Índices de apoio aos filtros de GET /api/chamados e GET /api/sars
+-- (?status=, ?cidade=, ?responsavel=, ?tecnologia=, ?data_inicio=/?data_fim=).
+-- Cada índice começa pela coluna filtrada e termina na ordenação da listagem,
+-- então o filtro + paginação por cursor continua sendo um seek sem sort.
+-- O filtro de status 'Pendente' também busca NULL/'' (exibidos como Pendente).
+
+-- GRC-Chamados: ordenação por ID DESC
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_GRC_Chamados_Status_ID' AND object_id = OBJECT_ID('dbo.[GRC-Chamados]'))
+    CREATE NONCLUSTERED INDEX IX_GRC_Chamados_Status_ID ON dbo.[GRC-Chamados] (Status, ID DESC);
+GO
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_GRC_Chamados_Responsavel_ID' AND object_id = OBJECT_ID('dbo.[GRC-Chamados]'))
+    CREATE NONCLUSTERED INDEX IX_GRC_Chamados_Responsavel_ID ON dbo.[GRC-Chamados] (Responsavel, ID DESC);
+GO
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_GRC_Chamados_Cidade_ID' AND object_id = OBJECT_ID('dbo.[GRC-Chamados]'))
+    CREATE NONCLUSTERED INDEX IX_GRC_Chamados_Cidade_ID ON dbo.[GRC-Chamados] (Cidade, ID DESC);
+GO
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_GRC_Chamados_Tecnologia_ID' AND object_id = OBJECT_ID('dbo.[GRC-Chamados]'))
+    CREATE NONCLUSTERED INDEX IX_GRC_Chamados_Tecnologia_ID ON dbo.[GRC-Chamados] (Tecnologia, ID DESC);
+GO
+-- Período (?data_inicio=/?data_fim=): a API resolve a coluna de data do evento sem
+-- diferenciar maiúsculas (dataEvento/DataEvento/data_evento; exeltoredmine.py cria
+-- Data_Evento). O índice usa a grafia que existir na tabela.
+DECLARE @coluna_data SYSNAME = (
+    SELECT TOP (1) name FROM sys.columns
+    WHERE object_id = OBJECT_ID('dbo.[GRC-Chamados]')
+      AND LOWER(name) IN ('dataevento', 'data_evento')
+    ORDER BY CASE LOWER(name) WHEN 'dataevento' THEN 0 ELSE 1 END
+);
+IF @coluna_data IS NULL
+    PRINT 'GRC-Chamados sem coluna de data do evento: IX_GRC_Chamados_DataEvento não criado';
+ELSE IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_GRC_Chamados_DataEvento' AND object_id = OBJECT_ID('dbo.[GRC-Chamados]'))
+    EXEC (N'CREATE NONCLUSTERED INDEX IX_GRC_Chamados_DataEvento ON dbo.[GRC-Chamados] (' + QUOTENAME(@coluna_data) + N', ID DESC);');
+GO
+
+-- ExecucaoSar: ordenação por (DataSolicitacao DESC, NumSar DESC); o período usa
+-- IX_ExecucaoSar_DataSolicitacao_NumSar (001_indice_execucaosar_paginacao.sql)
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_ExecucaoSar_Status_Data' AND object_id = OBJECT_ID('dbo.[ExecucaoSar]'))
+    CREATE NONCLUSTERED INDEX IX_ExecucaoSar_Status_Data ON dbo.[ExecucaoSar] (Status, DataSolicitacao DESC, NumSar DESC);
+GO
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_ExecucaoSar_ResponsavelDTC_Data' AND object_id = OBJECT_ID('dbo.[ExecucaoSar]'))
+    CREATE NONCLUSTERED INDEX IX_ExecucaoSar_ResponsavelDTC_Data ON dbo.[ExecucaoSar] (ResponsavelDTC, DataSolicitacao DESC, NumSar DESC);
+GO
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_ExecucaoSar_Cidade_Data' AND object_id = OBJECT_ID('dbo.[ExecucaoSar]'))
+    CREATE NONCLUSTERED INDEX IX_ExecucaoSar_Cidade_Data ON dbo.[ExecucaoSar] (Cidade, DataSolicitacao DESC, NumSar DESC);
+GO
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_ExecucaoSar_AreaTecnica_Data' AND object_id = OBJECT_ID('dbo.[ExecucaoSar]'))
+    CREATE NONCLUSTERED INDEX IX_ExecucaoSar_AreaTecnica_Data ON dbo.[ExecucaoSar] (AreaTecnica, DataSolicitacao DESC, NumSar DESC);
+GO
@@ -0,0 +1,19 @@
+-- Coluna rowversion usada pelo GET condicional (ETag/304) de /api/chamados e /api/sars.
+-- O SQL Server incrementa a coluna a cada INSERT/UPDATE da linha; com o índice,
+-- COUNT_BIG(*) + MAX(VersaoLinha) vira a impressão digital barata da tabela.
+-- Sem esta migração as listagens respondem sempre 200, sem ETag.
+-- Depois de aplicar, chame POST /admin/esquema/recarregar (ou reinicie a API).
+
+IF COL_LENGTH('dbo.[GRC-Chamados]', 'VersaoLinha') IS NULL
+    ALTER TABLE dbo.[GRC-Chamados] ADD VersaoLinha ROWVERSION;
+GO
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_GRC_Chamados_VersaoLinha' AND object_id = OBJECT_ID('dbo.[GRC-Chamados]'))
+    CREATE NONCLUSTERED INDEX IX_GRC_Chamados_VersaoLinha ON dbo.[GRC-Chamados] (VersaoLinha);
+GO
+
+IF COL_LENGTH('dbo.[ExecucaoSar]', 'VersaoLinha') IS NULL
+    ALTER TABLE dbo.[ExecucaoSar] ADD VersaoLinha ROWVERSION;
+GO
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_ExecucaoSar_VersaoLinha' AND object_id = OBJECT_ID('dbo.[ExecucaoSar]'))
+    CREATE NONCLUSTERED INDEX IX_ExecucaoSar_VersaoLinha ON dbo.[ExecucaoSar] (VersaoLinha);
+GO
@@ -0,0 +1,23 @@
+-- Registro de alterações usado pelo delta-sync (GET /api/chamados/changes e /api/sars/changes).
+-- update_database_optimized / update_database_sar_optimized gravam uma linha por escrita
+-- ('U' = inserido/alterado, 'D' = removido) na mesma transação da alteração, assim como
+-- exeltoredmine.importar_dados para os chamados importados da planilha. O token devolvido ao
+-- cliente vem de VersaoLinha (migrations/006, aplicar junto). Escritas feitas direto no banco,
+-- por fora desses caminhos, não entram no registro: só chegam na carga completa (sem ?since=).
+-- Depois de aplicar, chame POST /admin/esquema/recarregar (ou reinicie a API).
+
+IF OBJECT_ID('dbo.[RegistroAlteracoes]', 'U') IS NULL
+    CREATE TABLE dbo.[RegistroAlteracoes] (
+        Versao        BIGINT IDENTITY(1, 1) NOT NULL CONSTRAINT PK_RegistroAlteracoes PRIMARY KEY,
+        Tabela        NVARCHAR(64)  NOT NULL,
+        Chave         NVARCHAR(100) NOT NULL,
+        Operacao      CHAR(1)       NOT NULL CONSTRAINT CK_RegistroAlteracoes_Operacao CHECK (Operacao IN ('U', 'D')),
+        DataAlteracao DATETIME2(0)  NOT NULL CONSTRAINT DF_RegistroAlteracoes_Data DEFAULT SYSUTCDATETIME()
+    );
+GO
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_RegistroAlteracoes_Tabela_Versao' AND object_id = OBJECT_ID('dbo.[RegistroAlteracoes]'))
+    CREATE NONCLUSTERED INDEX IX_RegistroAlteracoes_Tabela_Versao
+        ON dbo.[RegistroAlteracoes] (Tabela, Versao) INCLUDE (Chave, Operacao);
+GO
+
+-- Limpeza periódica: dbo.LimparRegistroAlteracoes (migrations/006_registro_alteracoes_versao.sql).
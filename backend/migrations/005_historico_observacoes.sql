@@ -0,0 +1,26 @@
+-- Histórico append-only das observações de chamados e SARs (backend/observacoes.py).
+-- Substitui os textos acumulados em GRC-Chamados.Observacoes e ExecucaoSar.Caminho.
+-- Ordem da implantação:
+--   1. aplicar este script;
+--   2. rodar "python migrar_observacoes.py" (use --simular para conferir antes) para
+--      converter os textos existentes e devolver ao Caminho dos SARs só o caminho;
+--   3. reiniciar sarbackend.py e exeltoredmineupdate.py.
+-- Depois disso GRC-Chamados.Observacoes fica vazia e nenhum código a lê ou grava; pode ser
+-- removida quando não houver mais versões antigas dos serviços rodando:
+--   ALTER TABLE dbo.[GRC-Chamados] DROP COLUMN Observacoes;  -- e POST /admin/esquema/recarregar
+
+IF OBJECT_ID('dbo.[HistoricoObservacoes]', 'U') IS NULL
+    CREATE TABLE dbo.[HistoricoObservacoes] (
+        ID          BIGINT IDENTITY(1, 1) NOT NULL CONSTRAINT PK_HistoricoObservacoes PRIMARY KEY,
+        Origem      VARCHAR(10)   NOT NULL CONSTRAINT CK_HistoricoObservacoes_Origem CHECK (Origem IN ('chamado', 'sar')),
+        Chave       NVARCHAR(100) NOT NULL,  -- ID do chamado ou NumSar
+        Usuario     NVARCHAR(200) NOT NULL,
+        Texto       NVARCHAR(MAX) NOT NULL,
+        DataCriacao DATETIME2(0)  NULL       -- NULL: texto antigo sem cabeçalho de data
+    );
+GO
+-- Observações de um item em ordem de inclusão (ID), sem sort
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_HistoricoObservacoes_Origem_Chave_ID' AND object_id = OBJECT_ID('dbo.[HistoricoObservacoes]'))
+    CREATE NONCLUSTERED INDEX IX_HistoricoObservacoes_Origem_Chave_ID
+        ON dbo.[HistoricoObservacoes] (Origem, Chave, ID) INCLUDE (DataCriacao, Usuario);
+GO
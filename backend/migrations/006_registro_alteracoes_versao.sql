@@ -0,0 +1,50 @@
+-- Token do delta-sync a partir do rowversion do registro (GET /api/chamados/changes e /api/sars/changes).
+-- O IDENTITY (Versao) é distribuído no INSERT, não no commit: uma transação lenta pode confirmar
+-- uma Versao menor que a de outra já entregue e o cliente que passou dela nunca a veria. A API
+-- agora usa VersaoLinha e só entrega o que está abaixo de MIN_ACTIVE_ROWVERSION() (transações
+-- já confirmadas). Tokens antigos (número puro) recebem uma carga completa e o token novo.
+-- Sem esta migração /changes responde 501. A limpeza do registro passa a ser feita por
+-- dbo.LimparRegistroAlteracoes, que anota o corte usado para expirar tokens antigos.
+-- Depois de aplicar, chame POST /admin/esquema/recarregar (ou reinicie a API).
+
+IF COL_LENGTH('dbo.RegistroAlteracoes', 'VersaoLinha') IS NULL
+    ALTER TABLE dbo.[RegistroAlteracoes] ADD VersaoLinha ROWVERSION NOT NULL;
+GO
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_RegistroAlteracoes_Tabela_VersaoLinha' AND object_id = OBJECT_ID('dbo.[RegistroAlteracoes]'))
+    CREATE NONCLUSTERED INDEX IX_RegistroAlteracoes_Tabela_VersaoLinha
+        ON dbo.[RegistroAlteracoes] (Tabela, VersaoLinha) INCLUDE (Chave, Operacao);
+GO
+
+-- Corte da limpeza por tabela: maior VersaoLinha já apagada. Token abaixo do corte pode ter
+-- perdido alterações e recebe a carga completa; sem linha aqui a tabela nunca foi limpa.
+IF OBJECT_ID('dbo.[RegistroAlteracoesCorte]', 'U') IS NULL
+    CREATE TABLE dbo.[RegistroAlteracoesCorte] (
+        Tabela      NVARCHAR(64) NOT NULL CONSTRAINT PK_RegistroAlteracoesCorte PRIMARY KEY,
+        VersaoCorte BIGINT       NOT NULL
+    );
+GO
+IF OBJECT_ID('dbo.LimparRegistroAlteracoes', 'P') IS NOT NULL
+    DROP PROCEDURE dbo.LimparRegistroAlteracoes;
+GO
+-- Limpeza periódica (ex.: job diário): EXEC dbo.LimparRegistroAlteracoes @Dias = 30;
+CREATE PROCEDURE dbo.LimparRegistroAlteracoes @Dias INT = 30
+AS
+BEGIN
+    SET NOCOUNT ON;
+    DECLARE @removidas TABLE (Tabela NVARCHAR(64) NOT NULL, Versao BIGINT NOT NULL);
+
+    BEGIN TRANSACTION;
+    DELETE FROM dbo.[RegistroAlteracoes]
+    OUTPUT deleted.Tabela, CAST(deleted.VersaoLinha AS BIGINT) INTO @removidas
+    WHERE DataAlteracao < DATEADD(DAY, -@Dias, SYSUTCDATETIME());
+
+    MERGE dbo.[RegistroAlteracoesCorte] AS corte
+    USING (SELECT Tabela, MAX(Versao) AS Versao FROM @removidas GROUP BY Tabela) AS limpas
+       ON corte.Tabela = limpas.Tabela
+    WHEN MATCHED AND limpas.Versao > corte.VersaoCorte THEN
+        UPDATE SET VersaoCorte = limpas.Versao
+    WHEN NOT MATCHED THEN
+        INSERT (Tabela, VersaoCorte) VALUES (limpas.Tabela, limpas.Versao);
+    COMMIT TRANSACTION;
+END
+GO
@@ -0,0 +1,348 @@
+"""Histórico de observações de chamados e SARs (tabela append-only HistoricoObservacoes).
+
+Cada observação é uma linha: adicionar é um único INSERT, sem reler nem regravar
+o histórico, e duas inclusões simultâneas não se sobrescrevem. Substitui os textos
+acumulados em GRC-Chamados.Observacoes e ExecucaoSar.Caminho
+("[dd/mm/aaaa hh:mm - usuário]: texto" separados por linha em branco), que
+migrar_observacoes.py converte uma única vez.
+
+As funções listar_* recebem o cursor de quem chama; obter_observacoes_db,
+obter_observacoes_lote_db e responder_observacoes_lote (corpo das rotas
+/observacoes dos dois serviços) abrem a conexão e passam pelo cache. Toda inclusão passa por
+gravar_observacao, a mesma nos dois serviços: o INSERT e a anotação do item no
+registro do delta-sync saem na mesma transação. As listagens não trazem
+observações (o quadro as busca em /observacoes); o campo "observacoes" das
+listagens e o PUT de chamados/SARs não leem nem gravam mais o texto acumulado.
+As leituras passam por um cache em memória por item (obter_em_cache), que a
+inclusão de observação invalida; o TTL cobre inclusões feitas pelo outro serviço.
+"""
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from flask import jsonify, request
+
+from database import conexao
+from listagens import LIMITE_PAGINA_PADRAO, ler_limite_paginacao, registrar_alteracao
+
+TABELA_OBSERVACOES = 'HistoricoObservacoes'
+ORIGEM_CHAMADO = 'chamado'
+ORIGEM_SAR = 'sar'
+TABELAS_ORIGEM = {ORIGEM_CHAMADO: 'GRC-Chamados', ORIGEM_SAR: 'ExecucaoSar'}
+FORMATO_DATA = "%d/%m/%Y %H:%M"
+
+# Consulta em lote (vários cards de uma vez)
+MAXIMO_CHAVES_LOTE = 500     # IDs aceitos por pedido
+TAMANHO_LOTE_CHAVES = 500    # chaves por IN (o SQL Server aceita até 2100 parâmetros)
+
+# Cache das observações já formatadas: (origem, chave) -> {página: (criado, dados)}
+CACHE_OBSERVACOES_MAXIMO = 2000  # itens
+CACHE_OBSERVACOES_TTL = 60  # segundos
+_cache_observacoes = OrderedDict()
+_geracoes_observacoes = {}  # (origem, chave) -> nº de invalidações, para descartar leituras concorrentes
+_cache_observacoes_lock = threading.Lock()
+
+PADRAO_OBSERVACAO = re.compile(r'\[(\d{2}/\d{2}/\d{4} \d{2}:\d{2}) - ([^\]]+)\]: (.+)', re.DOTALL)
+
+
+def interpretar_texto(texto):
+    """Divide um texto acumulado no formato antigo em (prefixo, entradas).
+
+    prefixo é o que vem antes da primeira entrada com cabeçalho (nos SARs, o
+    Caminho original); entradas é a lista de (data, usuario, texto) na ordem do
+    texto. Blocos sem cabeçalho depois de uma entrada são parágrafos dela: a
+    observação original tinha uma linha em branco.
+    """
+    prefixo, entradas = [], []
+    for bloco in (texto or '').split('\n\n'):
+        bloco = bloco.strip()
+        if not bloco:
+            continue
+
+        match = PADRAO_OBSERVACAO.match(bloco)
+        data = None
+        if match:
+            try:
+                data = datetime.strptime(match.group(1), FORMATO_DATA)
+            except ValueError:
+                match = None
+
+        if match:
+            entradas.append([data, match.group(2).strip(), match.group(3).strip()])
+        elif entradas:
+            entradas[-1][2] = f"{entradas[-1][2]}\n\n{bloco}"
+        else:
+            prefixo.append(bloco)
+
+    return '\n\n'.join(prefixo), [tuple(entrada) for entrada in entradas]
+
+
+def formatar_registro(registro_id, data, usuario, texto):
+    """Observação no formato devolvido pela API (o mesmo de antes da tabela)"""
+    return {
+        'id': registro_id,
+        'data': data.strftime(FORMATO_DATA) if data else 'Data não disponível',
+        'usuario': usuario,
+        'observacao': texto,
+        'timestamp': data.isoformat() if data else None
+    }
+
+
+def inserir_observacao(cursor, origem, chave, usuario, texto, data=None):
+    """Acrescenta uma observação (sem commit) e devolve o registro formatado"""
+    data = (data or datetime.now()).replace(microsecond=0)
+    cursor.execute(
+        f"INSERT INTO dbo.[{TABELA_OBSERVACOES}] (Origem, Chave, Usuario, Texto, DataCriacao) "
+        f"OUTPUT INSERTED.ID VALUES (?, ?, ?, ?, ?)",
+        (origem, str(chave), usuario, texto, data)
+    )
+    registro_id = cursor.fetchone()[0]
+    return formatar_registro(registro_id, data, usuario, texto)
+
+
+def gravar_observacao(origem, chave, usuario, texto):
+    """Acrescenta a observação e anota o item no delta-sync (uma transação); devolve o registro ou None em erro.
+
+    Invalida o cache de observações do item. As listagens não trazem observações
+    (CAMPOS_* em listagens.py), então o cache delas continua valendo.
+    """
+    try:
+        with conexao() as conn:
+            cursor = conn.cursor()
+            registro = inserir_observacao(cursor, origem, chave, usuario, texto)
+            registrar_alteracao(cursor, TABELAS_ORIGEM[origem], chave, 'U')
+            conn.commit()
+    except Exception as e:
+        logging.error(f"Erro ao gravar observação de {origem} {chave}: {e}")
+        return None
+    invalidar_observacoes(origem, chave)
+    return registro
+
+
+def separar_observacoes(campos):
+    """Tira 'observacoes' dos campos de um PUT de chamado/SAR: o histórico só cresce por gravar_observacao.
+
+    A lista que o quadro reenvia (o próprio histórico) é descartada. Texto devolve
+    ValueError, para quem gravava o campo direto saber que precisa usar
+    PUT /.../observacao em vez de ter a alteração ignorada.
+    """
+    restantes, observacoes = {}, None
+    for campo, valor in (campos or {}).items():
+        if campo.lower() == 'observacoes':
+            observacoes = valor
+        else:
+            restantes[campo] = valor
+    if isinstance(observacoes, str) and observacoes.strip():
+        raise ValueError("observações não são gravadas por este PUT; use PUT /chamados/:id/observacao ou /sars/:id/observacao")
+    return restantes
+
+
+def listar_observacoes(cursor, origem, chave):
+    """Todas as observações do item, da mais antiga para a mais recente"""
+    cursor.execute(
+        f"SELECT ID, DataCriacao, Usuario, Texto FROM dbo.[{TABELA_OBSERVACOES}] "
+        f"WHERE Origem = ? AND Chave = ? ORDER BY ID",
+        (origem, str(chave))
+    )
+    return [formatar_registro(*row) for row in cursor.fetchall()]
+
+
+def listar_pagina_observacoes(cursor, origem, chave, limite, antes=None):
+    """Até `limite` observações mais recentes primeiro, anteriores ao ID `antes`.
+
+    Devolve (registros, proximo_antes); proximo_antes é o valor de ?before= da
+    página seguinte, ou None quando não há mais observações.
+    """
+    condicao_antes = "AND ID < ? " if antes is not None else ""
+    parametros = (limite + 1, origem, str(chave)) + ((antes,) if antes is not None else ())
+    cursor.execute(
+        f"SELECT TOP (?) ID, DataCriacao, Usuario, Texto FROM dbo.[{TABELA_OBSERVACOES}] "
+        f"WHERE Origem = ? AND Chave = ? {condicao_antes}ORDER BY ID DESC",
+        parametros
+    )
+    linhas = cursor.fetchall()
+    tem_mais = len(linhas) > limite
+    registros = [formatar_registro(*row) for row in linhas[:limite]]
+    return registros, (registros[-1]['id'] if tem_mais else None)
+
+
+def listar_observacoes_lote(cursor, origem, chaves, limite=None):
+    """Observações de várias chaves com uma consulta por lote de TAMANHO_LOTE_CHAVES.
+
+    Devolve {chave: dados} no formato das funções de um item: sem limite, a lista
+    completa (mais antiga primeiro); com limite, (página mais recente primeiro,
+    proximo_antes). Chaves sem observações recebem lista vazia.
+    """
+    chaves = [str(chave) for chave in chaves]
+    encontrados = {chave: [] for chave in chaves}
+    for inicio in range(0, len(chaves), TAMANHO_LOTE_CHAVES):
+        lote = chaves[inicio:inicio + TAMANHO_LOTE_CHAVES]
+        placeholders = ", ".join("?" for _ in lote)
+        if limite is None:
+            cursor.execute(
+                f"SELECT Chave, ID, DataCriacao, Usuario, Texto FROM dbo.[{TABELA_OBSERVACOES}] "
+                f"WHERE Origem = ? AND Chave IN ({placeholders}) ORDER BY Chave, ID",
+                (origem, *lote)
+            )
+        else:
+            # limite + 1 por chave para saber se há página anterior
+            cursor.execute(f"""
+                SELECT Chave, ID, DataCriacao, Usuario, Texto FROM (
+                    SELECT Chave, ID, DataCriacao, Usuario, Texto,
+                           ROW_NUMBER() OVER (PARTITION BY Chave ORDER BY ID DESC) AS Ordem
+                    FROM dbo.[{TABELA_OBSERVACOES}]
+                    WHERE Origem = ? AND Chave IN ({placeholders})
+                ) AS recentes
+                WHERE Ordem <= ?
+                ORDER BY Chave, ID DESC
+            """, (origem, *lote, limite + 1))
+        for chave, *registro in cursor.fetchall():
+            encontrados.setdefault(chave, []).append(formatar_registro(*registro))
+
+    if limite is None:
+        return encontrados
+    return {
+        chave: (registros[:limite], registros[limite - 1]['id'] if len(registros) > limite else None)
+        for chave, registros in encontrados.items()
+    }
+
+
+def obter_lote_em_cache(origem, chaves, pagina, carregar_faltantes):
+    """Dados da página de cada chave; só as ausentes do cache vão para carregar_faltantes.
+
+    `pagina` identifica a consulta (ex.: (limite, antes) ou None para todas) e
+    carregar_faltantes(chaves) devolve {chave: dados}. Dados lidos enquanto uma
+    inclusão invalidava o item são devolvidos, mas não guardados.
+    """
+    agora = time.time()
+    resultado, faltantes, geracoes = {}, [], {}
+    with _cache_observacoes_lock:
+        for chave in chaves:
+            item = (origem, str(chave))
+            paginas = _cache_observacoes.get(item)
+            if paginas and pagina in paginas and agora - paginas[pagina][0] < CACHE_OBSERVACOES_TTL:
+                _cache_observacoes.move_to_end(item)
+                resultado[str(chave)] = paginas[pagina][1]
+            else:
+                faltantes.append(str(chave))
+                geracoes[str(chave)] = _geracoes_observacoes.get(item, 0)
+
+    if not faltantes:
+        return resultado
+
+    carregados = carregar_faltantes(faltantes)
+    with _cache_observacoes_lock:
+        for chave, dados in carregados.items():
+            resultado[chave] = dados
+            item = (origem, chave)
+            if _geracoes_observacoes.get(item, 0) == geracoes.get(chave):
+                _cache_observacoes.setdefault(item, {})[pagina] = (agora, dados)
+                _cache_observacoes.move_to_end(item)
+        while len(_cache_observacoes) > CACHE_OBSERVACOES_MAXIMO:
+            _cache_observacoes.popitem(last=False)
+    return resultado
+
+
+def obter_em_cache(origem, chave, pagina, carregar):
+    """obter_lote_em_cache para um item: carregar() só roda se a página não está em cache"""
+    chave = str(chave)
+    return obter_lote_em_cache(origem, (chave,), pagina, lambda faltantes: {chave: carregar()})[chave]
+
+
+def invalidar_observacoes(origem, chave):
+    """Descarta as páginas em cache do item (chamar depois do commit da inclusão)"""
+    item = (origem, str(chave))
+    with _cache_observacoes_lock:
+        _cache_observacoes.pop(item, None)
+        _geracoes_observacoes[item] = _geracoes_observacoes.get(item, 0) + 1
+
+
+def obter_observacoes_db(origem, chave, limite=None, antes=None):
+    """Observações do item, via cache por item.
+
+    Sem limite devolve todas, da mais antiga para a mais recente; com limite
+    devolve (página mais recente primeiro, proximo_antes).
+    """
+    def carregar():
+        with conexao() as conn:
+            cursor = conn.cursor()
+            if limite is None:
+                return listar_observacoes(cursor, origem, chave)
+            return listar_pagina_observacoes(cursor, origem, chave, limite, antes)
+
+    return obter_em_cache(origem, chave, None if limite is None else (limite, antes), carregar)
+
+
+def obter_observacoes_lote_db(origem, chaves, limite=None):
+    """Observações de vários itens: uma consulta para as chaves fora do cache ({chave: dados})"""
+    def carregar(faltantes):
+        with conexao() as conn:
+            return listar_observacoes_lote(conn.cursor(), origem, faltantes, limite)
+
+    return obter_lote_em_cache(origem, chaves, None if limite is None else (limite, None), carregar)
+
+
+def ler_ids_lote(converter):
+    """Lê ?ids= (repetido ou separado por vírgula) da consulta em lote, sem repetições"""
+    valores = [
+        valor.strip()
+        for bruto in request.args.getlist('ids')
+        for valor in bruto.split(',')
+        if valor.strip()
+    ]
+    if not valores:
+        raise ValueError("informe os IDs em ?ids=")
+    if len(valores) > MAXIMO_CHAVES_LOTE:
+        raise ValueError(f"no máximo {MAXIMO_CHAVES_LOTE} IDs por consulta")
+    return list(dict.fromkeys(str(converter(valor)) for valor in valores))
+
+
+def ler_paginacao_observacoes():
+    """Lê ?limit= e ?before= das observações; (None, None) pede o histórico completo"""
+    limite = ler_limite_paginacao()
+    antes = request.args.get('before')
+    antes = int(antes) if antes not in (None, '') else None
+    if antes is not None and limite is None:
+        limite = LIMITE_PAGINA_PADRAO
+    return limite, antes
+
+
+def responder_observacoes_lote(origem, converter):
+    """Corpo comum das consultas de observações em lote (GET /chamados/observacoes, /sars/observacoes).
+
+    Devolve {"observacoes": {id: [...]}} com uma entrada por ID pedido (lista
+    vazia se não há observações). Com ?limit= cada lista traz só as mais recentes,
+    como na rota de um item, e "next_before" traz o cursor de cada ID.
+    """
+    if request.method == "OPTIONS":
+        return '', 200
+
+    try:
+        chaves = ler_ids_lote(converter)
+        limite = ler_limite_paginacao()
+    except ValueError as e:
+        return jsonify({"erro": f"Parâmetros da consulta em lote inválidos: {e}"}), 400
+
+    try:
+        dados = obter_observacoes_lote_db(origem, chaves, limite)
+        if limite is None:
+            return jsonify({
+                "success": True,
+                "observacoes": dados,
+                "total": len(dados)
+            })
+
+        return jsonify({
+            "success": True,
+            "observacoes": {chave: registros for chave, (registros, _) in dados.items()},
+            "next_before": {chave: proximo_antes for chave, (_, proximo_antes) in dados.items()},
+            "total": len(dados),
+            "limit": limite
+        })
+
+    except Exception as e:
+        logging.error(f"Erro ao obter observações em lote: {e}")
+        return jsonify({"erro": str(e)}), 500
@@ -0,0 +1,762 @@
+"""Gravação das planilhas do Excel (OneDrive) fora do caminho das requisições.
+
+Cada planilha tem um único escritor (EscritorPlanilha) por processo, com uma
+thread que drena as alterações pendentes: várias alterações do mesmo ID viram
+uma só, e o lote inteiro é aplicado com uma leitura e uma gravação do arquivo
+depois de INTERVALO_GRAVACAO segundos sem alterações novas (no máximo
+ESPERA_MAXIMA_GRAVACAO segundos depois da primeira alteração do lote).
+Os dois serviços gravam a planilha de chamados, cada um com o seu escritor:
+aplicar_lote faz leitura, alteração e gravação sob uma trava de arquivo entre
+processos (travar_planilha), então um nunca grava por cima do lote do outro.
+
+A gravação altera só as células do lote, via openpyxl: formatação, filtros e
+fórmulas da planilha ficam como estão. O openpyxl, porém, não preserva
+desenhos (imagens, gráficos, formas, controles) e grava as fórmulas sem o
+último resultado calculado. Planilhas com desenhos são recusadas
+(PlanilhaNaoGravavel) em vez de perder conteúdo. Nas com fórmulas, o espelho
+é posto em dia antes da gravação e guarda os valores calculados, e a pasta é
+gravada pedindo ao Excel que recalcule ao abrir; até isso acontecer, quem ler
+o .xlsx direto (pandas, openpyxl data_only) vê essas colunas vazias. As linhas de cada ID e as colunas de
+cada cabeçalho vêm de um índice (IndicePlanilha) refeito só quando o arquivo
+muda por fora (mtime/tamanho).
+
+A leitura passa por CachePlanilha: um retrato imutável da aba (colunas e
+linha de cada ID), recarregado só quando a assinatura do arquivo muda. A
+releitura usa um espelho em pickle das colunas (ler_colunas_espelho), guardado
+fora do OneDrive: o .xlsx só é interpretado de novo quando o conteúdo mudou
+por fora. As gravações do escritor são aplicadas também no espelho
+(atualizar_espelho), que continua valendo para o arquivo novo.
+
+Com PEGASUS_PLANILHAS_MODO=processo, o trabalho de CPU (openpyxl ao gravar,
+pandas ao reler) roda num processo separado (executar_trabalho), para não
+disputar o GIL com as requisições. Fila, agrupamento e novas tentativas
+continuam no processo da API; o resultado ou a exceção de cada lote volta por
+um Future. O padrão (thread) faz tudo no próprio processo.
+"""
+import atexit
+import hashlib
+import logging
+import multiprocessing
+import os
+import pickle
+import re
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from concurrent.futures.process import BrokenProcessPool
+from types import MappingProxyType
+
+import openpyxl
+import pandas as pd
+
+try:
+    import msvcrt  # Windows
+except ImportError:
+    msvcrt = None
+    import fcntl
+
+INTERVALO_GRAVACAO = 2.0       # segundos sem alterações novas antes de gravar o lote
+ESPERA_MAXIMA_GRAVACAO = 10.0  # segundos, no máximo, entre a primeira alteração e a gravação
+ESPERA_NOVA_TENTATIVA = 30.0   # segundos até tentar de novo um lote que falhou (arquivo aberto/sincronizando)
+TENTATIVAS_MAXIMAS = 5         # falhas seguidas antes de descartar o lote
+ESPERA_DESCARGA_SAIDA = 15.0   # segundos gravando o que falta ao encerrar o processo
+ESPERA_TRAVA_PLANILHA = 60.0   # segundos esperando outro processo terminar de gravar a mesma planilha
+
+# Resultado de enfileirar(): a gravação acontece depois, em segundo plano
+ENFILEIRADO = 'enfileirado'
+SEM_ALTERACOES = 'sem_alteracoes'
+
+# Partes do .xlsx que o openpyxl descarta ao regravar a pasta (comentários, em vmlDrawing, são preservados)
+PARTES_NAO_PRESERVADAS = ('xl/drawings/drawing', 'xl/charts/', 'xl/media/', 'xl/ctrlProps/')
+_FORMULA_XML = re.compile(rb'<(?:\w+:)?f[\s>/]')
+
+# Espelhos das planilhas (pickle das colunas), fora da pasta sincronizada
+PASTA_ESPELHOS = os.environ.get('PEGASUS_ESPELHOS_DIR', os.path.join(tempfile.gettempdir(), 'pegasus_planilhas'))
+VERSAO_ESPELHO = 1  # mudar quando o formato de ler_colunas mudar
+TAMANHO_BLOCO_HASH = 1024 * 1024
+
+# 'thread': leitura e gravação no processo da API; 'processo': num processo trabalhador
+MODO_PLANILHAS = os.environ.get('PEGASUS_PLANILHAS_MODO', 'thread').strip().lower()
+if MODO_PLANILHAS not in ('thread', 'processo'):
+    logging.warning(f"PEGASUS_PLANILHAS_MODO={MODO_PLANILHAS!r} inválido, usando 'thread'")
+    MODO_PLANILHAS = 'thread'
+
+_escritores = {}
+_caches = {}
+_escritores_lock = threading.Lock()
+_indices = {}  # (caminho, aba) -> IndicePlanilha da última gravação neste processo (API ou trabalhador)
+_processo = None
+_processo_lock = threading.Lock()
+
+
+def normalizar_coluna(nome):
+    """Cabeçalho da planilha no formato usado pelos serviços ("Status: " -> "status")"""
+    return re.sub(r'[:\s]+$', '', str(nome).strip().lower())
+
+
+def chave_planilha(valor):
+    """ID de uma célula ou requisição no formato do índice (123.0, 123 e "123" são a mesma chave)"""
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip() if valor is not None else ''
+
+
+class PlanilhaNaoGravavel(Exception):
+    """A planilha tem conteúdo que o openpyxl perderia ao regravar (não adianta tentar de novo)"""
+
+
+def assinatura_arquivo(caminho):
+    """(mtime, tamanho) do arquivo: muda quando alguém (ou o OneDrive) grava a planilha"""
+    estado = os.stat(caminho)
+    return estado.st_mtime_ns, estado.st_size
+
+
+class IndicePlanilha:
+    """ID -> linhas e cabeçalho -> coluna de uma aba, válido enquanto a assinatura do arquivo não muda"""
+
+    def __init__(self, planilha, coluna_id, assinatura):
+        self.assinatura = assinatura
+        self.colunas = {}
+        for celula in planilha[1]:
+            if celula.value is not None:
+                self.colunas.setdefault(normalizar_coluna(celula.value), celula.column)
+        if coluna_id not in self.colunas:
+            raise KeyError(f"Coluna '{coluna_id}' não encontrada no cabeçalho")
+        self.coluna_id = self.colunas[coluna_id]
+
+        self.linhas = {}
+        valores_id = planilha.iter_rows(min_row=2, min_col=self.coluna_id, max_col=self.coluna_id, values_only=True)
+        for numero, (valor,) in enumerate(valores_id, start=2):
+            chave = chave_planilha(valor)
+            if chave:
+                self.linhas.setdefault(chave, []).append(numero)
+
+    def confere(self, planilha, chave, linhas):
+        """As linhas indexadas ainda têm esse ID (o arquivo pode ter mudado sem mudar a assinatura)"""
+        return all(chave_planilha(planilha.cell(row=linha, column=self.coluna_id).value) == chave for linha in linhas)
+
+
+def salvar_pasta(pasta, caminho):
+    """Grava num temporário ao lado e troca de uma vez: quem lê nunca vê o arquivo pela metade"""
+    temporario = f"{caminho}.{os.getpid()}.tmp"
+    try:
+        pasta.save(temporario)
+        os.replace(temporario, caminho)
+    except Exception:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+
+class RetratoPlanilha:
+    """Conteúdo de uma aba num instante, em colunas, sem cópia por linha; não muda depois de criado"""
+
+    def __init__(self, assinatura, colunas, dados, coluna_id):
+        self.assinatura = assinatura
+        self.carregado_em = time.time()
+        self.colunas = tuple(colunas)
+        self.dados = MappingProxyType({coluna: tuple(valores) for coluna, valores in dados.items()})
+        indices = {}
+        for indice, valor in enumerate(self.dados.get(coluna_id, ())):
+            chave = chave_planilha(valor)
+            if chave:
+                indices.setdefault(chave, indice)
+        self.indices = MappingProxyType(indices)
+
+    def __len__(self):
+        return len(self.dados[self.colunas[0]]) if self.colunas else 0
+
+    def __contains__(self, chave):
+        return chave_planilha(chave) in self.indices
+
+    def linha(self, chave):
+        """{coluna: valor} do ID, ou None se ele não está na planilha"""
+        indice = self.indices.get(chave_planilha(chave))
+        if indice is None:
+            return None
+        return {coluna: self.dados[coluna][indice] for coluna in self.colunas}
+
+    def coluna(self, nome):
+        return self.dados.get(nome, ())
+
+
+def ler_colunas(caminho, aba):
+    """Lê a aba em colunas: (nomes normalizados, {coluna: lista de valores}); vazio vira None"""
+    df = pd.read_excel(caminho, sheet_name=aba)
+    colunas = [normalizar_coluna(col) for col in df.columns]
+    df.columns = colunas
+    df = df.astype(object).where(df.notna(), None)
+    return colunas, {coluna: df[coluna].tolist() for coluna in colunas}
+
+
+def hash_arquivo(caminho):
+    """SHA-256 do conteúdo do arquivo (em blocos, sem carregar tudo na memória)"""
+    resumo = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO_HASH), b''):
+            resumo.update(bloco)
+    return resumo.hexdigest()
+
+
+def caminho_espelho(caminho, aba):
+    """Arquivo do espelho da aba: nome da planilha + hash do caminho completo"""
+    origem = hashlib.sha1(f"{os.path.abspath(caminho)}|{aba}".encode('utf-8')).hexdigest()[:12]
+    return os.path.join(PASTA_ESPELHOS, f"{os.path.basename(caminho)}.{origem}.pkl")
+
+
+def _ler_cabecalho_espelho(espelho):
+    try:
+        with open(espelho, 'rb') as arquivo:
+            return pickle.load(arquivo)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+
+
+def _gravar_espelho(espelho, cabecalho, colunas, dados):
+    """Cabeçalho e colunas em dois pickles seguidos: o cabeçalho é lido sem carregar os dados"""
+    os.makedirs(os.path.dirname(espelho), exist_ok=True)
+    temporario = f"{espelho}.{os.getpid()}.tmp"
+    with open(temporario, 'wb') as arquivo:
+        pickle.dump(cabecalho, arquivo, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump((colunas, dados), arquivo, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporario, espelho)
+
+
+def ler_colunas_espelho(caminho, aba, assinatura=None):
+    """ler_colunas() pelo espelho em pickle, interpretando o .xlsx só se ele mudou.
+
+    O espelho vale se a assinatura (mtime/tamanho) bate; senão, se o hash do
+    conteúdo bate (arquivo regravado igual, ex.: sincronização do OneDrive), o
+    espelho é reaproveitado com a assinatura nova. Devolve (colunas, dados, origem),
+    com origem 'espelho', 'espelho_hash' ou 'xlsx'.
+    """
+    assinatura = assinatura or assinatura_arquivo(caminho)
+    espelho = caminho_espelho(caminho, aba)
+    cabecalho = _ler_cabecalho_espelho(espelho)
+    valido = (cabecalho is not None and cabecalho.get('versao') == VERSAO_ESPELHO
+              and cabecalho.get('aba') == aba)
+
+    origem, conteudo = None, None
+    if valido and tuple(cabecalho['assinatura']) == assinatura:
+        origem = 'espelho'
+    else:
+        conteudo = hash_arquivo(caminho)
+        if valido and cabecalho.get('hash') == conteudo:
+            origem = 'espelho_hash'
+
+    if origem:
+        try:
+            with open(espelho, 'rb') as arquivo:
+                pickle.load(arquivo)
+                colunas, dados = pickle.load(arquivo)
+            if origem == 'espelho_hash':
+                _gravar_espelho(espelho, {**cabecalho, 'assinatura': assinatura}, colunas, dados)
+            return colunas, dados, origem
+        except Exception as e:
+            logging.warning(f"Espelho {espelho} inválido, relendo a planilha: {e}")
+            conteudo = conteudo or hash_arquivo(caminho)
+
+    colunas, dados = ler_colunas(caminho, aba)
+    cabecalho = {'versao': VERSAO_ESPELHO, 'aba': aba, 'assinatura': assinatura, 'hash': conteudo}
+    try:
+        _gravar_espelho(espelho, cabecalho, colunas, dados)
+    except Exception as e:
+        logging.warning(f"Não foi possível gravar o espelho {espelho}: {e}")
+    return colunas, dados, 'xlsx'
+
+
+def atualizar_espelho(caminho, aba, coluna_id, assinatura_anterior, alteracoes):
+    """Aplica no espelho as alterações que o escritor acabou de gravar no .xlsx.
+
+    Só vale se o espelho correspondia ao arquivo antes da gravação; assim a
+    próxima leitura usa o espelho em vez de interpretar a planilha inteira.
+    Devolve True se o espelho foi atualizado.
+    """
+    espelho = caminho_espelho(caminho, aba)
+    cabecalho = _ler_cabecalho_espelho(espelho)
+    if (cabecalho is None or cabecalho.get('versao') != VERSAO_ESPELHO
+            or tuple(cabecalho['assinatura']) != assinatura_anterior):
+        return False
+
+    with open(espelho, 'rb') as arquivo:
+        pickle.load(arquivo)
+        colunas, dados = pickle.load(arquivo)
+    posicoes = {}
+    for posicao, valor in enumerate(dados.get(coluna_id, ())):
+        posicoes.setdefault(chave_planilha(valor), []).append(posicao)
+    for chave, campos in alteracoes.items():
+        for posicao in posicoes.get(chave_planilha(chave), ()):
+            for coluna, valor in campos.items():
+                if coluna in dados:
+                    dados[coluna][posicao] = valor
+
+    cabecalho = {**cabecalho, 'assinatura': assinatura_arquivo(caminho), 'hash': hash_arquivo(caminho)}
+    _gravar_espelho(espelho, cabecalho, colunas, dados)
+    return True
+
+
+def preparar_espelho(caminho, aba, assinatura):
+    """Deixa o espelho em dia com o arquivo e devolve só a origem (os dados não cruzam o processo)"""
+    return ler_colunas_espelho(caminho, aba, assinatura)[2]
+
+
+def conteudo_nao_preservado(caminho):
+    """(partes de desenho, abas com fórmulas) do .xlsx, lidas direto do zip, sem o openpyxl"""
+    with zipfile.ZipFile(caminho) as arquivo:
+        nomes = arquivo.namelist()
+        desenhos = sorted(nome for nome in nomes if nome.startswith(PARTES_NAO_PRESERVADAS))
+        formulas = sorted(
+            os.path.basename(nome) for nome in nomes
+            if nome.startswith('xl/worksheets/') and nome.endswith('.xml')
+            and _FORMULA_XML.search(arquivo.read(nome))
+        )
+    return desenhos, formulas
+
+
+def _tentar_travar(arquivo):
+    try:
+        if msvcrt is not None:
+            arquivo.seek(0)
+            msvcrt.locking(arquivo.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+def _destravar(arquivo):
+    if msvcrt is not None:
+        arquivo.seek(0)
+        msvcrt.locking(arquivo.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(arquivo.fileno(), fcntl.LOCK_UN)
+
+
+@contextmanager
+def travar_planilha(caminho, espera=ESPERA_TRAVA_PLANILHA):
+    """Trava exclusiva da planilha entre processos, por um arquivo .lock em PASTA_ESPELHOS.
+
+    O sistema solta a trava se o processo morrer. Levanta TimeoutError se outro
+    processo segurar a trava por mais de `espera` segundos (o escritor tenta de novo).
+    """
+    os.makedirs(PASTA_ESPELHOS, exist_ok=True)
+    origem = hashlib.sha1(os.path.normcase(os.path.abspath(caminho)).encode('utf-8')).hexdigest()[:12]
+    trava = os.path.join(PASTA_ESPELHOS, f"{os.path.basename(caminho)}.{origem}.lock")
+    prazo = time.monotonic() + espera
+    with open(trava, 'a+b') as arquivo:
+        while not _tentar_travar(arquivo):
+            if time.monotonic() >= prazo:
+                raise TimeoutError(f"planilha {caminho} em gravação por outro processo há mais de {espera:.0f}s")
+            time.sleep(0.2)
+        try:
+            yield
+        finally:
+            _destravar(arquivo)
+
+
+def aplicar_lote(caminho, aba, coluna_id, lote):
+    """Abre a pasta uma vez, altera só as células do lote e grava uma vez, sob travar_planilha.
+
+    Devolve (IDs encontrados, nº de indexações, erro ao atualizar o espelho ou
+    None, abas com fórmulas); os avisos ficam para quem chamou registrar, no
+    processo da API. Colunas que não existem na planilha são ignoradas; sem
+    nenhum ID encontrado, o arquivo não é regravado.
+
+    Levanta PlanilhaNaoGravavel, sem tocar no arquivo, se a pasta tem desenhos
+    que o openpyxl descartaria. Fórmulas são regravadas sem o resultado
+    calculado: o espelho é posto em dia antes (e mantém os valores) e a pasta
+    sai marcada para o Excel recalcular ao abrir.
+    """
+    with travar_planilha(caminho):
+        return _aplicar_lote(caminho, aba, coluna_id, lote)
+
+
+def _aplicar_lote(caminho, aba, coluna_id, lote):
+    assinatura = assinatura_arquivo(caminho)
+    desenhos, formulas = conteudo_nao_preservado(caminho)
+    if desenhos:
+        raise PlanilhaNaoGravavel(
+            f"a pasta tem desenhos que o openpyxl não preserva ({', '.join(desenhos)}); "
+            f"remova-os ou grave a planilha pelo Excel"
+        )
+    pasta = openpyxl.load_workbook(caminho)
+    planilha = pasta[aba]
+    indexacoes = 0
+    indice = _indices.get((caminho, aba))
+    if indice is None or indice.assinatura != assinatura:
+        indice = _indices[(caminho, aba)] = IndicePlanilha(planilha, coluna_id, assinatura)
+        indexacoes += 1
+
+    encontrados = []
+    for chave, campos in lote.items():
+        chave_indice = chave_planilha(chave)
+        linhas = indice.linhas.get(chave_indice)
+        if linhas and not indice.confere(planilha, chave_indice, linhas):
+            indice = _indices[(caminho, aba)] = IndicePlanilha(planilha, coluna_id, assinatura)
+            indexacoes += 1
+            linhas = indice.linhas.get(chave_indice)
+        if not linhas:
+            continue
+        encontrados.append(chave)
+        for coluna, valor in campos.items():
+            numero_coluna = indice.colunas.get(coluna)
+            if numero_coluna is None:
+                continue
+            for linha in linhas:
+                planilha.cell(row=linha, column=numero_coluna).value = valor
+
+    erro_espelho = None
+    if encontrados:
+        if formulas:
+            # Os resultados das fórmulas só sobrevivem no espelho: ele precisa
+            # corresponder ao arquivo de antes para atualizar_espelho valer
+            try:
+                preparar_espelho(caminho, aba, assinatura)
+            except Exception as e:
+                erro_espelho = str(e)
+            pasta.calculation.fullCalcOnLoad = True
+        salvar_pasta(pasta, caminho)
+        # Só células mudaram: linhas e colunas do índice continuam valendo para o arquivo novo
+        indice.assinatura = assinatura_arquivo(caminho)
+        try:
+            atualizar_espelho(caminho, aba, coluna_id, assinatura, {chave: lote[chave] for chave in encontrados})
+        except Exception as e:
+            erro_espelho = erro_espelho or str(e)
+    return encontrados, indexacoes, erro_espelho, formulas
+
+
+def _executor_processo():
+    global _processo
+    with _processo_lock:
+        if _processo is None:
+            # spawn: o trabalhador não herda threads, locks nem conexões do processo da API
+            _processo = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+            logging.info("📊 Processo de planilhas iniciado")
+        return _processo
+
+
+def _descartar_processo(executor):
+    """Processo trabalhador morreu: o próximo trabalho cria outro"""
+    global _processo
+    with _processo_lock:
+        if _processo is executor:
+            _processo = None
+    executor.shutdown(wait=False)
+
+
+def executar_trabalho(funcao, *args):
+    """funcao(*args) neste processo (modo 'thread') ou no processo de planilhas (modo 'processo').
+
+    No modo processo, a thread que chama só espera o Future: o resultado ou a
+    exceção de funcao volta para ela. Se o trabalhador morrer, levanta
+    BrokenProcessPool e o próximo trabalho sobe um processo novo.
+    """
+    if MODO_PLANILHAS != 'processo':
+        return funcao(*args)
+
+    executor = _executor_processo()
+    try:
+        futuro = executor.submit(funcao, *args)
+    except BrokenProcessPool:
+        _descartar_processo(executor)
+        raise
+    except RuntimeError:
+        # Interpretador encerrando (descarga do atexit): o executor já não aceita trabalho
+        return funcao(*args)
+    try:
+        return futuro.result()
+    except BrokenProcessPool:
+        _descartar_processo(executor)
+        raise
+
+
+def ler_planilha(caminho, aba):
+    """DataFrame da aba (colunas normalizadas, vazio = None) pelo espelho em pickle"""
+    colunas, dados, _ = ler_colunas_espelho(caminho, aba)
+    return pd.DataFrame(dados, columns=colunas)
+
+
+class CachePlanilha:
+    """Cache de leitura de uma planilha, recarregado quando o arquivo muda (mtime/tamanho).
+
+    obter() só faz um os.stat enquanto o arquivo não muda; quando muda, uma
+    única thread relê a planilha e troca o retrato de uma vez: quem já tinha o
+    retrato anterior continua com ele, inteiro.
+    """
+
+    def __init__(self, caminho, aba, coluna_id):
+        self.caminho = caminho
+        self.nome = os.path.basename(caminho)
+        self.aba = aba
+        self.coluna_id = coluna_id
+        self._retrato = None
+        self._recarga_lock = threading.Lock()
+        self._estatisticas_lock = threading.Lock()
+        self._estatisticas = {
+            'hits': 0, 'misses': 0, 'recargas': 0, 'recargas_espelho': 0, 'erros': 0,
+            'ultima_recarga_s': None, 'ultima_origem': None, 'modo': MODO_PLANILHAS,
+        }
+
+    def _contar(self, metrica, quantidade=1):
+        with self._estatisticas_lock:
+            self._estatisticas[metrica] += quantidade
+
+    def obter(self):
+        """Retrato atual da planilha (relê se o arquivo mudou desde a última leitura)"""
+        assinatura = assinatura_arquivo(self.caminho)
+        retrato = self._retrato
+        if retrato is not None and retrato.assinatura == assinatura:
+            self._contar('hits')
+            return retrato
+
+        self._contar('misses')
+        with self._recarga_lock:
+            retrato = self._retrato
+            if retrato is not None and retrato.assinatura == assinatura:
+                return retrato  # outra thread recarregou enquanto esta esperava
+            inicio = time.monotonic()
+            try:
+                if MODO_PLANILHAS == 'processo':
+                    # O trabalhador interpreta o .xlsx se preciso; aqui só se carrega o espelho
+                    origem = executar_trabalho(preparar_espelho, self.caminho, self.aba, assinatura)
+                    colunas, dados, _ = ler_colunas_espelho(self.caminho, self.aba, assinatura)
+                else:
+                    colunas, dados, origem = ler_colunas_espelho(self.caminho, self.aba, assinatura)
+                retrato = RetratoPlanilha(assinatura, colunas, dados, self.coluna_id)
+            except Exception:
+                self._contar('erros')
+                raise
+            self._retrato = retrato
+            with self._estatisticas_lock:
+                self._estatisticas['recargas'] += 1
+                if origem != 'xlsx':
+                    self._estatisticas['recargas_espelho'] += 1
+                self._estatisticas['ultima_recarga_s'] = round(time.monotonic() - inicio, 2)
+                self._estatisticas['ultima_origem'] = origem
+        logging.info(f"📊 Cache da planilha {self.nome} recarregado ({origem}): {len(retrato)} linhas")
+        return retrato
+
+    def invalidar(self):
+        """Força a releitura na próxima chamada (ex.: depois de gravar o arquivo)"""
+        self._retrato = None
+
+    def estatisticas(self):
+        retrato = self._retrato
+        with self._estatisticas_lock:
+            estatisticas = dict(self._estatisticas)
+        estatisticas.update(
+            linhas=len(retrato) if retrato else None,
+            idade_s=round(time.time() - retrato.carregado_em, 2) if retrato else None,
+        )
+        return estatisticas
+
+
+class EscritorPlanilha:
+    """Fila write-behind de uma planilha, drenada por uma única thread"""
+
+    def __init__(self, caminho, aba, coluna_id, ao_gravar=None,
+                 intervalo=INTERVALO_GRAVACAO, espera_maxima=ESPERA_MAXIMA_GRAVACAO):
+        self.caminho = caminho
+        self.nome = os.path.basename(caminho)
+        self.aba = aba
+        self.coluna_id = coluna_id
+        self.ao_gravar = ao_gravar
+        self.intervalo = intervalo
+        self.espera_maxima = espera_maxima
+        self._pendentes = {}      # id -> {coluna: valor}, na ordem de chegada
+        self._primeira = None     # time.monotonic() da alteração mais antiga pendente
+        self._ultima = None       # time.monotonic() da alteração mais recente
+        self._urgente = False     # descarregar(): grava sem esperar o intervalo
+        self._gravando = False
+        self._falhas_seguidas = 0
+        self._avisou_formulas = False
+        self._cond = threading.Condition()
+        self._thread = None
+        self._estatisticas = {
+            'alteracoes': 0, 'coalescidas': 0, 'gravacoes': 0, 'itens_gravados': 0,
+            'falhas': 0, 'descartadas': 0, 'recusadas': 0, 'indexacoes': 0,
+            'ultima_gravacao': None, 'ultima_duracao_s': None,
+            'ultimo_erro': None, 'modo': MODO_PLANILHAS,
+        }
+
+    def enfileirar(self, chave, campos):
+        """Registra a alteração de um ID; alterações do mesmo ID ainda pendentes são mescladas.
+
+        Devolve ENFILEIRADO (ou SEM_ALTERACOES): a gravação ainda não aconteceu, e
+        o resultado dela só aparece nas estatísticas (/health).
+        """
+        if not campos:
+            return SEM_ALTERACOES
+        with self._cond:
+            self._estatisticas['alteracoes'] += 1
+            if chave in self._pendentes:
+                self._estatisticas['coalescidas'] += 1
+                self._pendentes[chave].update(campos)
+            else:
+                self._pendentes[chave] = dict(campos)
+            agora = time.monotonic()
+            self._primeira = self._primeira or agora
+            self._ultima = agora
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._executar, name=f"planilha-{self.nome}", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify_all()
+        return ENFILEIRADO
+
+    def _aguardar_lote(self):
+        """Espera o intervalo de debounce e retira o lote pendente (com o lock)"""
+        while True:
+            while not self._pendentes:
+                self._cond.wait()
+            if self._urgente:
+                break
+            prazo = min(self._ultima + self.intervalo, self._primeira + self.espera_maxima)
+            restante = prazo - time.monotonic()
+            if restante <= 0:
+                break
+            self._cond.wait(restante)
+
+        lote, self._pendentes = self._pendentes, {}
+        self._primeira = self._ultima = None
+        self._gravando = True
+        return lote
+
+    def _executar(self):
+        while True:
+            with self._cond:
+                lote = self._aguardar_lote()
+
+            inicio = time.monotonic()
+            try:
+                encontrados, indexacoes, erro_espelho, formulas = executar_trabalho(
+                    aplicar_lote, self.caminho, self.aba, self.coluna_id, lote
+                )
+            except Exception as e:
+                self._falhou(lote, e)
+                continue
+
+            gravados = set(encontrados)
+            for chave in (chave for chave in lote if chave not in gravados):
+                logging.warning(f"ID {chave} não encontrado na planilha {self.nome} para atualização.")
+            if erro_espelho:
+                logging.warning(f"Espelho da planilha {self.nome} não atualizado (será relido do .xlsx): {erro_espelho}")
+            if formulas and encontrados and not self._avisou_formulas:
+                self._avisou_formulas = True
+                logging.warning(
+                    f"⚠️ Planilha {self.nome}: fórmulas em {', '.join(formulas)} gravadas sem o resultado calculado; "
+                    f"o espelho mantém os valores, mas quem ler o .xlsx direto vê essas colunas vazias até o Excel recalcular"
+                )
+
+            duracao = time.monotonic() - inicio
+            with self._cond:
+                self._falhas_seguidas = 0
+                self._gravando = False
+                self._estatisticas['gravacoes'] += 1
+                self._estatisticas['indexacoes'] += indexacoes
+                self._estatisticas['itens_gravados'] += len(encontrados)
+                self._estatisticas['ultima_gravacao'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+                self._estatisticas['ultima_duracao_s'] = round(duracao, 2)
+                self._cond.notify_all()
+            logging.info(f"📊 Planilha {self.nome}: {len(encontrados)}/{len(lote)} itens gravados em {duracao:.2f}s")
+
+            if self.ao_gravar:
+                try:
+                    self.ao_gravar()
+                except Exception as e:
+                    logging.error(f"Erro no retorno após gravar a planilha {self.caminho}: {e}")
+
+    def _falhou(self, lote, erro):
+        """Devolve o lote à fila (alterações mais novas prevalecem) ou o descarta após várias falhas"""
+        with self._cond:
+            self._estatisticas['falhas'] += 1
+            self._estatisticas['ultimo_erro'] = f"{type(erro).__name__}: {erro}"
+            if isinstance(erro, PlanilhaNaoGravavel):
+                # Tentar de novo não muda o conteúdo da pasta: descarta já, sem esperar
+                self._estatisticas['recusadas'] += len(lote)
+                self._estatisticas['descartadas'] += len(lote)
+                logging.error(
+                    f"❌ Planilha {self.caminho} recusada, alterações descartadas para os IDs {list(lote)}: {erro}"
+                )
+                self._gravando = False
+                self._cond.notify_all()
+                return
+            self._falhas_seguidas += 1
+            if self._falhas_seguidas >= TENTATIVAS_MAXIMAS:
+                self._estatisticas['descartadas'] += len(lote)
+                logging.error(
+                    f"❌ Planilha {self.caminho}: {self._falhas_seguidas} falhas seguidas, "
+                    f"alterações descartadas para os IDs {list(lote)}: {erro}"
+                )
+                self._falhas_seguidas = 0
+            else:
+                logging.error(f"Erro ao gravar a planilha {self.caminho} (nova tentativa em {ESPERA_NOVA_TENTATIVA:.0f}s): {erro}")
+                for chave, campos in lote.items():
+                    self._pendentes[chave] = {**campos, **self._pendentes.get(chave, {})}
+                agora = time.monotonic()
+                self._primeira = self._primeira or agora
+                self._ultima = self._ultima or agora
+            self._gravando = False
+            self._cond.notify_all()
+            # Espera a nova tentativa sem segurar o lock; descarregar() encerra a espera na hora
+            self._cond.wait_for(lambda: self._urgente, ESPERA_NOVA_TENTATIVA)
+
+    def descarregar(self, timeout=None):
+        """Grava o que está pendente sem esperar o intervalo; True se a fila esvaziou a tempo"""
+        with self._cond:
+            self._urgente = True
+            self._cond.notify_all()
+            try:
+                return self._cond.wait_for(lambda: not self._pendentes and not self._gravando, timeout)
+            finally:
+                self._urgente = False
+
+    def estatisticas(self):
+        with self._cond:
+            return {**self._estatisticas, 'pendentes': len(self._pendentes), 'gravando': self._gravando}
+
+
+def obter_escritor(caminho, aba, coluna_id, ao_gravar=None):
+    """Escritor único da planilha neste processo (criado na primeira chamada)"""
+    with _escritores_lock:
+        escritor = _escritores.get(caminho)
+        if escritor is None:
+            escritor = _escritores[caminho] = EscritorPlanilha(caminho, aba, coluna_id, ao_gravar)
+        return escritor
+
+
+def obter_cache(caminho, aba, coluna_id):
+    """Cache de leitura único da planilha neste processo (criado na primeira chamada)"""
+    with _escritores_lock:
+        cache = _caches.get(caminho)
+        if cache is None:
+            cache = _caches[caminho] = CachePlanilha(caminho, aba, coluna_id)
+        return cache
+
+
+def estatisticas_escritores():
+    """Estatísticas das filas de gravação de todas as planilhas para o /health"""
+    with _escritores_lock:
+        escritores = list(_escritores.values())
+    return {escritor.nome: escritor.estatisticas() for escritor in escritores}
+
+
+def estatisticas_caches():
+    """Hits, misses e recargas do cache de leitura de cada planilha para o /health"""
+    with _escritores_lock:
+        caches = list(_caches.values())
+    return {cache.nome: cache.estatisticas() for cache in caches}
+
+
+@atexit.register
+def _descarregar_ao_sair():
+    with _escritores_lock:
+        escritores = list(_escritores.values())
+    for escritor in escritores:
+        if not escritor.descarregar(ESPERA_DESCARGA_SAIDA):
+            logging.warning(f"Planilha {escritor.caminho}: alterações pendentes não gravadas ao encerrar")
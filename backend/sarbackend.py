@@ -1,8 +1,8 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 import pyodbc
 import pandas as pd
 import requests
-from datetime import datetime
+from datetime import date, datetime
 import re
 from flask_cors import cross_origin, CORS
 from threading import Thread
@@ -13,10 +13,28 @@ from functools import lru_cache
 import asyncio
 import aiohttp
 import json
-from queue import Queue
+import base64
+import hashlib
+from queue import Queue, Empty, Full
+from collections import deque, OrderedDict
 import threading
+from database import connection_pool, init_connection_pool, get_connection, return_connection
+from serializacao import ProvedorJSON, CODIFICADOR_JSON, codificar_json, escolher_codificacao, comprimir
+from planilhas import MODO_PLANILHAS, obter_cache, obter_escritor, estatisticas_escritores
+from listagens import (
+    TABELA_ALTERACOES, COLUNA_VERSAO_ALTERACOES, TABELA_CORTE_ALTERACOES, CAMPOS_CHAMADO, CAMPOS_SAR, carregar_cache_esquema, obter_colunas, verificar_esquema,
+    esquema_atual, estatisticas_esquema, filtrar_colunas_existentes, compilar_projetor, resolver_coluna,
+    ler_campos_projecao, colunas_projecao, ler_filtros, lista_select, montar_consulta_chamados, registrar_alteracao,
+    LIMITE_PAGINA_PADRAO, LIMITE_PAGINA_MAXIMO, ler_limite_paginacao, trocar_responsavel
+)
+from observacoes import (
+    ORIGEM_CHAMADO, ORIGEM_SAR, gravar_observacao, separar_observacoes, obter_observacoes_db,
+    ler_paginacao_observacoes, responder_observacoes_lote
+)
 
 app = Flask(__name__)
+# jsonify com o codificador rápido (orjson quando instalado), no formato do provedor padrão do Flask
+app.json = ProvedorJSON(app)
 # Configuração CORS global
 CORS(app)
 
@@ -36,172 +54,148 @@ session.headers.update(HEADERS)
 executor = ThreadPoolExecutor(max_workers=10)
 
 # Cache para evitar leituras desnecessárias do Excel
-excel_cache = {}
-excel_cache_time = 0
-CACHE_DURATION = 60
-
-# Pool otimizado de conexões do banco
-connection_pool = Queue(maxsize=10)
-connection_lock = threading.Lock()
-
-def init_connection_pool():
-    """Pool otimizado com retry e validação"""
-    global connection_pool
-    for i in range(10):
-        try:
-            conn = pyodbc.connect(
-                'DRIVER={SQL Server};'
-                'SERVER=localhost;'
-                'DATABASE=powerbi;'
-                'Trusted_Connection=yes;'
-                'Connection Timeout=30;'
-                'Command Timeout=30;'
-            )
-            # Testa a conexão
-            cursor = conn.cursor()
-            cursor.execute("SELECT 1")
-            cursor.fetchone()
-            cursor.close()
-            
-            connection_pool.put(conn)
-            logging.info(f"Conexão {i+1} criada e testada com sucesso")
-        except Exception as e:
-            logging.error(f"Erro ao criar conexão {i+1}: {e}")
-
-def create_new_connection():
-    """Cria nova conexão quando o pool está vazio"""
-    return pyodbc.connect(
-        'DRIVER={SQL Server};'
-        'SERVER=localhost;'
-        'DATABASE=powerbi;'
-        'Trusted_Connection=yes;'
-        'Connection Timeout=30;'
-        'Command Timeout=30;'
-    )
 
-def get_connection():
-    """Obtém conexão com timeout e retry"""
+# Respostas em streaming das listagens (?stream=ndjson|json)
+FORMATOS_STREAM = {'ndjson', 'json'}
+TAMANHO_LOTE_STREAM = 500
+
+# GET condicional (ETag/304) das listagens; sem a coluna rowversion (migrations/003) não há ETag
+COLUNA_VERSAO = 'VersaoLinha'
+tabelas_sem_versao = set()  # já avisadas no log
+
+# Registro de alterações do delta-sync (/api/chamados/changes, migrations/004 e 006)
+TAMANHO_LOTE_ALTERACOES = 500
+PREFIXO_TOKEN_ALTERACOES = 'r'  # token = 'r' + rowversion do registro como número
+
+# Canal de eventos do quadro (SSE em /api/eventos)
+TAMANHO_HISTORICO_EVENTOS = 500   # eventos guardados para reconexão com Last-Event-ID
+TAMANHO_FILA_ASSINANTE = 200      # assinante mais atrasado que isso recebe "resync"
+MAXIMO_ASSINANTES_EVENTOS = 100
+INTERVALO_HEARTBEAT_EVENTOS = 15  # segundos
+# Só o quadro de SARs: o de chamados grava pelo exeltoredmineupdate.py (porta 5000),
+# que não publica aqui
+CANAIS_EVENTOS = ('sar',)
+assinantes_eventos = set()
+historico_eventos = deque(maxlen=TAMANHO_HISTORICO_EVENTOS)
+ultimo_evento_id = 0
+eventos_lock = threading.Lock()
+# Época do processo: os ids enviados são '<época>-<número>', e um Last-Event-ID de
+# outra época (servidor reiniciado, contador zerado) recebe "resync"
+EPOCA_EVENTOS = str(int(time.time() * 1000))
+
+# Cache das respostas serializadas das listagens (chave: rota + query string).
+# As escritas deste processo invalidam a tabela na hora; o TTL cobre escritas de fora
+# (outro serviço, importação do Excel).
+CACHE_LISTAGENS_TTL = 30  # segundos
+CACHE_LISTAGENS_MAXIMO = 200
+OPERACOES_ESCRITA = ('delete', 'generic_update')
+cache_listagens = OrderedDict()
+versoes_listagens = {}
+carregamentos_listagens = {}
+cache_listagens_stats = {'hits': 0, 'misses': 0, 'invalidacoes': 0}
+cache_listagens_lock = threading.Lock()
+
+def invalidar_cache_listagens(tabela):
+    """Descarta as listagens da tabela em cache; chamado depois do commit de cada escrita"""
+    with cache_listagens_lock:
+        versoes_listagens[tabela] = versoes_listagens.get(tabela, 0) + 1
+        for chave in [chave for chave, entrada in cache_listagens.items() if entrada['tabela'] == tabela]:
+            del cache_listagens[chave]
+        cache_listagens_stats['invalidacoes'] += 1
+
+def obter_listagem_cache(tabela, chave, carregar):
+    """Devolve {'corpo', 'etag', ...} da listagem, executando carregar(cursor) só se preciso.
+
+    Na falta do cache o ETag é calculado antes: se o cliente já tem essa versão
+    (If-None-Match) volta uma entrada sem corpo, fora do cache, e a consulta e a
+    serialização nem rodam. carregar(cursor) retorna os dados e roda uma vez por
+    chave mesmo com vários pedidos simultâneos: os demais esperam e reaproveitam
+    o mesmo corpo já serializado. Um resultado carregado enquanto uma escrita
+    invalidava a tabela é entregue a quem pediu, mas não entra no cache.
+    """
+    while True:
+        with cache_listagens_lock:
+            versao = versoes_listagens.get(tabela, 0)
+            entrada = cache_listagens.get(chave)
+            if entrada and entrada['versao'] == versao and time.time() - entrada['criado'] < CACHE_LISTAGENS_TTL:
+                cache_listagens.move_to_end(chave)
+                cache_listagens_stats['hits'] += 1
+                return entrada
+
+            carregando = carregamentos_listagens.get(chave)
+            if carregando is None:
+                carregando = threading.Event()
+                carregamentos_listagens[chave] = carregando
+                break
+
+        # Outro pedido já está consultando esta listagem
+        carregando.wait(timeout=30)
+
     try:
-        conn = connection_pool.get(timeout=5)
-        
+        conn = get_connection()
         try:
             cursor = conn.cursor()
-            cursor.execute("SELECT 1")
-            cursor.fetchone()
+            etag = calcular_etag_listagem(cursor, tabela)
+            if etag_confere(etag):
+                return {'tabela': tabela, 'corpo': None, 'etag': etag}
+            dados = carregar(cursor)
             cursor.close()
-            return conn
-        except Exception as e:
-            logging.warning(f"Conexão inválida do pool, criando nova: {e}")
-            try:
-                conn.close()
-            except Exception as close_e:
-                logging.error(f"Erro ao fechar conexão inválida: {close_e}")
-            return create_new_connection()
-            
-    except Exception as e:
-        logging.warning(f"Pool vazio ou timeout, criando nova conexão: {e}")
-        return create_new_connection()
+        finally:
+            return_connection(conn)
 
-def return_connection(conn):
-    """Retorna conexão para o pool com validação"""
+        entrada = {
+            'tabela': tabela,
+            'versao': versao,
+            'criado': time.time(),
+            'corpo': codificar_json(dados),
+            'comprimidos': {},  # codificação -> corpo comprimido, preenchido sob demanda
+            'etag': etag
+        }
+        with cache_listagens_lock:
+            cache_listagens_stats['misses'] += 1
+            if versoes_listagens.get(tabela, 0) == versao:
+                cache_listagens[chave] = entrada
+                cache_listagens.move_to_end(chave)
+                while len(cache_listagens) > CACHE_LISTAGENS_MAXIMO:
+                    cache_listagens.popitem(last=False)
+        return entrada
+    finally:
+        with cache_listagens_lock:
+            carregamentos_listagens.pop(chave, None)
+        carregando.set()
+
+# Cache de leitura da planilha de chamados (planilhas.CachePlanilha: relê só quando o arquivo muda)
+cache_excel_chamados = obter_cache(EXCEL_PATH, ABA, 'id')
+
+def get_cached_excel_data():
+    """Retrato atual da planilha de chamados, ou None se não foi possível ler"""
     try:
-        if connection_pool.qsize() < connection_pool.maxsize:
-            cursor = conn.cursor()
-            cursor.execute("SELECT 1")
-            cursor.fetchone()
-            cursor.close()
-            connection_pool.put(conn)
-        else:
-            conn.close()
+        return cache_excel_chamados.obter()
     except Exception as e:
-        logging.warning(f"Conexão inválida ao retornar para o pool, fechando: {e}")
-        try:
-            conn.close()
-        except Exception as close_e:
-            logging.error(f"Erro ao fechar conexão inválida ao retornar: {close_e}")
+        logging.error(f"Erro ao ler Excel: {e}")
+        return None
 
-@lru_cache(maxsize=100)
-def get_cached_excel_data():
-    """Cache dos dados do Excel com TTL"""
-    global excel_cache, excel_cache_time
-    current_time = time.time()
-    
-    if current_time - excel_cache_time > CACHE_DURATION:
-        try:
-            df = pd.read_excel(EXCEL_PATH, sheet_name=ABA)
-            df.columns = [re.sub(r'[:\s]+$', '', col.strip().lower()) for col in df.columns]
-            excel_cache = df.to_dict('records')
-            excel_cache_time = current_time
-        except Exception as e:
-            logging.error(f"Erro ao ler Excel: {e}")
-            return None
-    
-    return excel_cache
+# Um escritor por planilha: as alterações são gravadas em lote (planilhas.EscritorPlanilha)
+escritor_chamados = obter_escritor(EXCEL_PATH, ABA, 'id', ao_gravar=cache_excel_chamados.invalidar)
+escritor_sars = obter_escritor(SAR_EXCEL_PATH, ABA, 'numsar')
 
 def update_excel_optimized(chamado_id, novo_status, responsavel=None):
-    """Excel otimizado com cache inteligente e gravação direta"""
-    try:
-        df = pd.read_excel(EXCEL_PATH, sheet_name=ABA)
-        df.columns = [re.sub(r'[:\s]+$', '', col.strip().lower()) for col in df.columns]
-        
-        if 'id' not in df.columns:
-            logging.error("Coluna 'id' não encontrada no Excel.")
-            return False
-
-        mask = df['id'] == chamado_id
-        if not mask.any():
-            logging.warning(f"Chamado {chamado_id} não encontrado no Excel para atualização.")
-            return False
-            
-        if novo_status and 'status' in df.columns:
-            df.loc[mask, 'status'] = novo_status
-        
-        if responsavel is not None and 'responsavel' in df.columns:
-            df.loc[mask, 'responsavel'] = responsavel
-        
-        with pd.ExcelWriter(EXCEL_PATH, engine='openpyxl', mode='w') as writer:
-            df.to_excel(writer, sheet_name=ABA, index=False)
-        
-        global excel_cache_time
-        excel_cache_time = 0
-        get_cached_excel_data.cache_clear()
-        
-        return True
-        
-    except Exception as e:
-        logging.error(f"Erro ao atualizar Excel para chamado {chamado_id}: {e}")
-        return False
+    """Enfileira a alteração do chamado na planilha; devolve 'enfileirado', a gravação acontece em lote, em segundo plano"""
+    campos = {}
+    if novo_status:
+        campos['status'] = novo_status
+    if responsavel is not None:
+        campos['responsavel'] = responsavel
+    return escritor_chamados.enfileirar(chamado_id, campos)
 
 def update_excel_sar_optimized(sar_id, novo_status, responsavel=None):
-    """Excel otimizado para SARs"""
-    try:
-        df = pd.read_excel(SAR_EXCEL_PATH, sheet_name=ABA)
-        df.columns = [re.sub(r'[:\s]+$', '', col.strip().lower()) for col in df.columns]
-        
-        # Para a tabela ExecucaoSar, vamos usar NumSar como identificador
-        if 'numsar' not in df.columns:
-            logging.error("Coluna 'numsar' não encontrada no Excel de SARs.")
-            return False
-
-        mask = df['numsar'] == sar_id
-        if not mask.any():
-            logging.warning(f"SAR {sar_id} não encontrado no Excel para atualização.")
-            return False
-            
-        if novo_status and 'status' in df.columns:
-            df.loc[mask, 'status'] = novo_status
-        
-        if responsavel is not None and 'responsaveldtc' in df.columns:
-            df.loc[mask, 'responsaveldtc'] = responsavel
-        
-        with pd.ExcelWriter(SAR_EXCEL_PATH, engine='openpyxl', mode='w') as writer:
-            df.to_excel(writer, sheet_name=ABA, index=False)
-        
-        return True
-        
-    except Exception as e:
-        logging.error(f"Erro ao atualizar Excel para SAR {sar_id}: {e}")
-        return False
+    """Enfileira a alteração do SAR na planilha (NumSar como identificador), gravada em lote; devolve 'enfileirado'"""
+    campos = {}
+    if novo_status:
+        campos['status'] = novo_status
+    if responsavel is not None:
+        campos['responsaveldtc'] = responsavel
+    return escritor_sars.enfileirar(sar_id, campos)
 
 def update_redmine_optimized(item_id, status_id=None, notes=None, assignee_id=None):
     """Redmine otimizado com retry e timeout"""
@@ -246,8 +240,11 @@ def update_redmine_optimized(item_id, status_id=None, notes=None, assignee_id=No
     
     return False
 
-def update_database_optimized(chamado_id, operation_type, observacoes=None, campos_atualizacao=None):
-    """Operação de banco otimizada com prepared statement e suporte a observações/atualização genérica para CHAMADOS"""
+def update_database_optimized(chamado_id, operation_type, campos_atualizacao=None):
+    """Operação de banco otimizada com prepared statement e atualização genérica para CHAMADOS.
+
+    Observações não passam por aqui: ficam no HistoricoObservacoes (gravar_observacao).
+    """
     conn = None
     try:
         conn = get_connection()
@@ -255,33 +252,31 @@ def update_database_optimized(chamado_id, operation_type, observacoes=None, camp
         
         if operation_type == 'delete':
             cursor.execute("DELETE FROM dbo.[GRC-Chamados] WHERE ID = ?", (chamado_id,))
-        elif operation_type == 'update_observacoes':
-            cursor.execute(
-                "UPDATE dbo.[GRC-Chamados] SET Observacoes = ? WHERE ID = ?", 
-                (observacoes, chamado_id)
-            )
+            if cursor.rowcount:
+                registrar_alteracao(cursor, 'GRC-Chamados', chamado_id, 'D')
         elif operation_type == 'check_status':
             cursor.execute("SELECT COUNT(*) FROM dbo.[GRC-Chamados] WHERE ID = ?", (chamado_id,))
             result = cursor.fetchone()
             return result[0] > 0 if result else False
-        elif operation_type == 'get_observacoes':
-            cursor.execute("SELECT Observacoes FROM dbo.[GRC-Chamados] WHERE ID = ?", (chamado_id,))
-            result = cursor.fetchone()
-            return result[0] if result and result[0] else ""
         elif operation_type == 'get_responsavel':
             cursor.execute("SELECT Responsavel FROM dbo.[GRC-Chamados] WHERE ID = ?", (chamado_id,))
             result = cursor.fetchone()
             return result[0] if result else None
         elif operation_type == 'generic_update' and campos_atualizacao:
             campos_filtrados = {k: v for k, v in campos_atualizacao.items() if v is not None or k == 'Responsavel'}
+            campos_filtrados = filtrar_colunas_existentes('GRC-Chamados', campos_filtrados)
             
             if campos_filtrados:
                 set_clauses = [f"[{k}] = ?" for k in campos_filtrados.keys()]
                 values = list(campos_filtrados.values())
                 query = f"UPDATE dbo.[GRC-Chamados] SET {', '.join(set_clauses)} WHERE ID = ?"
                 cursor.execute(query, (*values, chamado_id))
+                if cursor.rowcount:
+                    registrar_alteracao(cursor, 'GRC-Chamados', chamado_id, 'U')
 
         conn.commit()
+        if operation_type in OPERACOES_ESCRITA:
+            invalidar_cache_listagens('GRC-Chamados')
         return True
         
     except Exception as e:
@@ -298,7 +293,7 @@ def update_database_optimized(chamado_id, operation_type, observacoes=None, camp
 
 # ============= FUNÇÕES AUXILIARES PARA SARs =============
 
-def update_database_sar_optimized(sar_identifier, operation_type, observacoes=None, campos_atualizacao=None):
+def update_database_sar_optimized(sar_identifier, operation_type, campos_atualizacao=None):
     """Operação de banco otimizada para SARs - usando NumSar como identificador"""
     conn = None
     try:
@@ -307,20 +302,12 @@ def update_database_sar_optimized(sar_identifier, operation_type, observacoes=No
         
         if operation_type == 'delete':
             cursor.execute("DELETE FROM dbo.[ExecucaoSar] WHERE NumSar = ?", (sar_identifier,))
-        elif operation_type == 'update_observacoes':
-            # Como a tabela não tem campo Observacoes, vamos adicionar no Caminho ou criar um campo
-            cursor.execute(
-                "UPDATE dbo.[ExecucaoSar] SET Caminho = ? WHERE NumSar = ?", 
-                (observacoes, sar_identifier)
-            )
+            if cursor.rowcount:
+                registrar_alteracao(cursor, 'ExecucaoSar', sar_identifier, 'D')
         elif operation_type == 'check_status':
             cursor.execute("SELECT COUNT(*) FROM dbo.[ExecucaoSar] WHERE NumSar = ?", (sar_identifier,))
             result = cursor.fetchone()
             return result[0] > 0 if result else False
-        elif operation_type == 'get_observacoes':
-            cursor.execute("SELECT Caminho FROM dbo.[ExecucaoSar] WHERE NumSar = ?", (sar_identifier,))
-            result = cursor.fetchone()
-            return result[0] if result and result[0] else ""
         elif operation_type == 'get_responsavel':
             cursor.execute("SELECT ResponsavelDTC FROM dbo.[ExecucaoSar] WHERE NumSar = ?", (sar_identifier,))
             result = cursor.fetchone()
@@ -333,21 +320,24 @@ def update_database_sar_optimized(sar_identifier, operation_type, observacoes=No
                     campos_mapeados['ResponsavelDTC'] = v
                 elif k == 'status':
                     campos_mapeados['Status'] = v
-                elif k == 'observacoes':
-                    campos_mapeados['Caminho'] = v
                 else:
                     # Manter outros campos como estão se existirem na tabela
                     campos_mapeados[k] = v
             
             campos_filtrados = {k: v for k, v in campos_mapeados.items() if v is not None or k == 'ResponsavelDTC'}
+            campos_filtrados = filtrar_colunas_existentes('ExecucaoSar', campos_filtrados)
             
             if campos_filtrados:
                 set_clauses = [f"[{k}] = ?" for k in campos_filtrados.keys()]
                 values = list(campos_filtrados.values())
                 query = f"UPDATE dbo.[ExecucaoSar] SET {', '.join(set_clauses)} WHERE NumSar = ?"
                 cursor.execute(query, (*values, sar_identifier))
+                if cursor.rowcount:
+                    registrar_alteracao(cursor, 'ExecucaoSar', sar_identifier, 'U')
 
         conn.commit()
+        if operation_type in OPERACOES_ESCRITA:
+            invalidar_cache_listagens('ExecucaoSar')
         return True
         
     except Exception as e:
@@ -366,179 +356,674 @@ def verificar_status_sar(sar_identifier):
     """Verifica se o SAR está ativo (não fechado/cancelado)"""
     return update_database_sar_optimized(sar_identifier, 'check_status')
 
-def obter_observacoes_sar_db(sar_identifier):
-    """Obtém as observações do SAR do banco de dados"""
-    return update_database_sar_optimized(sar_identifier, 'get_observacoes')
-
 # Funções utilitárias
-def obter_observacoes_chamado(chamado_id):
-    """Obtém as observações do chamado do banco de dados"""
-    return update_database_optimized(chamado_id, 'get_observacoes')
-
-def salvar_observacoes_chamado(chamado_id, observacoes):
-    """Salva as observações do chamado no banco de dados"""
-    return update_database_optimized(chamado_id, 'update_observacoes', observacoes=observacoes)
-
 def verificar_status_chamado(chamado_id):
     """Verifica se o chamado está ativo (não fechado/cancelado)"""
     return update_database_optimized(chamado_id, 'check_status')
 
-def formatar_observacao(usuario, observacao):
-    """Formata uma nova observação com timestamp e usuário"""
-    data_hora = datetime.now().strftime("%d/%m/%Y %H:%M")
-    return f"[{data_hora} - {usuario}]: {observacao}"
+def ler_formato_stream():
+    """Lê ?stream= da query string: 'ndjson', 'json' ou None (resposta normal)"""
+    formato = request.args.get('stream')
+    if not formato:
+        return None
+    if formato not in FORMATOS_STREAM:
+        raise ValueError(f"stream deve ser um de {sorted(FORMATOS_STREAM)}")
+    return formato
+
+def codificar_cursor_sar(data_solicitacao, num_sar):
+    """Gera o token opaco do cursor composto (DataSolicitacao, NumSar) dos SARs.
+
+    O tipo da data vai junto no token: a coluna pode ser datetime, date ou texto,
+    e o seek precisa comparar com um valor do mesmo tipo.
+    """
+    if data_solicitacao is None:
+        tipo, data = None, None
+    elif isinstance(data_solicitacao, datetime):
+        tipo, data = 'datetime', data_solicitacao.isoformat()
+    elif isinstance(data_solicitacao, date):
+        tipo, data = 'date', data_solicitacao.isoformat()
+    else:
+        tipo, data = 'texto', str(data_solicitacao)
+    bruto = json.dumps([data, num_sar, tipo], default=str).encode('utf-8')
+    return base64.urlsafe_b64encode(bruto).decode('ascii')
+
+def decodificar_cursor_sar(token):
+    """Lê o token gerado por codificar_cursor_sar; retorna (DataSolicitacao, NumSar)"""
+    try:
+        data, num_sar, *tipo = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        tipo = tipo[0] if tipo else 'datetime'  # tokens antigos só tinham datetime
+        if data is None:
+            return None, num_sar
+        if tipo == 'datetime':
+            return datetime.fromisoformat(data), num_sar
+        if tipo == 'date':
+            return date.fromisoformat(data), num_sar
+        if tipo == 'texto':
+            return data, num_sar
+        raise ValueError(tipo)
+    except Exception:
+        raise ValueError("cursor after inválido")
+
+def montar_consulta_sars(limite=None, cursor_sar=None, filtro=None, colunas=None):
+    """Monta o SELECT de SARs por (DataSolicitacao, NumSar) decrescente, com filtros e seek opcional.
+
+    SARs sem DataSolicitacao vêm depois de todos os datados (NULL é o menor valor
+    no ORDER BY ... DESC). Com cursor numa data, os datados restantes e a cauda
+    sem data são dois SELECTs unidos por UNION ALL, cada um com seu predicado de
+    seek no índice (DataSolicitacao DESC, NumSar DESC) da migração 001: um OR
+    com "DataSolicitacao IS NULL" no mesmo WHERE impediria o seek.
+    """
+    condicoes, parametros = (list(filtro[0]), list(filtro[1])) if filtro else ([], [])
+    topo = "TOP (?) " if limite is not None else ""
+    ordem = "ORDER BY DataSolicitacao DESC, NumSar DESC"  # NumSar desempata SARs da mesma data
+
+    def ramo(predicado, valores):
+        where = " AND ".join(condicoes + [predicado])
+        return (
+            f"SELECT {topo}{lista_select(colunas)} FROM dbo.[ExecucaoSar] WHERE {where} {ordem if limite is not None else ''}",
+            ([limite] if limite is not None else []) + parametros + list(valores)
+        )
+
+    if cursor_sar is not None and cursor_sar[0] is not None:
+        data_cursor, num_sar_cursor = cursor_sar
+        datados, parametros_datados = ramo(
+            "(DataSolicitacao < ? OR (DataSolicitacao = ? AND NumSar < ?))",
+            (data_cursor, data_cursor, num_sar_cursor)
+        )
+        sem_data, parametros_sem_data = ramo("DataSolicitacao IS NULL", ())
+        # Com TOP, cada ramo precisa de uma tabela derivada para poder ter o próprio ORDER BY
+        return (
+            f"SELECT {topo}* FROM ("
+            f"SELECT * FROM ({datados}) AS datados UNION ALL SELECT * FROM ({sem_data}) AS sem_data"
+            f") AS pagina {ordem}",
+            tuple(([limite] if limite is not None else []) + parametros_datados + parametros_sem_data)
+        )
+
+    if cursor_sar is not None:
+        condicoes.append("DataSolicitacao IS NULL AND NumSar < ?")
+        parametros.append(cursor_sar[1])
+
+    where = f"WHERE {' AND '.join(condicoes)} " if condicoes else ""
+    if limite is not None:
+        parametros.insert(0, limite)
+    return (
+        f"SELECT {topo}{lista_select(colunas)} FROM dbo.[ExecucaoSar] {where}{ordem}",
+        tuple(parametros)
+    )
 
-# ============= ROTAS PRINCIPAIS PARA CHAMADOS =============
+def calcular_etag_listagem(cursor, tabela):
+    """ETag da listagem a partir de COUNT_BIG + MAX da coluna rowversion (COLUNA_VERSAO).
+
+    Com o índice da migração 003 são duas leituras de índice. Sem a coluna não há
+    ETag (devolve None, a listagem responde sempre 200): um checksum da tabela
+    inteira custaria uma varredura por pedido, ignora colunas text/ntext/image e
+    pode colidir, devolvendo 304 com dados velhos. A query string entra no hash
+    porque filtros e páginas diferentes geram respostas diferentes.
+    """
+    if COLUNA_VERSAO not in obter_colunas(tabela):
+        if tabela not in tabelas_sem_versao:
+            tabelas_sem_versao.add(tabela)
+            logging.warning(f"⚠️ {tabela} sem {COLUNA_VERSAO}: listagens sem ETag/304 (aplique migrations/003)")
+        return None
+    cursor.execute(f"SELECT COUNT_BIG(*), MAX([{COLUNA_VERSAO}]) FROM dbo.[{tabela}]")
+    total, versao = cursor.fetchone()
+    if isinstance(versao, (bytes, bytearray)):
+        versao = versao.hex()
+
+    bruto = f"{tabela}|{total}|{versao}|{request.query_string.decode('utf-8', 'replace')}"
+    return hashlib.sha1(bruto.encode('utf-8')).hexdigest()
+
+def etag_confere(etag):
+    """O cliente já tem esta versão (If-None-Match); nunca, quando não há ETag"""
+    return etag is not None and request.if_none_match.contains_weak(etag)
+
+def marcar_etag(resposta, etag):
+    """Anexa o ETag e pede revalidação a cada uso (o navegador reenvia If-None-Match)"""
+    if etag is not None:
+        resposta.set_etag(etag, weak=True)
+    resposta.headers['Cache-Control'] = 'no-cache'
+    return resposta
+
+def responder_nao_modificado(etag):
+    """304 sem corpo quando o cliente já tem a versão atual da listagem"""
+    return marcar_etag(Response(status=304), etag)
+
+def responder_corpo_json(corpo, comprimidos=None):
+    """Response com JSON já codificado, comprimido (br/gzip) se o cliente aceita e o corpo é grande.
+
+    `comprimidos` guarda as versões comprimidas entre pedidos (entrada do cache de
+    listagens), para comprimir cada corpo uma vez por codificação.
+    """
+    codificacao = escolher_codificacao(request.accept_encodings, len(corpo))
+    if codificacao:
+        comprimido = comprimidos.get(codificacao) if comprimidos is not None else None
+        if comprimido is None:
+            comprimido = comprimir(corpo, codificacao)
+            if comprimidos is not None:
+                comprimidos[codificacao] = comprimido
+        corpo = comprimido
+
+    resposta = Response(corpo, mimetype='application/json')
+    resposta.vary.add('Accept-Encoding')
+    if codificacao:
+        resposta.headers['Content-Encoding'] = codificacao
+    return resposta
+
+def responder_listagem_cache(tabela, carregar):
+    """Resposta JSON da listagem a partir do cache, com ETag/304 (sem consultar a listagem no 304)"""
+    entrada = obter_listagem_cache(tabela, (request.path, request.query_string), carregar)
+    if etag_confere(entrada['etag']):
+        return responder_nao_modificado(entrada['etag'])
+    return marcar_etag(responder_corpo_json(entrada['corpo'], entrada['comprimidos']), entrada['etag']), 200
+
+def transmitir_listagem(tabela, campos, formato, descricao, consulta):
+    """Executa a consulta (sql, parâmetros) e responde em stream com ETag; não passa pelo cache"""
+    conn = None
+    try:
+        conn = get_connection()
+        cursor = conn.cursor()
 
-@app.route("/api/chamados", methods=["GET", "OPTIONS"])
-@cross_origin(methods=["GET", "OPTIONS"], supports_credentials=True)
-def listar_chamados():
-    """Lista todos os chamados para o frontend pai"""
+        etag = calcular_etag_listagem(cursor, tabela)
+        if etag_confere(etag):
+            return responder_nao_modificado(etag)
+
+        cursor.execute(*consulta)
+        resposta = responder_listagem_stream(conn, cursor, campos, formato, descricao)
+        conn = None  # a conexão agora pertence ao stream
+        return marcar_etag(resposta, etag)
+
+    except Exception as e:
+        logging.error(f"❌ Erro ao listar {descricao}: {e}")
+        return jsonify({"erro": str(e)}), 500
+    finally:
+        if conn:
+            return_connection(conn)
+
+def responder_listagem_stream(conn, cursor, campos, formato, descricao):
+    """Envia o resultado já executado no cursor em lotes de fetchmany.
+
+    O corpo é gerado aos poucos (NDJSON ou array JSON em pedaços), então a memória
+    fica limitada a um lote e o primeiro byte sai antes de ler a tabela inteira.
+    A conexão passa a pertencer ao gerador e volta ao pool quando ele termina,
+    inclusive se o cliente desconectar no meio.
+    """
+    projetar = compilar_projetor(campos, tuple(description[0] for description in cursor.description))
+
+    def gerar():
+        total = 0
+        try:
+            if formato == 'json':
+                yield b'['
+            while True:
+                linhas = cursor.fetchmany(TAMANHO_LOTE_STREAM)
+                if not linhas:
+                    break
+                itens = [codificar_json(projetar(row)) for row in linhas]
+                if formato == 'ndjson':
+                    yield b'\n'.join(itens) + b'\n'
+                else:
+                    yield (b',' if total else b'') + b','.join(itens)
+                total += len(itens)
+            if formato == 'json':
+                yield b']'
+            logging.info(f"✅ Stream de {total} {descricao} enviado ({formato})")
+        finally:
+            try:
+                cursor.close()
+            except Exception as close_e:
+                logging.warning(f"Erro ao fechar cursor do stream de {descricao}: {close_e}")
+            return_connection(conn)
+
+    mimetype = 'application/x-ndjson' if formato == 'ndjson' else 'application/json'
+    return Response(stream_with_context(gerar()), mimetype=mimetype)
+
+def ler_token_alteracoes():
+    """Lê ?since= (token devolvido pela sincronização anterior); None pede a carga completa.
+
+    Tokens antigos (número puro, do tempo em que o token era o IDENTITY do
+    registro) não são comparáveis com os atuais e também pedem a carga completa.
+    """
+    token = request.args.get('since')
+    if token is None or token == '':
+        return None
+    if token.isdigit():
+        logging.info(f"🔄 Token de delta-sync no formato antigo ({token}); enviando carga completa")
+        return None
+    if not token.startswith(PREFIXO_TOKEN_ALTERACOES) or not token[len(PREFIXO_TOKEN_ALTERACOES):].isdigit():
+        raise ValueError("since deve ser um token devolvido por /changes")
+    return int(token[len(PREFIXO_TOKEN_ALTERACOES):])
+
+def formatar_token_alteracoes(versao):
+    return f"{PREFIXO_TOKEN_ALTERACOES}{versao}"
+
+def listar_alteracoes(tabela, coluna_chave, campos, montar_consulta, converter_chave, chave_resposta):
+    """Corpo comum de /api/chamados/changes e /api/sars/changes.
+
+    Sem ?since= devolve todas as linhas e o token atual (carga inicial). Com
+    ?since= devolve só as linhas alteradas depois do token, já projetadas, e as
+    chaves removidas em "removidos"; token expirado (anterior ao corte da última
+    limpeza do registro) também recebe a carga completa, com "completo": true.
+    Cada chave aparece uma vez, com a última operação registrada; "tem_mais"
+    indica que há mais alterações a buscar com o novo token.
+
+    O token é o rowversion (VersaoLinha) do registro, limitado por
+    MIN_ACTIVE_ROWVERSION(): só entram anotações de transações já confirmadas, e
+    o token nunca passa de uma transação ainda aberta, que pode confirmar depois
+    com uma versão menor que as já entregues. O corte é lido antes das linhas,
+    então uma escrita concorrente no máximo é entregue de novo na próxima
+    sincronização. Escritas cuja anotação falhou (ver registrar_alteracao) só
+    chegam na carga completa.
+    """
     if request.method == "OPTIONS":
         return '', 200
-    
+
+    try:
+        since = ler_token_alteracoes()
+        limite = ler_limite_paginacao() or LIMITE_PAGINA_MAXIMO
+    except ValueError as e:
+        return jsonify({"erro": f"Parâmetros de sincronização inválidos: {e}"}), 400
+
+    if COLUNA_VERSAO_ALTERACOES not in obter_colunas(TABELA_ALTERACOES):
+        return jsonify({
+            "erro": "Delta-sync indisponível: aplique migrations/004_registro_alteracoes.sql "
+                    "e migrations/006_registro_alteracoes_versao.sql"
+        }), 501
+
     conn = None
     try:
         conn = get_connection()
         cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT COLUMN_NAME 
-            FROM INFORMATION_SCHEMA.COLUMNS 
-            WHERE TABLE_NAME = 'GRC-Chamados' 
-            ORDER BY ORDINAL_POSITION
-        """)
-        
-        colunas_existentes = [row[0] for row in cursor.fetchall()]
-        logging.info(f"📋 Colunas encontradas na tabela: {colunas_existentes}")
-        
-        cursor.execute("SELECT * FROM dbo.[GRC-Chamados] ORDER BY ID DESC")
-        resultados = cursor.fetchall()
-        
-        chamados = []
-        for row in resultados:
-            chamado = {}
-            
-            for i, coluna in enumerate(colunas_existentes):
-                valor = row[i] if i < len(row) else None
-                chamado[coluna] = valor if valor is not None else ''
-            
-            chamado_padronizado = {
-                'id': chamado.get('ID', ''),
-                'nomeSolicitante': chamado.get('nomeSolicitante', chamado.get('NomeSolicitante', chamado.get('nome_solicitante', ''))),
-                'telefone': chamado.get('telefone', chamado.get('Telefone', '')),
-                'emailSolicitante': chamado.get('emailSolicitante', chamado.get('EmailSolicitante', chamado.get('email_solicitante', ''))),
-                'empresa': chamado.get('empresa', chamado.get('Empresa', '')),
-                'cidade': chamado.get('cidade', chamado.get('Cidade', '')),
-                'tecnologia': chamado.get('tecnologia', chamado.get('Tecnologia', '')),
-                'nodeAfetadas': chamado.get('nodeAfetadas', chamado.get('NodeAfetadas', chamado.get('node_afetadas', ''))),
-                'tipoReclamacao': chamado.get('tipoReclamacao', chamado.get('TipoReclamacao', chamado.get('tipo_reclamacao', ''))),
-                'detalhesProblema': chamado.get('detalhesProblema', chamado.get('DetalhesProblema', chamado.get('detalhes_problema', ''))),
-                'testesRealizados': chamado.get('testesRealizados', chamado.get('TestesRealizados', chamado.get('testes_realizados', ''))),
-                'modelEquipamento': chamado.get('modelEquipamento', chamado.get('ModelEquipamento', chamado.get('model_equipamento', ''))),
-                'baseAfetada': chamado.get('baseAfetada', chamado.get('BaseAfetada', chamado.get('base_afetada', ''))),
-                'contratosAfetados': chamado.get('contratosAfetados', chamado.get('ContratosAfetados', chamado.get('contratos_afetados', ''))),
-                'servicoAfetado': chamado.get('servicoAfetado', chamado.get('ServicoAfetado', chamado.get('servico_afetado', ''))),
-                'dataEvento': chamado.get('dataEvento', chamado.get('DataEvento', chamado.get('data_evento', ''))),
-                'horaInicio': chamado.get('horaInicio', chamado.get('HoraInicio', chamado.get('hora_inicio', ''))),
-                'horaConclusao': chamado.get('horaConclusao', chamado.get('HoraConclusao', chamado.get('hora_conclusao', ''))),
-                'status': chamado.get('status', chamado.get('Status', 'Pendente')),
-                'prioridade': chamado.get('prioridade', chamado.get('Prioridade', 'Baixa')),
-                'responsavel': chamado.get('responsavel', chamado.get('Responsavel', '')),
-                'observacoes': chamado.get('observacoes', chamado.get('Observacoes', ''))
-            }
-            
-            chamados.append(chamado_padronizado)
-        
+
+        # Tudo abaixo do corte já foi confirmado; o token nunca passa dele
+        cursor.execute("SELECT CAST(MIN_ACTIVE_ROWVERSION() AS BIGINT)")
+        corte = cursor.fetchone()[0]
+        token_atual = corte - 1
+
+        # Token abaixo do corte da última limpeza (dbo.LimparRegistroAlteracoes) pode ter perdido alterações
+        cursor.execute(f"SELECT VersaoCorte FROM dbo.[{TABELA_CORTE_ALTERACOES}] WHERE Tabela = ?", (tabela,))
+        linha_limpeza = cursor.fetchone()
+        if since is not None and linha_limpeza is not None and since < linha_limpeza[0]:
+            logging.info(f"🔄 Token {since} de {chave_resposta} expirado; enviando carga completa")
+            since = None
+
+        if since is None:
+            consulta, parametros = montar_consulta()
+            cursor.execute(consulta, parametros)
+            resultados = cursor.fetchall()
+            colunas = verificar_esquema(tabela, (description[0] for description in cursor.description))
+            projetar = compilar_projetor(campos, colunas)
+            linhas = [projetar(row) for row in resultados]
+            cursor.close()
+
+            logging.info(f"🔄 Carga completa de {len(linhas)} {chave_resposta} (token {token_atual})")
+            return responder_corpo_json(codificar_json({
+                chave_resposta: linhas,
+                "removidos": [],
+                "token": formatar_token_alteracoes(token_atual),
+                "completo": True,
+                "tem_mais": False
+            }))
+
+        # Última operação de cada chave alterada entre o token e o corte, na ordem do registro.
+        # Os limites vão como BINARY(8) para a comparação com o rowversion usar o índice.
+        cursor.execute(f"""
+            SELECT TOP (?) Chave, Operacao, Versao FROM (
+                SELECT Chave, Operacao, CAST([{COLUNA_VERSAO_ALTERACOES}] AS BIGINT) AS Versao,
+                       ROW_NUMBER() OVER (PARTITION BY Chave ORDER BY [{COLUNA_VERSAO_ALTERACOES}] DESC) AS Ordem
+                FROM dbo.[{TABELA_ALTERACOES}]
+                WHERE Tabela = ?
+                  AND [{COLUNA_VERSAO_ALTERACOES}] > CAST(CAST(? AS BIGINT) AS BINARY(8))
+                  AND [{COLUNA_VERSAO_ALTERACOES}] < CAST(CAST(? AS BIGINT) AS BINARY(8))
+            ) AS ultimas
+            WHERE Ordem = 1
+            ORDER BY Versao
+        """, (limite + 1, tabela, since, corte))
+        alteracoes = cursor.fetchall()
+
+        tem_mais = len(alteracoes) > limite
+        if tem_mais:
+            alteracoes = alteracoes[:limite]
+            novo_token = alteracoes[-1][2]
+        else:
+            novo_token = max(token_atual, since)
+
+        alteradas = [chave for chave, operacao, _ in alteracoes if operacao != 'D']
+        removidos = {chave for chave, operacao, _ in alteracoes if operacao == 'D'}
+
+        linhas = []
+        encontradas = set()
+        for inicio in range(0, len(alteradas), TAMANHO_LOTE_ALTERACOES):
+            lote = alteradas[inicio:inicio + TAMANHO_LOTE_ALTERACOES]
+            placeholders = ", ".join("?" for _ in lote)
+            cursor.execute(f"SELECT * FROM dbo.[{tabela}] WHERE [{coluna_chave}] IN ({placeholders})", lote)
+            resultados = cursor.fetchall()
+            colunas = verificar_esquema(tabela, (description[0] for description in cursor.description))
+            projetar = compilar_projetor(campos, colunas)
+            indice_chave = colunas.index(coluna_chave)
+            for row in resultados:
+                encontradas.add(str(row[indice_chave]))
+                linhas.append(projetar(row))
         cursor.close()
-        
-        logging.info(f"✅ Listando {len(chamados)} chamados para o frontend")
-        return jsonify(chamados), 200
-        
+
+        # Alterada no registro mas ausente na tabela: removida por fora da API
+        removidos.update(chave for chave in alteradas if chave not in encontradas)
+
+        logging.info(
+            f"🔄 Delta de {chave_resposta} desde {since}: {len(linhas)} alterados, "
+            f"{len(removidos)} removidos (token {novo_token})"
+        )
+        return responder_corpo_json(codificar_json({
+            chave_resposta: linhas,
+            "removidos": sorted(converter_chave(chave) for chave in removidos),
+            "token": formatar_token_alteracoes(novo_token),
+            "completo": False,
+            "tem_mais": tem_mais
+        }))
+
     except Exception as e:
-        logging.error(f"❌ Erro ao listar chamados: {e}")
+        logging.error(f"❌ Erro ao sincronizar {chave_resposta}: {e}")
         return jsonify({"erro": str(e)}), 500
     finally:
         if conn:
             return_connection(conn)
 
+# ============= CANAL DE EVENTOS (SSE) =============
+
+def publicar_evento(tipo, **dados):
+    """Envia um evento pequeno (ex.: 'sar.assumido') a todos os clientes conectados.
+
+    Chamado pelas rotas de escrita depois do commit. Nunca bloqueia: um assinante
+    com a fila cheia é desligado e recebe "resync" para recarregar a lista.
+    """
+    global ultimo_evento_id
+    try:
+        with eventos_lock:
+            ultimo_evento_id += 1
+            evento = (ultimo_evento_id, tipo, app.json.dumps(dados))
+            historico_eventos.append(evento)
+            for fila in list(assinantes_eventos):
+                try:
+                    fila.put_nowait(evento)
+                except Full:
+                    assinantes_eventos.discard(fila)
+                    # Só a publicação (sob o lock) coloca itens na fila: liberar um espaço garante o put
+                    try:
+                        fila.get_nowait()
+                    except Empty:
+                        pass
+                    fila.put_nowait(evento_resync())
+                    logging.warning("⚠️ Assinante de eventos atrasado desligado (resync)")
+    except Exception as e:
+        logging.error(f"Erro ao publicar evento {tipo}: {e}")
+
+def ler_id_evento(texto):
+    """Número do Last-Event-ID '<época>-<número>'; None se ausente, -1 se de outra época ou inválido"""
+    if not texto:
+        return None
+    epoca, _, numero = texto.partition('-')
+    if epoca != EPOCA_EVENTOS or not numero.isdigit():
+        return -1
+    return int(numero)
+
+def evento_resync():
+    """Evento "resync" com o id atual; chamar sob eventos_lock"""
+    return (ultimo_evento_id, 'resync', '{}')
+
+def assinar_eventos(ultimo_id_cliente=None):
+    """Registra um assinante; retorna (fila, eventos perdidos desde ultimo_id_cliente, resync ou None).
+
+    ultimo_id_cliente vem de ler_id_evento: -1 (outra época) sempre pede resync.
+    """
+    fila = Queue(maxsize=TAMANHO_FILA_ASSINANTE)
+    with eventos_lock:
+        if len(assinantes_eventos) >= MAXIMO_ASSINANTES_EVENTOS:
+            return None, [], None
+
+        pendentes, precisa_resync = [], False
+        if ultimo_id_cliente is not None and 0 <= ultimo_id_cliente < ultimo_evento_id:
+            pendentes = [evento for evento in historico_eventos if evento[0] > ultimo_id_cliente]
+            # O histórico não cobre a lacuna: o cliente recarrega tudo
+            if not pendentes or pendentes[0][0] != ultimo_id_cliente + 1:
+                pendentes, precisa_resync = [], True
+        elif ultimo_id_cliente is not None and (ultimo_id_cliente < 0 or ultimo_id_cliente > ultimo_evento_id):
+            precisa_resync = True
+
+        assinantes_eventos.add(fila)
+        resync = evento_resync() if precisa_resync else None
+    return fila, pendentes, resync
+
+def cancelar_assinatura(fila):
+    """Remove o assinante (cliente desconectou)"""
+    with eventos_lock:
+        assinantes_eventos.discard(fila)
+
+def formatar_evento_sse(evento):
+    """Serializa (id, tipo, dados JSON) no formato text/event-stream, com o id prefixado pela época"""
+    evento_id, tipo, dados = evento
+    return f"id: {EPOCA_EVENTOS}-{evento_id}\nevent: {tipo}\ndata: {dados}\n\n"
+
+@app.route("/api/eventos", methods=["GET"])
+@cross_origin(methods=["GET"], supports_credentials=True)
+def eventos_quadro():
+    """Server-Sent Events com as alterações do quadro.
+
+    Cada evento tem id '<época do processo>-<número incremental>', tipo '<canal>.<ação>' (sar.assumido,
+    sar.observacao, ...) e dados JSON com a chave do item e o que mudou, para o
+    cliente corrigir o estado local sem buscar a lista de novo. ?canal= limita os
+    canais (CANAIS_EVENTOS: só sar; o quadro de chamados grava pela porta 5000 e
+    continua recarregando a lista). Na reconexão o EventSource manda Last-Event-ID
+    e recebe o que perdeu; se o histórico não cobre a lacuna, ou o id é de antes
+    de um reinício do servidor, chega "resync".
+    """
+    canais = tuple(c.strip() for c in request.args.get('canal', '').split(',') if c.strip()) or CANAIS_EVENTOS
+    if any(canal not in CANAIS_EVENTOS for canal in canais):
+        return jsonify({"erro": f"canal deve ser um de {list(CANAIS_EVENTOS)}"}), 400
+    prefixos = tuple(f"{canal}." for canal in canais)
+
+    ultimo_id = ler_id_evento(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+
+    fila, pendentes, resync = assinar_eventos(ultimo_id)
+    if fila is None:
+        return jsonify({"erro": "Limite de conexões de eventos atingido"}), 503
+
+    def gerar():
+        try:
+            yield "retry: 3000\n\n"
+            if resync:
+                yield formatar_evento_sse(resync)
+            for evento in pendentes:
+                if evento[1].startswith(prefixos):
+                    yield formatar_evento_sse(evento)
+            while True:
+                try:
+                    evento = fila.get(timeout=INTERVALO_HEARTBEAT_EVENTOS)
+                except Empty:
+                    yield ": ping\n\n"
+                    continue
+                if evento[1] == 'resync':
+                    yield formatar_evento_sse(evento)
+                    return
+                if evento[1].startswith(prefixos):
+                    yield formatar_evento_sse(evento)
+        finally:
+            cancelar_assinatura(fila)
+
+    resposta = Response(stream_with_context(gerar()), mimetype='text/event-stream')
+    resposta.headers['Cache-Control'] = 'no-cache'
+    resposta.headers['X-Accel-Buffering'] = 'no'
+    return resposta
+
+# ============= ROTAS PRINCIPAIS PARA CHAMADOS =============
+
+@app.route("/api/chamados", methods=["GET", "OPTIONS"])
+@cross_origin(methods=["GET", "OPTIONS"], supports_credentials=True)
+def listar_chamados():
+    """Lista os chamados para o frontend pai.
+
+    Sem parâmetros devolve a lista completa (compatibilidade). Com ?limit= e/ou
+    ?after_id= devolve uma página em ordem de ID decrescente e o cursor da próxima
+    página em "next_cursor" (None quando não há mais chamados).
+    Com ?stream=ndjson ou ?stream=json as linhas são enviadas em lotes, sem montar
+    a lista em memória; limit/after_id continuam valendo, mas sem "next_cursor".
+    Filtros (ver ler_filtros) viram WHERE no banco e valem em todos os modos;
+    o período usa o campo dataEvento.
+    ?fields=id,status,responsavel,... devolve só esses campos e seleciona só as
+    colunas correspondentes no banco.
+    As respostas não-stream saem do cache de listagens (obter_listagem_cache).
+    """
+    if request.method == "OPTIONS":
+        return '', 200
+
+    try:
+        limite = ler_limite_paginacao()
+        after_id = request.args.get('after_id')
+        after_id = int(after_id) if after_id not in (None, '') else None
+        formato_stream = ler_formato_stream()
+        filtro = ler_filtros('GRC-Chamados', CAMPOS_CHAMADO, 'dataEvento')
+        campos = ler_campos_projecao(CAMPOS_CHAMADO)
+    except ValueError as e:
+        return jsonify({"erro": f"Parâmetros de listagem inválidos: {e}"}), 400
+
+    paginado = limite is not None or after_id is not None
+    if paginado and limite is None:
+        limite = LIMITE_PAGINA_PADRAO
+
+    # Sem ?fields= continua SELECT * (e com verificação de esquema)
+    selecao = colunas_projecao('GRC-Chamados', campos, ('ID',)) if campos else None
+    campos = campos or CAMPOS_CHAMADO
+
+    if formato_stream:
+        return transmitir_listagem(
+            'GRC-Chamados', campos, formato_stream, "chamados",
+            montar_consulta_chamados(limite, after_id, filtro, selecao)
+        )
+
+    def carregar(cursor):
+        # Uma linha a mais que o limite indica que existe próxima página
+        consulta, parametros = montar_consulta_chamados(limite + 1 if paginado else None, after_id, filtro, selecao)
+        cursor.execute(consulta, parametros)
+        resultados = cursor.fetchall()
+        colunas = tuple(description[0] for description in cursor.description)
+        if selecao is None:
+            colunas = verificar_esquema('GRC-Chamados', colunas)
+
+        proximo_cursor = None
+        if paginado and len(resultados) > limite:
+            resultados = resultados[:limite]
+            proximo_cursor = resultados[-1][colunas.index('ID')]
+
+        projetar = compilar_projetor(campos, colunas)
+        chamados = [projetar(row) for row in resultados]
+
+        logging.info(f"✅ Listando {len(chamados)} chamados para o frontend")
+
+        if not paginado:
+            return chamados
+        return {
+            "chamados": chamados,
+            "next_cursor": proximo_cursor,
+            "limit": limite
+        }
+
+    try:
+        return responder_listagem_cache('GRC-Chamados', carregar)
+    except Exception as e:
+        logging.error(f"❌ Erro ao listar chamados: {e}")
+        return jsonify({"erro": str(e)}), 500
+
+@app.route("/api/chamados/changes", methods=["GET", "OPTIONS"])
+@cross_origin(methods=["GET", "OPTIONS"], supports_credentials=True)
+def alteracoes_chamados():
+    """Delta-sync dos chamados: ?since=<token> devolve só o que mudou (ver listar_alteracoes)"""
+    return listar_alteracoes('GRC-Chamados', 'ID', CAMPOS_CHAMADO, montar_consulta_chamados, int, "chamados")
+
 # ============= ROTAS PARA SARs =============
 
 @app.route("/api/sars", methods=["GET", "OPTIONS"])
 @cross_origin(methods=["GET", "OPTIONS"], supports_credentials=True)
 def listar_sars():
-    """Lista todos os SARs para o frontend"""
+    """Lista os SARs para o frontend.
+
+    Sem parâmetros devolve a lista completa (compatibilidade). Com ?limit= e/ou
+    ?after= devolve uma página ordenada por (DataSolicitacao, NumSar) decrescente;
+    "next_cursor" traz o token a ser enviado em ?after= para a próxima página.
+    SARs sem DataSolicitacao ficam no fim, como no ORDER BY ... DESC do SQL Server.
+    ?stream=ndjson, ?stream=json e os filtros funcionam como em /api/chamados;
+    o período usa dataSolicitacao e ?responsavel= filtra ResponsavelDTC.
+    ?fields= também funciona como em /api/chamados; os campos repetidos
+    (responsavel/responsavelDTC, tipoServico/acao, ...) saem da mesma coluna.
+    """
     if request.method == "OPTIONS":
         return '', 200
-    
-    conn = None
+
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Query para a tabela real ExecucaoSar
-        cursor.execute("SELECT * FROM dbo.[ExecucaoSar] ORDER BY DataSolicitacao DESC")
+        limite = ler_limite_paginacao()
+        after = request.args.get('after')
+        cursor_sar = decodificar_cursor_sar(after) if after else None
+        formato_stream = ler_formato_stream()
+        filtro = ler_filtros('ExecucaoSar', CAMPOS_SAR, 'dataSolicitacao')
+        campos = ler_campos_projecao(CAMPOS_SAR)
+    except ValueError as e:
+        return jsonify({"erro": f"Parâmetros de listagem inválidos: {e}"}), 400
+
+    paginado = limite is not None or cursor_sar is not None
+    if paginado and limite is None:
+        limite = LIMITE_PAGINA_PADRAO
+
+    # Sem ?fields= continua SELECT * (e com verificação de esquema)
+    selecao = colunas_projecao('ExecucaoSar', campos, ('DataSolicitacao', 'NumSar')) if campos else None
+    campos = campos or CAMPOS_SAR
+
+    if formato_stream:
+        return transmitir_listagem(
+            'ExecucaoSar', campos, formato_stream, "SARs",
+            montar_consulta_sars(limite, cursor_sar, filtro, selecao)
+        )
+
+    def carregar(cursor):
+        # Query para a tabela real ExecucaoSar; uma linha a mais indica próxima página
+        consulta, parametros = montar_consulta_sars(limite + 1 if paginado else None, cursor_sar, filtro, selecao)
+        cursor.execute(consulta, parametros)
         resultados = cursor.fetchall()
-        
-        # Obter nomes das colunas
-        colunas = [description[0] for description in cursor.description]
-        logging.info(f"📋 Colunas encontradas na tabela ExecucaoSar: {colunas}")
-        
-        sars = []
-        for row in resultados:
-            sar_dict = {}
-            
-            # Mapear valores das colunas
-            for i, coluna in enumerate(colunas):
-                valor = row[i] if i < len(row) else None
-                sar_dict[coluna] = valor if valor is not None else ''
-            
-            # Padronizar para o frontend usando os campos reais da tabela
-            sar_padronizado = {
-                'id': sar_dict.get('NumSar', ''),  # Usar NumSar como ID
-                'numeroSar': sar_dict.get('NumSar', ''),
-                'dataSolicitacao': sar_dict.get('DataSolicitacao', ''),
-                'cidade': sar_dict.get('Cidade', ''),
-                'acao': sar_dict.get('Acao', ''),
-                'areaTecnica': sar_dict.get('AreaTecnica', ''),
-                'designacao': sar_dict.get('Designacao', ''),
-                'enderecoNap': sar_dict.get('EnderecoNap', ''),
-                'quantPort': sar_dict.get('QuantPort', 0),
-                'caminho': sar_dict.get('Caminho', ''),
-                'status': sar_dict.get('Status', 'Pendente'),
-                'responsavelHub': sar_dict.get('ResponsavelHub', ''),
-                'dataVenc': sar_dict.get('DataVenc', ''),
-                'dataExecucao': sar_dict.get('DataExecucao', ''),
-                'dataCancelamento': sar_dict.get('DataCancelamento', ''),
-                'idadeExecucao': sar_dict.get('IdadeExecucao', 0),
-                'anoMes': sar_dict.get('AnoMes', ''),
-                'responsavelDTC': sar_dict.get('ResponsavelDTC', ''),
-                'idRedmine': sar_dict.get('ID_redmine', 0),
-                
-                # Campos adicionais para compatibilidade com o frontend
-                'responsavel': sar_dict.get('ResponsavelDTC', ''),
-                'prioridade': 'Normal',  # Campo não existe na tabela, usar padrão
-                'tipoServico': sar_dict.get('Acao', ''),
-                'cliente': sar_dict.get('Designacao', ''),
-                'endereco': sar_dict.get('EnderecoNap', ''),
-                'tecnologia': sar_dict.get('AreaTecnica', ''),
-                'descricaoServico': sar_dict.get('Caminho', ''),
-                'observacoes': sar_dict.get('Caminho', ''),  # Usando Caminho como observações
-            }
-            
-            sars.append(sar_padronizado)
-        
-        cursor.close()
-        
+
+        # Obter nomes das colunas (e detectar mudança de esquema no SELECT *)
+        colunas = tuple(description[0] for description in cursor.description)
+        if selecao is None:
+            colunas = verificar_esquema('ExecucaoSar', colunas)
+
+        proximo_cursor = None
+        if paginado and len(resultados) > limite:
+            resultados = resultados[:limite]
+            ultima = resultados[-1]
+            proximo_cursor = codificar_cursor_sar(
+                ultima[colunas.index('DataSolicitacao')],
+                ultima[colunas.index('NumSar')]
+            )
+
+        projetar = compilar_projetor(campos, colunas)
+        sars = [projetar(row) for row in resultados]
+
         logging.info(f"✅ Listando {len(sars)} SARs para o frontend")
-        return jsonify(sars), 200
-        
+
+        if not paginado:
+            return sars
+        return {
+            "sars": sars,
+            "next_cursor": proximo_cursor,
+            "limit": limite
+        }
+
+    try:
+        return responder_listagem_cache('ExecucaoSar', carregar)
     except Exception as e:
         logging.error(f"❌ Erro ao listar SARs: {e}")
         return jsonify({"erro": str(e)}), 500
-    finally:
-        if conn:
-            return_connection(conn)
+
+@app.route("/api/sars/changes", methods=["GET", "OPTIONS"])
+@cross_origin(methods=["GET", "OPTIONS"], supports_credentials=True)
+def alteracoes_sars():
+    """Delta-sync dos SARs: ?since=<token> devolve só o que mudou (ver listar_alteracoes)"""
+    return listar_alteracoes('ExecucaoSar', 'NumSar', CAMPOS_SAR, montar_consulta_sars, str, "sars")
 
 @app.route("/api/sars/<sar_id>", methods=["PUT", "OPTIONS"])
 @cross_origin(methods=["PUT", "OPTIONS"], supports_credentials=True)
@@ -549,11 +1034,18 @@ def atualizar_sar_api(sar_id):
     
     dados = request.get_json()
     logging.info(f"✅ Atualizando SAR {sar_id} via API com dados: {dados}")
+
+    try:
+        dados = separar_observacoes(dados)
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
     
     try:
         success = update_database_sar_optimized(sar_id, 'generic_update', campos_atualizacao=dados)
         
         if success:
+            publicar_evento('sar.atualizado', numeroSar=sar_id, campos=dados)
+
             if 'status' in dados:
                 novo_status = dados['status']
                 responsavel = dados.get('responsavel')
@@ -612,33 +1104,32 @@ def assumir_sar_endpoint(sar_id):
         return jsonify({"erro": "Responsável não fornecido."}), 400
 
     try:
-        if not verificar_status_sar(sar_id):
+        resultado, responsavel_atual = trocar_responsavel(
+            'ExecucaoSar', sar_id, responsavel, esperado=responsavel, ao_alterar=invalidar_cache_listagens
+        )
+
+        if resultado == 'nao_encontrado':
             return jsonify({"erro": "SAR não encontrado."}), 404
-        
-        responsavel_atual = update_database_sar_optimized(sar_id, 'get_responsavel')
-        
-        if responsavel_atual and responsavel_atual.strip():
-            if responsavel_atual.strip() != responsavel.strip():
-                return jsonify({
-                    "erro": f"SAR já foi assumido por {responsavel_atual}",
-                    "responsavel_atual": responsavel_atual,
-                    "conflito": True
-                }), 409
-            else:
-                return jsonify({
-                    "success": True,
-                    "mensagem": f"SAR já estava assumido por {responsavel}",
-                    "responsavel_atual": responsavel,
-                    "responsavel_nome": responsavel,
-                    "ja_assumido": True,
-                    "apenas_visual": apenas_visual
-                }), 200
-            
-        db_success = update_database_sar_optimized(sar_id, 'generic_update', campos_atualizacao={'responsavel': responsavel})
-        
-        if not db_success:
+        if resultado == 'conflito':
+            return jsonify({
+                "erro": f"SAR já foi assumido por {responsavel_atual}",
+                "responsavel_atual": responsavel_atual,
+                "conflito": True
+            }), 409
+        if resultado == 'inalterado':
+            return jsonify({
+                "success": True,
+                "mensagem": f"SAR já estava assumido por {responsavel}",
+                "responsavel_atual": responsavel,
+                "responsavel_nome": responsavel,
+                "ja_assumido": True,
+                "apenas_visual": apenas_visual
+            }), 200
+        if resultado == 'erro':
             return jsonify({"erro": "Erro ao assumir o SAR no banco."}), 500
 
+        publicar_evento('sar.assumido', numeroSar=sar_id, responsavel=responsavel)
+
         if not apenas_visual:
             def update_external_systems():
                 try:
@@ -677,15 +1168,34 @@ def liberar_sar_endpoint(sar_id):
     try:
         data = request.get_json() or {}
         apenas_visual = data.get("apenas_visual", False)
-        
-        if not verificar_status_sar(sar_id):
-            return jsonify({"erro": "SAR não encontrado."}), 404
+        # Opcional: só libera se o SAR ainda for de quem pediu (senão 409)
+        responsavel = data.get("responsavel") or None
 
-        db_success = update_database_sar_optimized(sar_id, 'generic_update', campos_atualizacao={'responsavel': None})
-        
-        if not db_success:
+        resultado, responsavel_atual = trocar_responsavel(
+            'ExecucaoSar', sar_id, None, esperado=responsavel, ao_alterar=invalidar_cache_listagens
+        )
+
+        if resultado == 'nao_encontrado':
+            return jsonify({"erro": "SAR não encontrado."}), 404
+        if resultado == 'conflito':
+            return jsonify({
+                "erro": f"SAR está assumido por {responsavel_atual}",
+                "responsavel_atual": responsavel_atual,
+                "conflito": True
+            }), 409
+        if resultado == 'inalterado':
+            return jsonify({
+                "success": True,
+                "mensagem": "SAR já estava livre",
+                "responsavel_atual": None,
+                "ja_liberado": True,
+                "apenas_visual": apenas_visual
+            }), 200
+        if resultado == 'erro':
             return jsonify({"erro": "Erro ao liberar o SAR no banco."}), 500
 
+        publicar_evento('sar.liberado', numeroSar=sar_id)
+
         if not apenas_visual:
             def update_external_systems():
                 try:
@@ -733,6 +1243,8 @@ def finalizar_sar(sar_id):
         if not db_success:
             return jsonify({"erro": "Erro ao finalizar SAR no banco"}), 500
 
+        publicar_evento('sar.finalizado', numeroSar=sar_id, status='Concluído')
+
         def update_external_systems():
             try:
                 excel_result = update_excel_sar_optimized(sar_id, 'Concluído')
@@ -756,47 +1268,48 @@ def finalizar_sar(sar_id):
         logging.error(f"Erro crítico ao finalizar SAR {sar_id} (tempo: {tempo_erro:.2f}s): {e}")
         return jsonify({"erro": "Erro interno do servidor"}), 500
 
+@app.route("/sars/observacoes", methods=["GET", "OPTIONS"])
+@cross_origin(origin="http://localhost:5173", methods=["GET", "OPTIONS"], supports_credentials=True)
+def obter_observacoes_sars_lote():
+    """Observações de vários SARs numa consulta: ?ids=N1,N2 (ver responder_observacoes_lote)"""
+    return responder_observacoes_lote(ORIGEM_SAR, str)
+
 @app.route("/sars/<sar_id>/observacoes", methods=["GET", "OPTIONS"])
 @cross_origin(origin="http://localhost:5173", methods=["GET", "OPTIONS"], supports_credentials=True)
 def obter_observacoes_sar(sar_id):
-    """Obtém todas as observações de um SAR"""
+    """Obtém as observações de um SAR.
+
+    Sem parâmetros devolve todas, da mais antiga para a mais recente. Com ?limit=
+    (e ?before=<id> para as anteriores) devolve as mais recentes primeiro e o
+    valor de ?before= da página seguinte em "next_before".
+    """
     if request.method == "OPTIONS":
         return '', 200
 
+    try:
+        limite, antes = ler_paginacao_observacoes()
+    except ValueError as e:
+        return jsonify({"erro": f"Parâmetros de paginação inválidos: {e}"}), 400
+
     try:
         if not verificar_status_sar(sar_id):
             return jsonify({"erro": "SAR não encontrado"}), 404
 
-        observacoes_raw = obter_observacoes_sar_db(sar_id)
-        
-        observacoes_lista = []
-        if observacoes_raw:
-            observacoes_split = observacoes_raw.split('\n\n')
-            
-            for obs in observacoes_split:
-                obs = obs.strip()
-                if obs:
-                    match = re.match(r'\[(\d{2}/\d{2}/\d{4} \d{2}:\d{2}) - ([^\]]+)\]: (.+)', obs, re.DOTALL)
-                    if match:
-                        data_str, usuario, conteudo = match.groups()
-                        observacoes_lista.append({
-                            'data': data_str,
-                            'usuario': usuario,
-                            'observacao': conteudo.strip(),
-                            'timestamp': datetime.strptime(data_str, "%d/%m/%Y %H:%M").isoformat()
-                        })
-                    else:
-                        observacoes_lista.append({
-                            'data': 'Data não disponível',
-                            'usuario': 'Sistema',
-                            'observacao': obs,
-                            'timestamp': datetime.now().isoformat()
-                        })
+        if limite is None:
+            observacoes_lista = obter_observacoes_db(ORIGEM_SAR, sar_id)
+            return jsonify({
+                "success": True,
+                "observacoes": observacoes_lista,
+                "total": len(observacoes_lista)
+            })
 
+        observacoes_lista, proximo_antes = obter_observacoes_db(ORIGEM_SAR, sar_id, limite, antes)
         return jsonify({
             "success": True,
             "observacoes": observacoes_lista,
-            "total": len(observacoes_lista)
+            "total": len(observacoes_lista),
+            "next_before": proximo_antes,
+            "limit": limite
         })
 
     except Exception as e:
@@ -831,18 +1344,13 @@ def adicionar_observacao_sar(sar_id):
         if not verificar_status_sar(sar_id):
             return jsonify({"erro": "SAR não encontrado ou já finalizado"}), 404
 
-        observacoes_existentes = obter_observacoes_sar_db(sar_id)
-        
-        nova_observacao_formatada = formatar_observacao(usuario, nova_obs)
-        
-        if observacoes_existentes:
-            observacoes_atualizadas = f"{observacoes_existentes}\n\n{nova_observacao_formatada}"
-        else:
-            observacoes_atualizadas = nova_observacao_formatada
-
-        if not update_database_sar_optimized(sar_id, 'update_observacoes', observacoes=observacoes_atualizadas):
+        # Um INSERT no histórico, sem reler nem regravar as observações anteriores
+        observacao = gravar_observacao(ORIGEM_SAR, sar_id, usuario, nova_obs)
+        if observacao is None:
             return jsonify({"erro": "Erro ao salvar observação no banco"}), 500
 
+        publicar_evento('sar.observacao', numeroSar=sar_id, observacao=observacao)
+
         # Atualizar no Redmine se houver ID_redmine
         def update_redmine_background():
             try:
@@ -865,12 +1373,7 @@ def adicionar_observacao_sar(sar_id):
         return jsonify({
             "success": True,
             "mensagem": "Observação adicionada com sucesso",
-            "observacao": {
-                "data": datetime.now().strftime("%d/%m/%Y %H:%M"),
-                "usuario": usuario,
-                "observacao": nova_obs,
-                "timestamp": datetime.now().isoformat()
-            }
+            "observacao": observacao
         }), 201
 
     except Exception as e:
@@ -888,6 +1391,11 @@ def atualizar_chamado_api(id):
     
     dados = request.get_json()
     logging.info(f"✅ Atualizando chamado {id} via API com dados: {dados}")
+
+    try:
+        dados = separar_observacoes(dados)
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
     
     try:
         success = update_database_optimized(id, 'generic_update', campos_atualizacao=dados)
@@ -947,31 +1455,28 @@ def assumir_chamado_endpoint(id):
         return jsonify({"erro": "Responsável não fornecido."}), 400
 
     try:
-        if not verificar_status_chamado(id):
+        resultado, responsavel_atual = trocar_responsavel(
+            'GRC-Chamados', id, responsavel, esperado=responsavel, ao_alterar=invalidar_cache_listagens
+        )
+
+        if resultado == 'nao_encontrado':
             return jsonify({"erro": "Chamado não encontrado."}), 404
-        
-        responsavel_atual = update_database_optimized(id, 'get_responsavel')
-        
-        if responsavel_atual and responsavel_atual.strip():
-            if responsavel_atual.strip() != responsavel.strip():
-                return jsonify({
-                    "erro": f"Chamado já foi assumido por {responsavel_atual}",
-                    "responsavel_atual": responsavel_atual,
-                    "conflito": True
-                }), 409
-            else:
-                return jsonify({
-                    "success": True,
-                    "mensagem": f"Chamado já estava assumido por {responsavel}",
-                    "responsavel_atual": responsavel,
-                    "responsavel_nome": responsavel,
-                    "ja_assumido": True,
-                    "apenas_visual": apenas_visual
-                }), 200
-            
-        db_success = update_database_optimized(id, 'generic_update', campos_atualizacao={'Responsavel': responsavel})
-        
-        if not db_success:
+        if resultado == 'conflito':
+            return jsonify({
+                "erro": f"Chamado já foi assumido por {responsavel_atual}",
+                "responsavel_atual": responsavel_atual,
+                "conflito": True
+            }), 409
+        if resultado == 'inalterado':
+            return jsonify({
+                "success": True,
+                "mensagem": f"Chamado já estava assumido por {responsavel}",
+                "responsavel_atual": responsavel,
+                "responsavel_nome": responsavel,
+                "ja_assumido": True,
+                "apenas_visual": apenas_visual
+            }), 200
+        if resultado == 'erro':
             return jsonify({"erro": "Erro ao assumir o chamado no banco."}), 500
 
         if not apenas_visual:
@@ -1013,13 +1518,30 @@ def liberar_chamado_endpoint(id):
     try:
         data = request.get_json() or {}
         apenas_visual = data.get("apenas_visual", False)
-        
-        if not verificar_status_chamado(id):
-            return jsonify({"erro": "Chamado não encontrado."}), 404
+        # Opcional: só libera se o chamado ainda for de quem pediu (senão 409)
+        responsavel = data.get("responsavel") or None
 
-        db_success = update_database_optimized(id, 'generic_update', campos_atualizacao={'Responsavel': None})
-        
-        if not db_success:
+        resultado, responsavel_atual = trocar_responsavel(
+            'GRC-Chamados', id, None, esperado=responsavel, ao_alterar=invalidar_cache_listagens
+        )
+
+        if resultado == 'nao_encontrado':
+            return jsonify({"erro": "Chamado não encontrado."}), 404
+        if resultado == 'conflito':
+            return jsonify({
+                "erro": f"Chamado está assumido por {responsavel_atual}",
+                "responsavel_atual": responsavel_atual,
+                "conflito": True
+            }), 409
+        if resultado == 'inalterado':
+            return jsonify({
+                "success": True,
+                "mensagem": "Chamado já estava livre",
+                "responsavel_atual": None,
+                "ja_liberado": True,
+                "apenas_visual": apenas_visual
+            }), 200
+        if resultado == 'erro':
             return jsonify({"erro": "Erro ao liberar o chamado no banco."}), 500
 
         if not apenas_visual:
@@ -1094,47 +1616,43 @@ def finalizar_chamado(id):
 
 # ============= ROTAS DE OBSERVAÇÕES PARA CHAMADOS =============
 
+@app.route("/chamados/observacoes", methods=["GET", "OPTIONS"])
+@cross_origin(origin="http://localhost:5173", methods=["GET", "OPTIONS"], supports_credentials=True)
+def obter_observacoes_chamados_lote():
+    """Observações de vários chamados numa consulta: ?ids=1,2,3 (ver responder_observacoes_lote)"""
+    return responder_observacoes_lote(ORIGEM_CHAMADO, int)
+
 @app.route("/chamados/<int:id>/observacoes", methods=["GET", "OPTIONS"])
 @cross_origin(origin="http://localhost:5173", methods=["GET", "OPTIONS"], supports_credentials=True)
 def obter_observacoes(id):
-    """Obtém todas as observações de um chamado"""
+    """Obtém as observações de um chamado (paginação como em obter_observacoes_sar)"""
     if request.method == "OPTIONS":
         return '', 200
 
+    try:
+        limite, antes = ler_paginacao_observacoes()
+    except ValueError as e:
+        return jsonify({"erro": f"Parâmetros de paginação inválidos: {e}"}), 400
+
     try:
         if not verificar_status_chamado(id):
             return jsonify({"erro": "Chamado não encontrado"}), 404
 
-        observacoes_raw = obter_observacoes_chamado(id)
-        
-        observacoes_lista = []
-        if observacoes_raw:
-            observacoes_split = observacoes_raw.split('\n\n')
-            
-            for obs in observacoes_split:
-                obs = obs.strip()
-                if obs:
-                    match = re.match(r'\[(\d{2}/\d{2}/\d{4} \d{2}:\d{2}) - ([^\]]+)\]: (.+)', obs, re.DOTALL)
-                    if match:
-                        data_str, usuario, conteudo = match.groups()
-                        observacoes_lista.append({
-                            'data': data_str,
-                            'usuario': usuario,
-                            'observacao': conteudo.strip(),
-                            'timestamp': datetime.strptime(data_str, "%d/%m/%Y %H:%M").isoformat()
-                        })
-                    else:
-                        observacoes_lista.append({
-                            'data': 'Data não disponível',
-                            'usuario': 'Sistema',
-                            'observacao': obs,
-                            'timestamp': datetime.now().isoformat()
-                        })
+        if limite is None:
+            observacoes_lista = obter_observacoes_db(ORIGEM_CHAMADO, id)
+            return jsonify({
+                "success": True,
+                "observacoes": observacoes_lista,
+                "total": len(observacoes_lista)
+            })
 
+        observacoes_lista, proximo_antes = obter_observacoes_db(ORIGEM_CHAMADO, id, limite, antes)
         return jsonify({
             "success": True,
             "observacoes": observacoes_lista,
-            "total": len(observacoes_lista)
+            "total": len(observacoes_lista),
+            "next_before": proximo_antes,
+            "limit": limite
         })
 
     except Exception as e:
@@ -1169,16 +1687,9 @@ def adicionar_observacao(id):
         if not verificar_status_chamado(id):
             return jsonify({"erro": "Chamado não encontrado ou já finalizado"}), 404
 
-        observacoes_existentes = obter_observacoes_chamado(id)
-        
-        nova_observacao_formatada = formatar_observacao(usuario, nova_obs)
-        
-        if observacoes_existentes:
-            observacoes_atualizadas = f"{observacoes_existentes}\n\n{nova_observacao_formatada}"
-        else:
-            observacoes_atualizadas = nova_observacao_formatada
-
-        if not update_database_optimized(id, 'update_observacoes', observacoes=observacoes_atualizadas):
+        # Um INSERT no histórico, sem reler nem regravar as observações anteriores
+        observacao = gravar_observacao(ORIGEM_CHAMADO, id, usuario, nova_obs)
+        if observacao is None:
             return jsonify({"erro": "Erro ao salvar observação no banco"}), 500
 
         def update_redmine_background():
@@ -1189,12 +1700,7 @@ def adicionar_observacao(id):
         return jsonify({
             "success": True,
             "mensagem": "Observação adicionada com sucesso",
-            "observacao": {
-                "data": datetime.now().strftime("%d/%m/%Y %H:%M"),
-                "usuario": usuario,
-                "observacao": nova_obs,
-                "timestamp": datetime.now().isoformat()
-            }
+            "observacao": observacao
         }), 201
 
     except Exception as e:
@@ -1223,11 +1729,19 @@ def health_check():
         
         return jsonify({
             "status": "healthy",
-            "pool_available_connections": connection_pool.qsize(),
-            "pool_max_size": connection_pool.maxsize,
+            "pool_available_connections": connection_pool.disponiveis(),
+            "pool_max_size": connection_pool.maximo,
+            "pool": connection_pool.metricas(),
             "total_chamados_no_banco": count_chamados,
             "total_sars_no_banco": count_sars,
-            "excel_cache_age_seconds": round(time.time() - excel_cache_time, 2),
+            **estatisticas_esquema(),
+            "excel_cache_age_seconds": cache_excel_chamados.estatisticas()['idade_s'],
+            "excel_cache": cache_excel_chamados.estatisticas(),
+            "planilhas": estatisticas_escritores(),
+            "cache_listagens": {**cache_listagens_stats, "entradas": len(cache_listagens)},
+            "json_codificador": CODIFICADOR_JSON,
+            "eventos_assinantes": len(assinantes_eventos),
+            "eventos_ultimo_id": f"{EPOCA_EVENTOS}-{ultimo_evento_id}",
             "timestamp": datetime.now().isoformat()
         })
     except Exception as e:
@@ -1238,13 +1752,25 @@ def health_check():
             "timestamp": datetime.now().isoformat()
         }), 500
 
+@app.route("/admin/esquema/recarregar", methods=["POST"])
+def recarregar_esquema():
+    """Recarrega o cache de esquema após uma alteração de tabela (ALTER TABLE)"""
+    if not carregar_cache_esquema():
+        return jsonify({"erro": "Falha ao recarregar o esquema"}), 500
+
+    return jsonify({
+        "success": True,
+        "esquema": {tabela: list(colunas) for tabela, colunas in esquema_atual().items()},
+        "timestamp": datetime.now().isoformat()
+    })
+
 @app.route("/status", methods=["GET"])
 def status():
     """Status simples para compatibilidade"""
     return jsonify({
         "status": "OK",
-        "pool_connections": connection_pool.qsize(),
-        "excel_cache_age": time.time() - excel_cache_time
+        "pool_connections": connection_pool.disponiveis(),
+        "excel_cache_age": cache_excel_chamados.estatisticas()['idade_s']
     })
 
 # ============= INICIALIZAÇÃO DA APLICAÇÃO =============
@@ -1261,35 +1787,49 @@ if __name__ == '__main__':
         ]
     )
     
-    # Inicializar pool de conexões
+    # Inicializar pool de conexões (em paralelo; o restante abre em segundo plano)
     logging.info("🚀 Inicializando pool de conexões do banco de dados...")
-    init_connection_pool()
-    logging.info("✅ Pool de conexões inicializado.")
-
-    # Pré-carregar cache do Excel
-    logging.info("📊 Pré-carregando cache do Excel...")
-    get_cached_excel_data()
-    logging.info("✅ Cache do Excel pré-carregado.")
+    prontas = init_connection_pool()
+    logging.info(f"✅ Pool de conexões com {prontas} conexões prontas (mínimo {connection_pool.minimo}).")
+
+    # Carregar cache de esquema das tabelas (o delta-sync depende dele para registrar escritas).
+    # Sem nenhuma conexão pronta, não segura a subida: carrega quando o banco responder.
+    if prontas:
+        logging.info("📋 Carregando esquema das tabelas...")
+        carregar_cache_esquema()
+    else:
+        logging.warning("📋 Banco indisponível na subida; esquema será carregado em segundo plano")
+        executor.submit(carregar_cache_esquema)
+
+    # Pré-carregar cache do Excel em segundo plano (a leitura da planilha não segura a subida)
+    logging.info(f"📊 Pré-carregando cache do Excel em segundo plano (planilhas em modo {MODO_PLANILHAS})...")
+    executor.submit(get_cached_excel_data)
     
     logging.info("🌐 Iniciando servidor Flask na porta 5007...")
     logging.info("📋 Endpoints disponíveis:")
     logging.info("   === CHAMADOS ===")
     logging.info("   GET  /api/chamados - Lista todos os chamados")
+    logging.info("   GET  /api/chamados/changes?since= - Delta-sync de chamados")
     logging.info("   PUT  /api/chamados/:id - Atualiza chamado")
     logging.info("   PUT  /chamados/:id/assumir - Assumir chamado")
     logging.info("   PUT  /chamados/:id/liberar - Liberar chamado")
     logging.info("   PUT  /chamados/:id/finalizar - Finalizar chamado")
     logging.info("   GET  /chamados/:id/observacoes - Buscar observações")
+    logging.info("   GET  /chamados/observacoes?ids= - Observações de vários chamados")
     logging.info("   PUT  /chamados/:id/observacao - Adicionar observação")
     logging.info("   === SARs ===")
     logging.info("   GET  /api/sars - Lista todos os SARs")
+    logging.info("   GET  /api/sars/changes?since= - Delta-sync de SARs")
     logging.info("   PUT  /api/sars/:id - Atualiza SAR")
     logging.info("   PUT  /sars/:id/assumir - Assumir SAR")
     logging.info("   PUT  /sars/:id/liberar - Liberar SAR")
     logging.info("   PUT  /sars/:id/finalizar - Finalizar SAR")
     logging.info("   GET  /sars/:id/observacoes - Buscar observações SAR")
+    logging.info("   GET  /sars/observacoes?ids= - Observações de vários SARs")
     logging.info("   PUT  /sars/:id/observacao - Adicionar observação SAR")
     logging.info("   === SISTEMA ===")
+    logging.info("   GET  /api/eventos - Eventos do quadro (Server-Sent Events)")
     logging.info("   GET  /health - Status da aplicação")
+    logging.info("   POST /admin/esquema/recarregar - Recarregar cache de esquema")
     
     app.run(debug=True, port=5007, threaded=True)  # ✅ ALTERADO: porta 5007
\ No newline at end of file
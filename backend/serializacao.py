@@ -0,0 +1,108 @@
+"""Serialização JSON e compressão das respostas grandes da API (listagens de chamados e SARs).
+
+O codificador é escolhido na importação: orjson quando instalado, senão o json da
+biblioteca padrão. A variável de ambiente PEGASUS_JSON=json força o padrão.
+Os valores saem como no provedor padrão do Flask (jsonify), o formato que o
+frontend já lê: datetime/date em data HTTP (RFC 822, "Mon, 01 Jan 2024 10:00:00
+GMT"; sem fuso conta como UTC), Decimal e UUID como texto. O que o Flask não
+serializava ganhou um formato: time em ISO 8601 e bytes (rowversion) em hex. A
+única diferença visível é a ordem das chaves, que segue a dos dicionários em vez
+de ordem alfabética.
+"""
+import datetime
+import decimal
+import gzip
+import json
+import os
+import uuid
+
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Corpos menores que isso não compensam o custo de comprimir
+LIMIAR_COMPRESSAO = 1024  # bytes
+NIVEL_GZIP = 3        # 1-9: acima de 3 o ganho de tamanho é pequeno perto do tempo
+QUALIDADE_BROTLI = 4  # 0-11: idem; o corpo comprimido fica no cache de listagens
+
+
+def converter_valor(valor):
+    """default= do codificador: tipos do pyodbc que o JSON não conhece"""
+    if isinstance(valor, (datetime.datetime, datetime.date)):
+        return http_date(valor)
+    if isinstance(valor, datetime.time):
+        return valor.isoformat()
+    if isinstance(valor, (decimal.Decimal, uuid.UUID)):
+        return str(valor)
+    if isinstance(valor, (bytes, bytearray)):
+        return valor.hex()
+    raise TypeError(f"Tipo {type(valor).__name__} não é serializável em JSON")
+
+
+def _codificar_orjson(dados):
+    # Sem o PASSTHROUGH o orjson escreveria datas em ISO 8601 sem passar por converter_valor
+    return orjson.dumps(dados, default=converter_valor, option=orjson.OPT_PASSTHROUGH_DATETIME)
+
+
+def _codificar_padrao(dados):
+    return json.dumps(dados, default=converter_valor, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+if orjson is not None and os.environ.get('PEGASUS_JSON', 'orjson') != 'json':
+    codificar_json, CODIFICADOR_JSON = _codificar_orjson, 'orjson'
+else:
+    codificar_json, CODIFICADOR_JSON = _codificar_padrao, 'json'
+codificar_json.__doc__ = "Serializa dados em JSON (bytes UTF-8) com o codificador ativo"
+
+
+class ProvedorJSON(DefaultJSONProvider):
+    """Faz jsonify/app.json usarem o mesmo codificador das listagens.
+
+    O jsonify sempre pede separators compactos, que é o que codificar_json já
+    gera; qualquer outro argumento (indent no modo debug, sort_keys, ...) é
+    respeitado passando pelo json padrão com o mesmo converter_valor.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if set(kwargs) <= {'separators'} and tuple(kwargs.get('separators', (',', ':'))) == (',', ':'):
+            return codificar_json(obj).decode('utf-8')
+        kwargs.setdefault('default', converter_valor)
+        kwargs.setdefault('ensure_ascii', False)
+        return json.dumps(obj, **kwargs)
+
+
+def codificacoes_disponiveis():
+    """Content-Encodings suportados, em ordem de preferência"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def escolher_codificacao(aceitas, tamanho):
+    """Content-Encoding a usar para um corpo de `tamanho` bytes, ou None.
+
+    `aceitas` é request.accept_encodings; vale a primeira codificação disponível
+    que o cliente aceita (qualidade > 0).
+    """
+    if tamanho < LIMIAR_COMPRESSAO:
+        return None
+    for codificacao in codificacoes_disponiveis():
+        if aceitas.quality(codificacao) > 0:
+            return codificacao
+    return None
+
+
+def comprimir(corpo, codificacao):
+    """Comprime o corpo com 'br' ou 'gzip'"""
+    if codificacao == 'br':
+        return brotli.compress(corpo, quality=QUALIDADE_BROTLI)
+    if codificacao == 'gzip':
+        return gzip.compress(corpo, compresslevel=NIVEL_GZIP)
+    raise ValueError(f"Codificação não suportada: {codificacao}")
@@ -0,0 +1,140 @@
+"""Verificação da gravação do EscritorPlanilha em planilhas com fórmulas e desenhos.
+
+Não usa o OneDrive nem o banco: gera numa pasta temporária (o espelho também
+fica nela) uma planilha com uma coluna de fórmulas, já com os resultados
+calculados no arquivo, como o Excel grava, e confere que
+
+  - depois de uma gravação do escritor as fórmulas continuam no .xlsx e a pasta
+    sai marcada para o Excel recalcular ao abrir;
+  - a releitura (ler_colunas_espelho) devolve os valores da coluna de fórmulas,
+    com o espelho em dia antes da gravação ou não;
+  - uma planilha com gráfico é recusada e o arquivo fica intacto.
+
+Uso: python verificar_planilhas.py [linhas]
+"""
+import os
+import re
+import shutil
+import sys
+import tempfile
+import zipfile
+
+import openpyxl
+from openpyxl.chart import BarChart, Reference
+
+import planilhas
+
+ABA = 'Sheet1'
+CABECALHOS = ('ID', 'Status', 'Responsavel', 'Quantidade', 'Preço', 'Total')
+
+
+def gerar_planilha(caminho, linhas):
+    """Planilha com Total = Quantidade * Preço, com os resultados gravados como o Excel faria"""
+    pasta = openpyxl.Workbook(write_only=True)
+    planilha = pasta.create_sheet(ABA)
+    planilha.append(CABECALHOS)
+    for i in range(1, linhas + 1):
+        planilha.append((i, 'Pendente', None, i % 7 + 1, 10 * i, f"=D{i + 1}*E{i + 1}"))
+    pasta.save(caminho)
+
+    # O openpyxl grava <v/> vazio; o Excel grava o último resultado calculado
+    def resultado(encontrado):
+        linha = int(encontrado.group(1))
+        return f'<f>D{linha}*E{linha}</f><v>{((linha - 1) % 7 + 1) * 10 * (linha - 1)}</v>'.encode()
+
+    temporario = f"{caminho}.tmp"
+    with zipfile.ZipFile(caminho) as origem, zipfile.ZipFile(temporario, 'w', zipfile.ZIP_DEFLATED) as destino:
+        for nome in origem.namelist():
+            conteudo = origem.read(nome)
+            if nome.startswith('xl/worksheets/'):
+                conteudo = re.sub(rb'<f>D(\d+)\*E\d+</f><v\s*/>', resultado, conteudo)
+            destino.writestr(nome, conteudo)
+    os.replace(temporario, caminho)
+
+
+def totais_esperados(linhas):
+    return [float((i % 7 + 1) * 10 * i) for i in range(1, linhas + 1)]
+
+
+def gravar(caminho, alteracoes):
+    escritor = planilhas.EscritorPlanilha(caminho, ABA, 'id', intervalo=0)
+    for chave, campos in alteracoes.items():
+        escritor.enfileirar(chave, campos)
+    escritor.descarregar()
+    return escritor.estatisticas()
+
+
+def verificar_formulas(pasta_temporaria, linhas, apagar_espelho):
+    caminho = os.path.join(pasta_temporaria, 'formulas.xlsx')
+    gerar_planilha(caminho, linhas)
+    colunas, dados, _ = planilhas.ler_colunas_espelho(caminho, ABA)
+    assert [float(v) for v in dados['total']] == totais_esperados(linhas), "a planilha gerada não tem os resultados"
+    if apagar_espelho:
+        os.remove(planilhas.caminho_espelho(caminho, ABA))
+
+    estatisticas = gravar(caminho, {1: {'responsavel': 'Técnico 1'}, linhas: {'status': 'Em Andamento'}})
+    assert estatisticas['itens_gravados'] == 2, estatisticas
+
+    pasta = openpyxl.load_workbook(caminho)
+    assert pasta[ABA]['F2'].value == '=D2*E2', "fórmula não preservada"
+    assert pasta.calculation.fullCalcOnLoad, "pasta não marcada para recalcular ao abrir"
+
+    colunas, dados, origem = planilhas.ler_colunas_espelho(caminho, ABA)
+    assert origem == 'espelho', f"releitura pelo {origem}, não pelo espelho"
+    assert [float(v) for v in dados['total']] == totais_esperados(linhas), "resultados das fórmulas perdidos"
+    assert dados['responsavel'][0] == 'Técnico 1' and dados['status'][-1] == 'Em Andamento', "alteração perdida"
+
+    # Limitação documentada: direto do .xlsx, só depois que o Excel recalcular
+    _, direto = planilhas.ler_colunas(caminho, ABA)
+    vazios = sum(1 for v in direto['total'] if v is None or v != v)
+    return f"{vazios}/{linhas} totais vazios lendo o .xlsx direto"
+
+
+def verificar_desenhos(pasta_temporaria):
+    caminho = os.path.join(pasta_temporaria, 'grafico.xlsx')
+    pasta = openpyxl.Workbook()
+    planilha = pasta.active
+    planilha.title = ABA
+    planilha.append(CABECALHOS)
+    for i in range(1, 6):
+        planilha.append((i, 'Pendente', None, i, 10, i * 10))
+    grafico = BarChart()
+    grafico.add_data(Reference(planilha, min_col=6, min_row=1, max_row=6), titles_from_data=True)
+    planilha.add_chart(grafico, 'H2')
+    pasta.save(caminho)
+
+    antes = planilhas.hash_arquivo(caminho)
+    estatisticas = gravar(caminho, {1: {'responsavel': 'Técnico 1'}})
+    assert estatisticas['recusadas'] == 1 and estatisticas['gravacoes'] == 0, estatisticas
+    assert estatisticas['falhas'] == 1, "a planilha recusada não deveria ser tentada de novo"
+    assert planilhas.hash_arquivo(caminho) == antes, "a planilha recusada foi alterada"
+    return estatisticas['ultimo_erro']
+
+
+def main():
+    linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    pasta_temporaria = tempfile.mkdtemp(prefix='verificar_planilhas_')
+    # No modo processo o trabalhador importa planilhas de novo: a pasta vai pelo ambiente
+    os.environ['PEGASUS_ESPELHOS_DIR'] = planilhas.PASTA_ESPELHOS = pasta_temporaria
+    verificacoes = (
+        ('fórmulas, espelho em dia', lambda: verificar_formulas(pasta_temporaria, linhas, False)),
+        ('fórmulas, sem espelho', lambda: verificar_formulas(pasta_temporaria, linhas, True)),
+        ('gráfico recusado', lambda: verificar_desenhos(pasta_temporaria)),
+    )
+    falhas = 0
+    try:
+        for nome, verificar in verificacoes:
+            try:
+                detalhe = verificar()
+                print(f"OK     {nome}: {detalhe}")
+            except AssertionError as e:
+                falhas += 1
+                print(f"FALHA  {nome}: {e}")
+    finally:
+        shutil.rmtree(pasta_temporaria, ignore_errors=True)
+    sys.exit(1 if falhas else 0)
+
+
+if __name__ == '__main__':
+    main()
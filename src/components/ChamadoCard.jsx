@@ -7,7 +7,8 @@ const ChamadoCard = ({
   onAtualizarStatus, 
   onAtualizarResponsavel, // ← Nova prop
   onRecarregarChamados,   // ← Nova prop  
-  usuario 
+  usuario,
+  observacoesIniciais     // ← Observações pré-carregadas pela página (consulta em lote)
 }) => {
   const {
     id,
@@ -104,6 +105,22 @@ const ChamadoCard = ({
     }
   }, [responsavel]); // Removido responsavelAtual da dependência para evitar loop
 
+  // Ordena as observações da mais antiga para a mais recente (sem alterar o array recebido)
+  const ordenarObservacoes = (observacoes) =>
+    [...observacoes].sort((a, b) => {
+      const dateA = new Date(a.timestamp || 0).getTime();
+      const dateB = new Date(b.timestamp || 0).getTime();
+      return dateA - dateB;
+    });
+
+  // ✅ Usa as observações que a página já buscou em lote, sem um pedido por card
+  useEffect(() => {
+    if (Array.isArray(observacoesIniciais)) {
+      setHistoricoObservacoes(ordenarObservacoes(observacoesIniciais));
+      setLoadingObservacoes(false);
+    }
+  }, [observacoesIniciais]);
+
   // Função para carregar observações do backend
   const carregarObservacoes = async () => {
     setLoadingObservacoes(true);
@@ -115,12 +132,7 @@ const ChamadoCard = ({
       }
       const data = await response.json();
       if (Array.isArray(data.observacoes)) {
-        const observacoesOrdenadas = data.observacoes.sort((a, b) => {
-          const dateA = new Date(a.timestamp || 0).getTime();
-          const dateB = new Date(b.timestamp || 0).getTime();
-          return dateA - dateB;
-        });
-        setHistoricoObservacoes(observacoesOrdenadas);
+        setHistoricoObservacoes(ordenarObservacoes(data.observacoes));
       } else {
         setHistoricoObservacoes([]);
       }
@@ -410,7 +422,7 @@ const ChamadoCard = ({
     setIsObservacoesOpen((prev) => {
       const newState = !prev;
       // Carrega observações quando abre pela primeira vez
-      if (newState && historicoObservacoes.length === 0) {
+      if (newState && historicoObservacoes.length === 0 && !Array.isArray(observacoesIniciais)) {
         carregarObservacoes();
       }
       return newState;
@@ -7,7 +7,8 @@ const SarCard = ({
   onAtualizarStatus, 
   onAtualizarResponsavel, 
   onRecarregarSars,   
-  usuario 
+  usuario,
+  observacoesIniciais // ← Observações pré-carregadas pela página (consulta em lote)
 }) => {
   const {
     id, // Este será o NumSar
@@ -110,6 +111,22 @@ const SarCard = ({
     }
   }, [responsavelAtualReal]);
 
+  // Ordena as observações da mais antiga para a mais recente (sem alterar o array recebido)
+  const ordenarObservacoes = (observacoes) =>
+    [...observacoes].sort((a, b) => {
+      const dateA = new Date(a.timestamp || 0).getTime();
+      const dateB = new Date(b.timestamp || 0).getTime();
+      return dateA - dateB;
+    });
+
+  // ✅ Usa as observações que a página já buscou em lote, sem um pedido por card
+  useEffect(() => {
+    if (Array.isArray(observacoesIniciais)) {
+      setHistoricoObservacoes(ordenarObservacoes(observacoesIniciais));
+      setLoadingObservacoes(false);
+    }
+  }, [observacoesIniciais]);
+
   // ✅ ALTERADO: Função para carregar observações do backend - PORTA 5007
   const carregarObservacoes = async () => {
     setLoadingObservacoes(true);
@@ -121,12 +138,7 @@ const SarCard = ({
       }
       const data = await response.json();
       if (Array.isArray(data.observacoes)) {
-        const observacoesOrdenadas = data.observacoes.sort((a, b) => {
-          const dateA = new Date(a.timestamp || 0).getTime();
-          const dateB = new Date(b.timestamp || 0).getTime();
-          return dateA - dateB;
-        });
-        setHistoricoObservacoes(observacoesOrdenadas);
+        setHistoricoObservacoes(ordenarObservacoes(data.observacoes));
       } else {
         setHistoricoObservacoes([]);
       }
@@ -391,7 +403,7 @@ const SarCard = ({
   const handleToggleObservacoes = () => {
     setIsObservacoesOpen((prev) => {
       const newState = !prev;
-      if (newState && historicoObservacoes.length === 0) {
+      if (newState && historicoObservacoes.length === 0 && !Array.isArray(observacoesIniciais)) {
         carregarObservacoes();
       }
       return newState;
@@ -5,89 +5,119 @@ import Sidebar from '../components/Sidebar';
 import Footer from '../components/Footer';
 import axios from 'axios';
 
+const TAMANHO_PAGINA = 100;
+const STATUS_QUADRO = 'Pendente,Em Andamento';
+
 const ExecucaoSar = () => {
   const [sars, setSars] = useState([]);
   const [mensagem, setMensagem] = useState('');
   const [secaoExibida, setSecaoExibida] = useState('novos');
   const [sidebarOpen, setSidebarOpen] = useState(false);
   const [loading, setLoading] = useState(true);
+  const [proximoCursor, setProximoCursor] = useState(null);
+  const [carregandoMais, setCarregandoMais] = useState(false);
+  const [observacoesPorSar, setObservacoesPorSar] = useState({});
   const usuarioLogado = JSON.parse(localStorage.getItem('usuario')) || { nome: 'Usuário', avatar: null };
 
+  // ✅ Busca uma página de SARs (cursor composto DataSolicitacao + NumSar no backend)
+  const buscarPagina = async (cursor = null) => {
+    // ✅ O quadro só exibe as abas Pendente e Em Andamento: o filtro é feito no banco
+    const params = { limit: TAMANHO_PAGINA, status: STATUS_QUADRO };
+    if (cursor !== null) {
+      params.after = cursor;
+    }
+    const response = await axios.get('http://localhost:5007/api/sars', { params });
+
+    console.log('✅ Dados recebidos da API ExecucaoSar:', response.data);
+
+    // ✅ Buscar responsáveis e status salvos no localStorage (usando NumSar como chave)
+    const responsaveisSalvos = JSON.parse(localStorage.getItem('execucaosar_responsaveis')) || {};
+    const statusSalvos = JSON.parse(localStorage.getItem('execucaosar_status')) || {};
+
+    const sarsFormatados = response.data.sars.map((sar) => {
+      // ✅ Usar NumSar como chave única
+      const chaveUnica = sar.numeroSar || sar.NumSar;
+      
+      // ✅ Usar responsável do localStorage se existir, senão usar da API
+      const responsavelSalvo = responsaveisSalvos[chaveUnica];
+      const responsavelFinal = responsavelSalvo || sar.responsavel || sar.responsavelHub || sar.responsavelDTC || '';
+      
+      // ✅ Usar status do localStorage se existir, senão usar da API
+      const statusSalvo = statusSalvos[chaveUnica];
+      const statusFinal = statusSalvo || sar.status || 'Pendente';
+      
+      if (responsavelSalvo) {
+        console.log(`✅ Responsável restaurado para SAR ${chaveUnica}: ${responsavelSalvo}`);
+      }
+      if (statusSalvo) {
+        console.log(`✅ Status restaurado para SAR ${chaveUnica}: ${statusSalvo}`);
+      }
+
+      return {
+        // ✅ Campos adaptados para ExecucaoSar
+        id: chaveUnica, // Usar NumSar como ID
+        numeroSar: chaveUnica,
+        titulo: sar.titulo || `${sar.acao || 'Serviço'} - ${sar.areaTecnica || 'Técnico'}`,
+        tipoServico: sar.tipoServico || sar.acao || '',
+        cliente: sar.cliente || '', // Não existe na ExecucaoSar
+        endereco: sar.endereco || sar.enderecoNap || '',
+        bairro: sar.bairro || '', // Não existe na ExecucaoSar
+        cidade: sar.cidade || '',
+        tecnologia: sar.tecnologia || sar.areaTecnica || '',
+        equipamento: sar.equipamento || (sar.quantPort ? `${sar.quantPort} portas` : ''),
+        descricaoServico: sar.descricaoServico || sar.caminho || '',
+        tempoEstimado: sar.tempoEstimado || '', // Não existe na ExecucaoSar
+        dataAgendamento: sar.dataAgendamento || sar.dataSolicitacao || null,
+        horaInicio: sar.horaInicio || null, // Não existe na ExecucaoSar
+        horaConclusao: sar.horaConclusao || sar.dataExecucao || null,
+        status: statusFinal, // ✅ Usar status final (localStorage + API)
+        prioridade: sar.prioridade || 'Normal', // Não existe na ExecucaoSar
+        responsavel: responsavelFinal, // ✅ Usar responsável final (localStorage + API)
+        observacoes: sar.observacoes || '', // Não existe na ExecucaoSar
+        // ✅ Campos específicos da ExecucaoSar
+        designacao: sar.designacao || '',
+        quantPort: sar.quantPort || 0,
+        caminho: sar.caminho || '',
+        dataVenc: sar.dataVenc || null,
+        dataCancelamento: sar.dataCancelamento || null,
+        idadeExecucao: sar.idadeExecucao || 0,
+        anoMes: sar.anoMes || null,
+        responsavelHub: sar.responsavelHub || '',
+        responsavelDTC: sar.responsavelDTC || '',
+        acao: sar.acao || '',
+        areaTecnica: sar.areaTecnica || ''
+      };
+    });
+
+    return { sars: sarsFormatados, nextCursor: response.data.next_cursor };
+  };
+
+  // ✅ Observações de todos os cards da página numa consulta só (em vez de uma por card)
+  const buscarObservacoesLote = async (lista) => {
+    const ids = lista.map((sar) => sar.numeroSar).filter(Boolean);
+    if (ids.length === 0) return;
+    try {
+      const response = await axios.get('http://localhost:5007/sars/observacoes', { params: { ids: ids.join(',') } });
+      setObservacoesPorSar((anteriores) => ({ ...anteriores, ...response.data.observacoes }));
+    } catch (error) {
+      // Sem o lote, cada card busca as próprias observações ao abrir
+      console.error('❌ Erro ao buscar observações em lote:', error);
+    }
+  };
+
   useEffect(() => {
     const buscarSars = async () => {
       setLoading(true);
       try {
         console.log('🔄 Buscando SARs da API ExecucaoSar...');
-        
-        // ✅ Conectar com a API real do backend SAR
-        const response = await axios.get('http://localhost:5007/api/sars');
-
-        console.log('✅ Dados recebidos da API ExecucaoSar:', response.data);
-
-        // ✅ Buscar responsáveis e status salvos no localStorage (usando NumSar como chave)
-        const responsaveisSalvos = JSON.parse(localStorage.getItem('execucaosar_responsaveis')) || {};
-        const statusSalvos = JSON.parse(localStorage.getItem('execucaosar_status')) || {};
-        console.log('📦 Responsáveis salvos no localStorage:', responsaveisSalvos);
-        console.log('📦 Status salvos no localStorage:', statusSalvos);
-
-        const sarsFormatados = response.data.map((sar) => {
-          // ✅ Usar NumSar como chave única
-          const chaveUnica = sar.numeroSar || sar.NumSar;
-          
-          // ✅ Usar responsável do localStorage se existir, senão usar da API
-          const responsavelSalvo = responsaveisSalvos[chaveUnica];
-          const responsavelFinal = responsavelSalvo || sar.responsavel || sar.responsavelHub || sar.responsavelDTC || '';
-          
-          // ✅ Usar status do localStorage se existir, senão usar da API
-          const statusSalvo = statusSalvos[chaveUnica];
-          const statusFinal = statusSalvo || sar.status || 'Pendente';
-          
-          if (responsavelSalvo) {
-            console.log(`✅ Responsável restaurado para SAR ${chaveUnica}: ${responsavelSalvo}`);
-          }
-          if (statusSalvo) {
-            console.log(`✅ Status restaurado para SAR ${chaveUnica}: ${statusSalvo}`);
-          }
 
-          return {
-            // ✅ Campos adaptados para ExecucaoSar
-            id: chaveUnica, // Usar NumSar como ID
-            numeroSar: chaveUnica,
-            titulo: sar.titulo || `${sar.acao || 'Serviço'} - ${sar.areaTecnica || 'Técnico'}`,
-            tipoServico: sar.tipoServico || sar.acao || '',
-            cliente: sar.cliente || '', // Não existe na ExecucaoSar
-            endereco: sar.endereco || sar.enderecoNap || '',
-            bairro: sar.bairro || '', // Não existe na ExecucaoSar
-            cidade: sar.cidade || '',
-            tecnologia: sar.tecnologia || sar.areaTecnica || '',
-            equipamento: sar.equipamento || (sar.quantPort ? `${sar.quantPort} portas` : ''),
-            descricaoServico: sar.descricaoServico || sar.caminho || '',
-            tempoEstimado: sar.tempoEstimado || '', // Não existe na ExecucaoSar
-            dataAgendamento: sar.dataAgendamento || sar.dataSolicitacao || null,
-            horaInicio: sar.horaInicio || null, // Não existe na ExecucaoSar
-            horaConclusao: sar.horaConclusao || sar.dataExecucao || null,
-            status: statusFinal, // ✅ Usar status final (localStorage + API)
-            prioridade: sar.prioridade || 'Normal', // Não existe na ExecucaoSar
-            responsavel: responsavelFinal, // ✅ Usar responsável final (localStorage + API)
-            observacoes: sar.observacoes || '', // Não existe na ExecucaoSar
-            // ✅ Campos específicos da ExecucaoSar
-            designacao: sar.designacao || '',
-            quantPort: sar.quantPort || 0,
-            caminho: sar.caminho || '',
-            dataVenc: sar.dataVenc || null,
-            dataCancelamento: sar.dataCancelamento || null,
-            idadeExecucao: sar.idadeExecucao || 0,
-            anoMes: sar.anoMes || null,
-            responsavelHub: sar.responsavelHub || '',
-            responsavelDTC: sar.responsavelDTC || '',
-            acao: sar.acao || '',
-            areaTecnica: sar.areaTecnica || ''
-          };
-        });
+        const pagina = await buscarPagina();
 
-        setSars(sarsFormatados);
+        setSars(pagina.sars);
+        setProximoCursor(pagina.nextCursor);
+        buscarObservacoesLote(pagina.sars);
         setMensagem('');
-        console.log(`✅ ${sarsFormatados.length} SARs carregados com sucesso da ExecucaoSar!`);
+        console.log(`✅ ${pagina.sars.length} SARs carregados com sucesso da ExecucaoSar!`);
 
       } catch (error) {
         console.error('❌ Erro ao buscar SARs da ExecucaoSar:', error);
@@ -105,12 +135,70 @@ const ExecucaoSar = () => {
     buscarSars();
   }, []); // ← execute apenas uma vez ao montar o componente
 
+  // ✅ Eventos do backend (SSE): aplica as mudanças de outros usuários sem buscar a lista de novo
+  useEffect(() => {
+    const eventos = new EventSource('http://localhost:5007/api/eventos?canal=sar');
+
+    const corrigirSar = (numeroSar, alteracoes) => {
+      setSars((sarsAnteriores) =>
+        sarsAnteriores.map((sar) =>
+          String(sar.numeroSar) === String(numeroSar) ? { ...sar, ...alteracoes } : sar
+        )
+      );
+    };
+
+    const lerDados = (handler) => (evento) => handler(JSON.parse(evento.data));
+
+    eventos.addEventListener('sar.assumido', lerDados(({ numeroSar, responsavel }) => {
+      corrigirSar(numeroSar, { responsavel });
+    }));
+    eventos.addEventListener('sar.liberado', lerDados(({ numeroSar }) => {
+      corrigirSar(numeroSar, { responsavel: '' });
+    }));
+    eventos.addEventListener('sar.finalizado', lerDados(({ numeroSar, status }) => {
+      corrigirSar(numeroSar, { status });
+    }));
+    eventos.addEventListener('sar.atualizado', lerDados(({ numeroSar, campos }) => {
+      const alteracoes = {};
+      ['status', 'observacoes', 'responsavel'].forEach((campo) => {
+        if (campos && campos[campo] !== undefined) {
+          alteracoes[campo] = campos[campo] ?? '';
+        }
+      });
+      corrigirSar(numeroSar, alteracoes);
+    }));
+    // ✅ O servidor perdeu eventos deste cliente: recarrega a primeira página
+    eventos.addEventListener('resync', () => {
+      recarregarSars();
+    });
+
+    return () => eventos.close();
+  }, []);
+
+  // ✅ Carrega a próxima página e acrescenta ao quadro
+  const carregarMaisSars = async () => {
+    if (proximoCursor === null || carregandoMais) return;
+
+    setCarregandoMais(true);
+    try {
+      const pagina = await buscarPagina(proximoCursor);
+      setSars((sarsAnteriores) => [...sarsAnteriores, ...pagina.sars]);
+      setProximoCursor(pagina.nextCursor);
+      buscarObservacoesLote(pagina.sars);
+    } catch (error) {
+      console.error('❌ Erro ao buscar mais SARs da ExecucaoSar:', error);
+      setMensagem('❌ Erro ao carregar mais SARs. Verifique a conexão.');
+    } finally {
+      setCarregandoMais(false);
+    }
+  };
+
   // ✅ Função para recarregar SARs (usada em conflitos de responsável)
   const recarregarSars = async () => {
     console.log('🔄 Recarregando SARs da ExecucaoSar...');
     try {
-      const response = await axios.get('http://localhost:5007/api/sars');
-      const sarsAtualizados = response.data.map((sar) => {
+      const response = await axios.get('http://localhost:5007/api/sars', { params: { limit: TAMANHO_PAGINA, status: STATUS_QUADRO } });
+      const sarsAtualizados = response.data.sars.map((sar) => {
         const chaveUnica = sar.numeroSar || sar.NumSar;
         
         return {
@@ -148,6 +236,8 @@ const ExecucaoSar = () => {
         };
       });
       setSars(sarsAtualizados);
+      setProximoCursor(response.data.next_cursor);
+      buscarObservacoesLote(sarsAtualizados);
       console.log('✅ SARs da ExecucaoSar recarregados com sucesso');
     } catch (error) {
       console.error('❌ Erro ao recarregar SARs da ExecucaoSar:', error);
@@ -396,6 +486,7 @@ const atualizarResponsavel = async (numeroSar, novoResponsavel) => {
                         onAtualizarResponsavel={atualizarResponsavel}
                         onRecarregarSars={recarregarSars}
                         usuario={usuarioLogado}
+                        observacoesIniciais={observacoesPorSar[String(sar.numeroSar)]}
                       />
                     ))}
                   </div>
@@ -433,11 +524,24 @@ const atualizarResponsavel = async (numeroSar, novoResponsavel) => {
                         onAtualizarResponsavel={atualizarResponsavel}
                         onRecarregarSars={recarregarSars}
                         usuario={usuarioLogado}
+                        observacoesIniciais={observacoesPorSar[String(sar.numeroSar)]}
                       />
                     ))}
                   </div>
                 )
               ) : null}
+
+              {proximoCursor !== null && (
+                <div className="mt-6 flex justify-center">
+                  <button
+                    className="py-2 px-4 rounded bg-gray-200 text-gray-700 hover:bg-gray-300 disabled:opacity-50"
+                    onClick={carregarMaisSars}
+                    disabled={carregandoMais}
+                  >
+                    {carregandoMais ? 'Carregando...' : 'Carregar mais SARs'}
+                  </button>
+                </div>
+              )}
             </div>
           )}
         </main>
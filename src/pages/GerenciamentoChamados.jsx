@@ -5,69 +5,98 @@ import Sidebar from '../components/Sidebar';
 import Footer from '../components/Footer';
 import axios from 'axios';
 
+const TAMANHO_PAGINA = 100;
+const STATUS_QUADRO = 'Pendente,Em Andamento';
+
 const GerenciamentoChamados = () => {
   const [chamados, setChamados] = useState([]);
   const [mensagem, setMensagem] = useState('');
   const [secaoExibida, setSecaoExibida] = useState('novos');
   const [sidebarOpen, setSidebarOpen] = useState(false);
+  const [proximoCursor, setProximoCursor] = useState(null);
+  const [carregandoMais, setCarregandoMais] = useState(false);
+  const [observacoesPorChamado, setObservacoesPorChamado] = useState({});
   const usuarioLogado = JSON.parse(localStorage.getItem('usuario')) || { nome: 'Usuário', avatar: null };
 
-  useEffect(() => {
-    const buscarChamados = async () => {
-      try {
-        // ✅ CORRIGIDO: URL para a porta 5000 com /api/
-        const response = await axios.get('http://127.0.0.1:5000/api/chamados');
+  // ✅ Busca uma página de chamados (paginação por cursor no backend)
+  const buscarPagina = async (cursor = null) => {
+    // ✅ O quadro só exibe as abas Pendente e Em Andamento: o filtro é feito no banco
+    const params = { limit: TAMANHO_PAGINA, status: STATUS_QUADRO };
+    if (cursor !== null) {
+      params.after_id = cursor;
+    }
+    const response = await axios.get('http://127.0.0.1:5000/api/chamados', { params });
 
-        console.log('Dados recebidos da API:', response.data);
+    console.log('Dados recebidos da API:', response.data);
 
-        // ✅ Buscar responsáveis E status salvos no localStorage
-        const responsaveisSalvos = JSON.parse(localStorage.getItem('chamados_responsaveis')) || {};
-        const statusSalvos = JSON.parse(localStorage.getItem('chamados_status')) || {};
-        console.log('Responsáveis salvos no localStorage:', responsaveisSalvos);
-        console.log('Status salvos no localStorage:', statusSalvos);
+    // ✅ Buscar responsáveis E status salvos no localStorage
+    const responsaveisSalvos = JSON.parse(localStorage.getItem('chamados_responsaveis')) || {};
+    const statusSalvos = JSON.parse(localStorage.getItem('chamados_status')) || {};
 
-        const chamadosFormatados = response.data.map((chamado) => {
-          // ✅ Usar responsável do localStorage se existir, senão usar da API
-          const responsavelSalvo = responsaveisSalvos[chamado.id];
-          const responsavelFinal = responsavelSalvo || chamado.responsavel || '';
-          
-          // ✅ NOVO: Usar status do localStorage se existir, senão usar da API
-          const statusSalvo = statusSalvos[chamado.id];
-          const statusFinal = statusSalvo || chamado.status || 'Pendente';
-          
-          if (responsavelSalvo) {
-            console.log(`✅ Responsável restaurado para chamado ${chamado.id}: ${responsavelSalvo}`);
-          }
-          if (statusSalvo) {
-            console.log(`✅ Status restaurado para chamado ${chamado.id}: ${statusSalvo}`);
-          }
+    const chamadosFormatados = response.data.chamados.map((chamado) => {
+      // ✅ Usar responsável do localStorage se existir, senão usar da API
+      const responsavelSalvo = responsaveisSalvos[chamado.id];
+      const responsavelFinal = responsavelSalvo || chamado.responsavel || '';
+      
+      // ✅ NOVO: Usar status do localStorage se existir, senão usar da API
+      const statusSalvo = statusSalvos[chamado.id];
+      const statusFinal = statusSalvo || chamado.status || 'Pendente';
+      
+      if (responsavelSalvo) {
+        console.log(`✅ Responsável restaurado para chamado ${chamado.id}: ${responsavelSalvo}`);
+      }
+      if (statusSalvo) {
+        console.log(`✅ Status restaurado para chamado ${chamado.id}: ${statusSalvo}`);
+      }
 
-          return {
-            id: chamado.id,
-            nomeSolicitante: chamado.nomeSolicitante ?? '',
-            telefone: chamado.telefone ?? '',
-            emailSolicitante: chamado.emailSolicitante ?? '',
-            empresa: chamado.empresa ?? '',
-            cidade: chamado.cidade ?? '',
-            tecnologia: chamado.tecnologia ?? '',
-            nodeAfetadas: chamado.nodeAfetadas ?? '',
-            tipoReclamacao: chamado.tipoReclamacao ?? '',
-            detalhesProblema: chamado.detalhesProblema ?? '',
-            testesRealizados: chamado.testesRealizados ?? '',
-            modelEquipamento: chamado.modelEquipamento ?? '',
-            baseAfetada: chamado.baseAfetada ?? '',
-            contratosAfetados: chamado.contratosAfetados ?? '',
-            servicoAfetado: chamado.servicoAfetado ?? '',
-            dataEvento: chamado.dataEvento ?? null,
-            horaInicio: chamado.horaInicio ?? null,
-            horaConclusao: chamado.horaConclusao ?? null,
-            status: statusFinal, // ✅ ALTERADO: usar status final (localStorage + API)
-            prioridade: chamado.prioridade ?? 'Baixa',
-            responsavel: responsavelFinal // ✅ Usar responsável final (localStorage + API)
-          };
-        });
+      return {
+        id: chamado.id,
+        nomeSolicitante: chamado.nomeSolicitante ?? '',
+        telefone: chamado.telefone ?? '',
+        emailSolicitante: chamado.emailSolicitante ?? '',
+        empresa: chamado.empresa ?? '',
+        cidade: chamado.cidade ?? '',
+        tecnologia: chamado.tecnologia ?? '',
+        nodeAfetadas: chamado.nodeAfetadas ?? '',
+        tipoReclamacao: chamado.tipoReclamacao ?? '',
+        detalhesProblema: chamado.detalhesProblema ?? '',
+        testesRealizados: chamado.testesRealizados ?? '',
+        modelEquipamento: chamado.modelEquipamento ?? '',
+        baseAfetada: chamado.baseAfetada ?? '',
+        contratosAfetados: chamado.contratosAfetados ?? '',
+        servicoAfetado: chamado.servicoAfetado ?? '',
+        dataEvento: chamado.dataEvento ?? null,
+        horaInicio: chamado.horaInicio ?? null,
+        horaConclusao: chamado.horaConclusao ?? null,
+        status: statusFinal, // ✅ ALTERADO: usar status final (localStorage + API)
+        prioridade: chamado.prioridade ?? 'Baixa',
+        responsavel: responsavelFinal // ✅ Usar responsável final (localStorage + API)
+      };
+    });
 
-        setChamados(chamadosFormatados);
+    return { chamados: chamadosFormatados, nextCursor: response.data.next_cursor };
+  };
+
+  // ✅ Observações de todos os cards da página numa consulta só (em vez de uma por card)
+  const buscarObservacoesLote = async (lista) => {
+    const ids = lista.map((chamado) => chamado.id).filter(Boolean);
+    if (ids.length === 0) return;
+    try {
+      const response = await axios.get('http://127.0.0.1:5000/chamados/observacoes', { params: { ids: ids.join(',') } });
+      setObservacoesPorChamado((anteriores) => ({ ...anteriores, ...response.data.observacoes }));
+    } catch (error) {
+      // Sem o lote, cada card busca as próprias observações ao abrir
+      console.error('Erro ao buscar observações em lote:', error);
+    }
+  };
+
+  useEffect(() => {
+    const buscarChamados = async () => {
+      try {
+        const pagina = await buscarPagina();
+        setChamados(pagina.chamados);
+        setProximoCursor(pagina.nextCursor);
+        buscarObservacoesLote(pagina.chamados);
       } catch (error) {
         console.error('Erro ao buscar chamados:', error);
         setMensagem('Erro ao carregar os chamados.');
@@ -77,6 +106,24 @@ const GerenciamentoChamados = () => {
     buscarChamados();
   }, []); // ← execute apenas uma vez ao montar o componente
 
+  // ✅ Carrega a próxima página e acrescenta ao quadro
+  const carregarMaisChamados = async () => {
+    if (proximoCursor === null || carregandoMais) return;
+
+    setCarregandoMais(true);
+    try {
+      const pagina = await buscarPagina(proximoCursor);
+      setChamados((chamadosAnteriores) => [...chamadosAnteriores, ...pagina.chamados]);
+      setProximoCursor(pagina.nextCursor);
+      buscarObservacoesLote(pagina.chamados);
+    } catch (error) {
+      console.error('Erro ao buscar mais chamados:', error);
+      setMensagem('Erro ao carregar mais chamados.');
+    } finally {
+      setCarregandoMais(false);
+    }
+  };
+
   // ✅ FUNÇÃO CORRIGIDA para atualizar responsável + salvar no localStorage
   const atualizarResponsavel = (id, novoResponsavel) => {
     console.log(`🔄 Atualizando responsável - Chamado ${id}: ${novoResponsavel}`);
@@ -224,6 +271,7 @@ const GerenciamentoChamados = () => {
                       onAtualizarStatus={atualizarStatusChamado}
                       onAtualizarResponsavel={atualizarResponsavel}
                       usuario={usuarioLogado}
+                      observacoesIniciais={observacoesPorChamado[String(chamado.id)]}
                     />
                   ))}
                 </div>
@@ -242,11 +290,24 @@ const GerenciamentoChamados = () => {
                       onAtualizarStatus={atualizarStatusChamado}
                       onAtualizarResponsavel={atualizarResponsavel}
                       usuario={usuarioLogado}
+                      observacoesIniciais={observacoesPorChamado[String(chamado.id)]}
                     />
                   ))}
                 </div>
               )
             ) : null}
+
+            {proximoCursor !== null && (
+              <div className="mt-6 flex justify-center">
+                <button
+                  className="py-2 px-4 rounded bg-gray-200 text-gray-700 hover:bg-gray-300 disabled:opacity-50"
+                  onClick={carregarMaisChamados}
+                  disabled={carregandoMais}
+                >
+                  {carregandoMais ? 'Carregando...' : 'Carregar mais chamados'}
+                </button>
+              </div>
+            )}
           </div>
         </main>
       </div>